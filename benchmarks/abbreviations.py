@@ -0,0 +1,87 @@
+""" Compares the compile and matching time of abbreviation excluders whose abbreviations are factored in a trie with
+the ones using a plain alternation, for growing lists of abbreviations.
+
+    python benchmarks/abbreviations.py [--sizes 100 1000 5000] [--text-size 200000]
+"""
+import argparse
+import random
+import string
+import time
+
+import regex as re
+
+from pie_extended.pipeline.tokenizers.utils.excluder import AbbreviationsExcluder, CompoundAbbreviationsExcluder
+
+
+class FlatAbbreviationsExcluder(AbbreviationsExcluder):
+    factor_prefixes = False
+
+
+class FlatCompoundAbbreviationsExcluder(CompoundAbbreviationsExcluder):
+    factor_prefixes = False
+
+
+def make_abbreviations(size: int, seed: int = 42):
+    """ Abbreviations looking like the ones of our lists: short words, sharing prefixes, some made of several parts """
+    rng = random.Random(seed)
+    abbreviations = []
+    while len(abbreviations) < size:
+        parts = ["".join(rng.choice(string.ascii_lowercase[:12]) for _ in range(rng.randint(1, 7))) + "."
+                 for _ in range(1 if rng.random() < .8 else 2)]
+        abbreviations.append(" ".join(part.capitalize() if rng.random() < .3 else part for part in parts))
+    return abbreviations
+
+
+def make_text(abbreviations, size: int, seed: int = 42):
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(abbreviations) if rng.random() < .05 else "".join(
+            rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 10)))
+        words.append(word + ("." if rng.random() < .05 else ""))
+        length += len(words[-1]) + 1
+    return " ".join(words)
+
+
+def timed(function, *args, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = function(*args)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 1000, 5000])
+    parser.add_argument("--text-size", type=int, default=200000)
+    args = parser.parse_args()
+
+    print("{:<34} {:>6} {:>12} {:>12} {:>12} {:>12}".format(
+        "Excluder", "Size", "Compile flat", "Compile trie", "Match flat", "Match trie"))
+    for size in args.sizes:
+        abbreviations = make_abbreviations(size)
+        text = make_text(abbreviations, args.text_size)
+        for name, flat_class, trie_class, kwargs in [
+            ("AbbreviationsExcluder", FlatAbbreviationsExcluder, AbbreviationsExcluder, {}),
+            ("CompoundAbbreviationsExcluder", FlatCompoundAbbreviationsExcluder, CompoundAbbreviationsExcluder,
+             {"ignore_case": True}),
+        ]:
+            # Compiled regexes are cached by the regex module
+            re.purge()
+            flat_compile, flat = timed(lambda: flat_class(abbreviations, **kwargs), repeat=1)
+            re.purge()
+            trie_compile, trie = timed(lambda: trie_class(abbreviations, **kwargs), repeat=1)
+
+            flat_match, flat_out = timed(flat.before_sentence_tokenizer, text)
+            trie_match, trie_out = timed(trie.before_sentence_tokenizer, text)
+            assert flat_out == trie_out, "Outputs differ"
+            print("{:<34} {:>6} {:>11.4f}s {:>11.4f}s {:>11.4f}s {:>11.4f}s".format(
+                name, size, flat_compile, trie_compile, flat_match, trie_match))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+""" Measures the startup time of the commands of the CLI which do not tag, and lists the heaviest modules they
+import. Commands run in a new interpreter each time, as they would from a shell.
+
+    python benchmarks/cli_startup.py [--repeat 5]
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+COMMANDS = [
+    ["--help"],
+    ["list"],
+    ["download", "--help"],
+    ["tag", "--help"],
+]
+
+SCRIPT = "import sys; from pie_extended.cli.main import pie_ext; sys.argv[0] = 'pie-extended'; pie_ext()"
+
+
+def run(args, extra=()):
+    return subprocess.run([sys.executable, *extra, "-c", SCRIPT, *args], capture_output=True, text=True)
+
+
+def heaviest_imports(args, count: int = 5):
+    """ Modules taking the most cumulated time to import, from python -X importtime """
+    rows = []
+    for line in run(args, extra=("-X", "importtime")).stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # Top-level imports only
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = min(
+        _timed([sys.executable, "-c", "pass"]) for _ in range(args.repeat)
+    )
+    print("Interpreter startup: {:.3f}s".format(baseline))
+    for command in COMMANDS:
+        best = min(_timed([sys.executable, "-c", SCRIPT, *command]) for _ in range(args.repeat))
+        print("pie-extended {:<16} {:.3f}s".format(" ".join(command), best))
+        for cumulative, name in heaviest_imports(command):
+            print("    {:<40} {:.3f}s".format(name, cumulative / 1e6))
+
+
+def _timed(command):
+    start = time.perf_counter()
+    subprocess.run(command, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Tuple, List, Optional, Hashable, Iterable, Dict, Sequence
+
+# Output of the tagger for a sentence: ((token, (tag_task1, tag_task2, ...)), ...)
+TaggedSentence = Tuple[Tuple[str, Tuple[str, ...]], ...]
+# What is cached for a sentence: its tagged output and the tasks of the tagger
+CacheEntry = Tuple[TaggedSentence, List[str]]
+
+
+class SentenceCache:
+    """ In-memory cache of tagged sentences, with Least-Recently-Used eviction.
+
+    Keys are built by the tagger from the identity of its models and the tokens of the sentence (after exclusion),
+    values are the output of the tagger for this sentence. The size of the cache is bound by the total number of
+    tokens it stores.
+
+    :param max_tokens: Maximum number of tokens (summed over all cached sentences) kept in memory
+    :param backend: Slower cache (such as a SqliteSentenceCache) looked up on misses and filled with new entries
+
+    >>> cache = SentenceCache(max_tokens=4)
+    >>> cache.set_many([(("model", ("a", "b")), (("a", ("A",)), ("b", ("B",))), ["task"])])
+    >>> cache.get_many([("model", ("a", "b")), ("model", ("c",))])
+    [((('a', ('A',)), ('b', ('B',))), ['task']), None]
+    >>> cache.set_many([(("model", ("c", "d", "e")), (("c", ("C",)), ("d", ("D",)), ("e", ("E",))), ["task"])])
+    >>> len(cache), cache.tokens  # The first sentence was evicted to stay below 4 tokens
+    (1, 3)
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+    def __init__(self, max_tokens: int = 1000000, backend: Optional["SqliteSentenceCache"] = None):
+        self.max_tokens: int = max_tokens
+        self.backend: Optional[SqliteSentenceCache] = backend
+        self.tokens: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[Hashable]) -> List[Optional[CacheEntry]]:
+        """ Retrieves the entries of [keys], None for the ones that are not cached """
+        with self._lock:
+            return self._get_many(keys)
+
+    def _get_many(self, keys: Iterable[Hashable]) -> List[Optional[CacheEntry]]:
+        out, missing = [], []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                missing.append((len(out), key))
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            out.append(entry)
+
+        if self.backend is not None and missing:
+            found = self.backend.get_many([key for _, key in missing])
+            self._store([(key, *entry) for (_, key), entry in zip(missing, found) if entry is not None])
+            for (position, _), entry in zip(missing, found):
+                out[position] = entry
+        return out
+
+    def set_many(self, entries: Iterable[Tuple[Hashable, TaggedSentence, List[str]]]):
+        """ Stores tagged sentences, evicting the least recently used ones if the cache is full """
+        entries = list(entries)
+        if self.backend is not None:
+            self.backend.set_many(entries)
+        with self._lock:
+            self._store(entries)
+
+    def _store(self, entries: List[Tuple[Hashable, TaggedSentence, List[str]]]):
+        for key, sentence, tasks in entries:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                continue
+            self._entries[key] = (sentence, tasks)
+            self.tokens += len(sentence)
+        while self.tokens > self.max_tokens and self._entries:
+            _, (sentence, _) = self._entries.popitem(last=False)
+            self.tokens -= len(sentence)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def model_fingerprint(model_identity: Tuple) -> str:
+    """ Computes a fingerprint of the models used by a tagger (cf. ExtensibleTagger.model_identity) from the
+    content of their tar files, so that cached outputs are invalidated when models change.
+
+    :param model_identity: Lowercasing option and list of (model path, tasks) of the tagger
+    :return: Hexadecimal digest
+    """
+    lower, model_specs = model_identity
+    digest = hashlib.sha1(repr(lower).encode())
+    for path, tasks in model_specs:
+        digest.update(",".join(tasks).encode())
+        if not path.endswith(".tar"):
+            path += ".tar"
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class SqliteSentenceCache:
+    """ Persistent cache of tagged sentences stored in a SQLite file, shared across runs.
+
+    Sentences are keyed on a hash of their tokens and of the fingerprint of the models (cf. model_fingerprint),
+    so that a rerun with the same models only goes through pre- and post-processing.
+
+    :param path: Path to the SQLite file, created if needed
+    """
+    # SQLite limits the number of parameters of a query
+    QUERY_SIZE: int = 500
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.hits: int = 0
+        self.misses: int = 0
+        self._fingerprints: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # A connection must not be shared with forked processes
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=60)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS sentences (
+                    key TEXT PRIMARY KEY, fingerprint TEXT, sentence TEXT, tokens INTEGER, used REAL
+                );
+                CREATE TABLE IF NOT EXISTS models (fingerprint TEXT PRIMARY KEY, tasks TEXT);
+            """)
+            self._pid = os.getpid()
+        return self._connection
+
+    def _fingerprint(self, model_identity: Tuple) -> str:
+        if model_identity not in self._fingerprints:
+            self._fingerprints[model_identity] = model_fingerprint(model_identity)
+        return self._fingerprints[model_identity]
+
+    def _hash(self, key: Tuple[Tuple, Sequence[str]]) -> Tuple[str, str]:
+        model_identity, tokens = key
+        fingerprint = self._fingerprint(model_identity)
+        return fingerprint, hashlib.sha1("\x1f".join([fingerprint, *tokens]).encode()).hexdigest()
+
+    def get_many(self, keys: Iterable[Tuple[Tuple, Sequence[str]]]) -> List[Optional[CacheEntry]]:
+        """ Retrieves the entries of [keys], None for the ones that are not cached """
+        hashes = [self._hash(key) for key in keys]
+        found: Dict[str, Tuple[str, str]] = {}
+        with self._lock:
+            for start in range(0, len(hashes), self.QUERY_SIZE):
+                query = [key for _, key in hashes[start:start+self.QUERY_SIZE]]
+                found.update({
+                    key: (fingerprint, sentence)
+                    for key, fingerprint, sentence in self.connection.execute(
+                        "SELECT key, fingerprint, sentence FROM sentences WHERE key IN ({})".format(
+                            ",".join("?" * len(query))),
+                        query
+                    )
+                })
+                self.connection.execute(
+                    "UPDATE sentences SET used = ? WHERE key IN ({})".format(",".join("?" * len(query))),
+                    [time.time(), *query]
+                )
+            tasks = {
+                fingerprint: json.loads(model_tasks)
+                for fingerprint, model_tasks in self.connection.execute("SELECT fingerprint, tasks FROM models")
+            }
+            self.connection.commit()
+
+        out = []
+        for _, key in hashes:
+            if key in found:
+                self.hits += 1
+                fingerprint, sentence = found[key]
+                out.append((
+                    tuple((token, tuple(tags)) for token, tags in json.loads(sentence)),
+                    tasks[fingerprint]
+                ))
+            else:
+                self.misses += 1
+                out.append(None)
+        return out
+
+    def set_many(self, entries: Iterable[Tuple[Tuple[Tuple, Sequence[str]], TaggedSentence, List[str]]]):
+        """ Stores tagged sentences """
+        rows, models = [], {}
+        now = time.time()
+        for key, sentence, tasks in entries:
+            fingerprint, hashed = self._hash(key)
+            models[fingerprint] = json.dumps(tasks)
+            rows.append((hashed, fingerprint, json.dumps(sentence, ensure_ascii=False), len(sentence), now))
+        if not rows:
+            return
+        with self._lock:
+            self.connection.executemany("INSERT OR IGNORE INTO models VALUES (?, ?)", models.items())
+            self.connection.executemany("INSERT OR IGNORE INTO sentences VALUES (?, ?, ?, ?, ?)", rows)
+            self.connection.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """ Number of cached sentences, tokens and size of the file in bytes """
+        with self._lock:
+            sentences, tokens = self.connection.execute("SELECT COUNT(*), SUM(tokens) FROM sentences").fetchone()
+        return {"sentences": sentences, "tokens": tokens or 0, "bytes": os.path.getsize(self.path)}
+
+    def prune(self, max_sentences: int = 0) -> int:
+        """ Removes the least recently used sentences so that at most [max_sentences] remain
+
+        :return: Number of removed sentences
+        """
+        with self._lock:
+            removed = self.connection.execute(
+                "DELETE FROM sentences WHERE key NOT IN (SELECT key FROM sentences ORDER BY used DESC LIMIT ?)",
+                (max_sentences, )
+            ).rowcount
+            self.connection.commit()
+            self.connection.execute("VACUUM")
+        return removed
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
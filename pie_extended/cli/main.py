@@ -2,9 +2,11 @@ import click
 
 
 from pie_extended.cli import utils
-from typing import Iterable
+from pie_extended import models
+from typing import Iterable, Optional
 
-MODELS = [name for name, *_ in utils.get_list()]
+# Names of the models, without importing their packages (cf. utils.get_list() for their metadata)
+MODELS = list(models.modules)
 
 
 @click.group("pie-ext")
@@ -63,16 +65,51 @@ def download(model):
               help="Add new exclude patterns  for token (Regular expression)", multiple=True)
 @click.option("--max-tokens", "max_tokens",
               help="Maximum length of sentence", type=int, default=64)
+@click.option("--stream", is_flag=True, default=False,
+              help="Read files by blocks cut at sentence boundaries instead of loading them in memory")
+@click.option("--max-batch-tokens", "max_batch_tokens", type=int, default=None,
+              help="Group sentences by length and cap each batch to this number of (padded) tokens")
+@click.option("--pipelined", is_flag=True, default=False,
+              help="Run tokenization, tagging and post-processing concurrently")
+@click.option("--workers", type=int, default=1,
+              help="Number of processes tagging files in parallel, sharing the loaded models")
+@click.option("--shard-workers", "shard_workers", type=int, default=1,
+              help="Number of processes tagging shards of a same file in parallel (for very large files)")
+@click.option("--sentence-cache-size", "sentence_cache_size", type=int, default=0,
+              help="Cache tagged sentences in memory, up to this number of tokens, so that repeated sentences are "
+                   "tagged once")
+@click.option("--cache-file", "cache_file", type=click.Path(dir_okay=False), default=None,
+              help="SQLite file where tagged sentences are kept across runs, so that retagging with the same models "
+                   "only runs pre- and post-processing")
+@click.option("--replacer-cache-size", "replacer_cache_size", type=int, default=0,
+              help="Memoize the normalization of this number of distinct tokens by the tokenizer")
+@click.option("--profile", is_flag=True, default=False,
+              help="Print the time spent in each stage of the pipeline (tokenizer, tagger, post-processing, etc.)")
+@click.option("--profile-file", "profile_file", type=click.Path(dir_okay=False), default=None,
+              help="Dump the time and counters of each stage, per document and in total, to this JSON file")
 def tag(model: str, filepath: str, allowed_failure: bool, batch_size: int, device: str, debug: bool,
         model_path: str,
         reset_patterns: bool, add_pattern: Iterable[str],
         no_tokenizer: bool = False,
-        max_tokens: int = 64):
+        max_tokens: int = 64,
+        stream: bool = False,
+        max_batch_tokens: Optional[int] = None,
+        pipelined: bool = False,
+        workers: int = 1,
+        shard_workers: int = 1,
+        sentence_cache_size: int = 0,
+        cache_file: Optional[str] = None,
+        replacer_cache_size: int = 0,
+        profile: bool = False,
+        profile_file: Optional[str] = None):
     """ Tag as many [filepath] as you want with [model] """
     from tqdm import tqdm
     click.echo(click.style("Getting the tagger", bold=True))
     try:
-        tagger = utils.get_tagger(model, batch_size=batch_size, device=device, model_path=model_path)
+        tagger = utils.get_tagger(model, batch_size=batch_size, device=device, model_path=model_path,
+                                  max_batch_tokens=max_batch_tokens, pipelined=pipelined,
+                                  sentence_cache_size=sentence_cache_size, cache_file=cache_file,
+                                  profile=profile or bool(profile_file))
     except FileNotFoundError as e:
         click.echo("Model not found: please make sure you have downloaded the model files with "
                    "pie-extended download " + model)
@@ -80,24 +117,90 @@ def tag(model: str, filepath: str, allowed_failure: bool, batch_size: int, devic
             raise e
         return
     failures = []
-    for file in tqdm(filepath):
-        try:
-            utils.tag_file(
-                model, tagger, file, reset_exclude_patterns=reset_patterns,
-                exclude_patterns=add_pattern, no_tokenizer=no_tokenizer,
-                max_tokens=max_tokens)
-        except Exception as E:
-            failures.append((file, E))
-            click.echo("{} could not be lemmatized".format(file))
-            if debug:
-                raise E
-            if len(failures) > allowed_failure:
-                click.echo(
-                    click.style("Too many errors, stopping the process", fg="red")
-                )
-                for failure in failures:
-                    print(failure)
-                break
+    results = utils.iter_tag_files(
+        model, tagger, filepath, workers=workers, reset_exclude_patterns=reset_patterns,
+        exclude_patterns=add_pattern, no_tokenizer=no_tokenizer,
+        max_tokens=max_tokens, stream=stream, shard_workers=shard_workers, replacer_cache_size=replacer_cache_size)
+    for file, error in tqdm(results, total=len(filepath)):
+        if error is None:
+            continue
+        failures.append((file, error))
+        click.echo("{} could not be lemmatized: {}".format(file, error))
+        if debug:
+            raise error
+        if len(failures) > allowed_failure:
+            click.echo(
+                click.style("Too many errors, stopping the process", fg="red")
+            )
+            for failure in failures:
+                print(failure)
+            break
+
+    if tagger.profiler is not None:
+        if profile:
+            click.echo(tagger.profiler.report(), err=True)
+        if profile_file:
+            import json
+            with open(profile_file, "w") as f:
+                json.dump(tagger.profiler.to_dict(), f, indent=2)
+
+
+@pie_ext.command("cache")
+@click.argument("cache_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--prune", type=int, default=None,
+              help="Remove the least recently used sentences so that at most this number remains")
+def cache(cache_file: str, prune: Optional[int] = None):
+    """ Show the size of a [cache_file] created by tag --cache-file, and optionally prune it """
+    from pie_extended.cache import SqliteSentenceCache
+    sentence_cache = SqliteSentenceCache(cache_file)
+    if prune is not None:
+        click.echo("{} sentences removed".format(sentence_cache.prune(prune)))
+    stats = sentence_cache.stats()
+    click.echo("{} sentences, {} tokens, {:.1f} MB".format(
+        stats["sentences"], stats["tokens"], stats["bytes"] / 1024 / 1024))
+
+
+@pie_ext.command("serve")
+@click.argument("models", nargs=-1, required=True, type=click.Choice(MODELS, case_sensitive=False))
+@click.option("--host", type=str, default="127.0.0.1", help="Address to listen on")
+@click.option("--port", type=int, default=8080, help="Port to listen on")
+@click.option("--batch_size", type=int, default=16,
+              help="Group of sentences tagged together")
+@click.option("--device", type=str, default="cpu",
+              help="Use cpu or gpu for prediction")
+@click.option("--max-tokens", "max_tokens",
+              help="Maximum length of sentence", type=int, default=64)
+@click.option("--max-batch-tokens", "max_batch_tokens", type=int, default=None,
+              help="Group sentences by length and cap each batch to this number of (padded) tokens")
+@click.option("--sentence-cache-size", "sentence_cache_size", type=int, default=0,
+              help="Cache tagged sentences in memory, up to this number of tokens")
+@click.option("--max-wait", "max_wait", type=float, default=5,
+              help="Maximum time (in milliseconds) a sentence waits for sentences of other requests to fill its batch")
+def serve(models: Iterable[str], host: str, port: int, batch_size: int, device: str, max_tokens: int = 64,
+          max_batch_tokens: Optional[int] = None, sentence_cache_size: int = 0, max_wait: float = 5):
+    """ Serve [models] over HTTP, keeping them loaded between requests
+
+    POST text to /tag/<model> (?format=tsv|json, ?no_tokenizer=1), or JSON with a "text" or a pre-tokenized "tokens"
+    key. GET /health and /ready can be used for monitoring.
+    """
+    import threading
+    from pie_extended.cli.server import TaggerServer, TaggerService
+    service = TaggerService(max_tokens=max_tokens, max_wait=max_wait / 1000)
+    server = TaggerServer((host, port), service)
+    # Models are loaded while the server already answers health checks
+    threading.Thread(
+        target=service.load, args=(models, ), daemon=True,
+        kwargs=dict(batch_size=batch_size, device=device, max_batch_tokens=max_batch_tokens,
+                    sentence_cache_size=sentence_cache_size)
+    ).start()
+    click.echo("Listening on http://{}:{}".format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
 
 
 @pie_ext.command("install-addons")
@@ -0,0 +1,225 @@
+import json
+import threading
+import traceback
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Tuple, Callable, Optional, List, Iterable
+from urllib.parse import urlparse, parse_qs
+
+from ..tagger import ExtensibleTagger
+from ..scheduler import BatchScheduler
+from ..pipeline.iterators.proto import DataIterator
+from ..pipeline.postprocessor.proto import ProcessorPrototype
+from ..pipeline.formatters.proto import Formatter
+
+
+IteratorAndProcessorFactory = Callable[..., Tuple[DataIterator, ProcessorPrototype]]
+
+
+class UnknownModel(KeyError):
+    """ Raised when a model that is not loaded is requested """
+
+
+class InvalidInput(ValueError):
+    """ Raised when the data of a request cannot be tagged """
+
+
+def check_pretokenized(data: str):
+    """ Raises InvalidInput if [data], one token per line and sentences separated by an empty line, has an empty
+    sentence, a blank token or a carriage return
+
+    >>> check_pretokenized("Arma\\nuirum\\n\\ncano\\n")
+    >>> check_pretokenized("Arma\\n\\n\\ncano")
+    Traceback (most recent call last):
+     ...
+    pie_extended.cli.server.InvalidInput: Sentence 1 has an empty token or is empty
+    """
+    if "\r" in data:
+        raise InvalidInput("Pre-tokenized input cannot contain carriage returns")
+    data = data.strip("\n")
+    if not data:
+        return
+    for index, sentence in enumerate(data.split("\n\n")):
+        if any(not token.strip() for token in sentence.split("\n")):
+            raise InvalidInput("Sentence {} has an empty token or is empty".format(index))
+
+
+class TaggerService:
+    """ Keeps taggers loaded in memory and tags texts with them
+
+    Requests are read and post-processed concurrently, while their sentences are tagged in shared batches (cf.
+    BatchScheduler). Each request uses an iterator and processor of its own, taken from a pool of the ones built for
+    earlier requests (they are reset at each text) instead of being built again.
+
+    :param max_tokens: Maximum number of tokens per sentence, passed to get_iterator_and_processor
+    :param max_wait: Maximum time (in seconds) a sentence waits for sentences of other requests before being tagged
+    """
+    def __init__(self, max_tokens: int = 256, max_wait: float = 0.005):
+        self.max_tokens: int = max_tokens
+        self.max_wait: float = max_wait
+        self.taggers: Dict[str, Tuple[ExtensibleTagger, IteratorAndProcessorFactory]] = {}
+        # Iterators and processors not used by a request at the moment, by model
+        self._pipelines: Dict[str, List[Tuple[DataIterator, ProcessorPrototype]]] = {}
+        self._pipelines_lock: threading.Lock = threading.Lock()
+        self.ready: threading.Event = threading.Event()
+        self.error: Optional[Exception] = None
+
+    def add(self, name: str, tagger: ExtensibleTagger, get_iterator_and_processor: IteratorAndProcessorFactory):
+        """ Registers a loaded [tagger] under [name] """
+        tagger.batch_scheduler = BatchScheduler(tagger.tag, batch_size=tagger.batch_size,
+                                                max_tokens=tagger.max_batch_tokens, max_wait=self.max_wait)
+        self.taggers[name] = (tagger, get_iterator_and_processor)
+        with self._pipelines_lock:
+            self._pipelines[name] = []
+
+    def load(self, models: Iterable[str], **tagger_kwargs):
+        """ Loads the taggers of [models] (cf. get_tagger) then marks the service as ready """
+        from . import utils
+        try:
+            for model in models:
+                tagger = utils.get_tagger(model, **tagger_kwargs)
+                self.add(model, tagger, utils.get_imports(utils.get_model(model)).get_iterator_and_processor)
+        except Exception as E:
+            self.error = E
+            raise
+        self.ready.set()
+
+    def tag(self, model: str, data: str, no_tokenizer: bool = False, output: str = "tsv") -> str:
+        """ Tags [data] with the tagger of [model]
+
+        :param model: Name of a loaded model
+        :param data: Text to tag, one token per line and sentences separated by an empty line if [no_tokenizer]
+        :param no_tokenizer: Do not tokenize [data]
+        :param output: "tsv" for the output of the default formatter, "json" for a list of sentences of tokens
+        :return: Serialized output
+        """
+        if model not in self.taggers:
+            raise UnknownModel(model)
+        if no_tokenizer:
+            check_pretokenized(data)
+        tagger, get_iterator_and_processor = self.taggers[model]
+        with self._pipelines_lock:
+            pipelines = self._pipelines[model]
+            iterator, processor = pipelines.pop() if pipelines else (None, None)
+        if iterator is None:
+            iterator, processor = get_iterator_and_processor(max_tokens=self.max_tokens)
+        try:
+            return self._tag(tagger, iterator, processor, data, no_tokenizer=no_tokenizer, output=output)
+        finally:
+            with self._pipelines_lock:
+                self._pipelines[model].append((iterator, processor))
+
+    @staticmethod
+    def _tag(tagger: ExtensibleTagger, iterator: DataIterator, processor: ProcessorPrototype, data: str,
+             no_tokenizer: bool, output: str) -> str:
+        if output == "json":
+            sentences: List[List[Dict[str, str]]] = [[]]
+            for token in tagger.iter_tag_token(data, iterator, processor, no_tokenizer=no_tokenizer,
+                                               empty_token_on_sent_break=True):
+                if token is None:
+                    sentences.append([])
+                else:
+                    sentences[-1].append(token)
+            return json.dumps({
+                "tasks": processor.tasks,
+                "sentences": [sentence for sentence in sentences if sentence]
+            }, ensure_ascii=False, default=dict)
+        return "".join(tagger.iter_tag(data, iterator, processor, formatter_class=Formatter,
+                                       no_tokenizer=no_tokenizer))
+
+    def close(self):
+        """ Stops the batch schedulers """
+        for tagger, _ in self.taggers.values():
+            tagger.batch_scheduler.close()
+
+
+class TaggerRequestHandler(BaseHTTPRequestHandler):
+    """ Routes of the server:
+
+    - GET /health: the server is running
+    - GET /ready: the models are loaded (503 until then)
+    - GET /models: names of the loaded models
+    - POST /tag/<model>?format=tsv|json&no_tokenizer=1: tags the body of the request, which is either plain text or
+      JSON with a "text" string or pre-tokenized "tokens" (list of sentences as lists of tokens)
+    """
+    server: "TaggerServer"
+
+    def send(self, status: int, body: str, content_type: str = "application/json"):
+        encoded = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "{}; charset=utf-8".format(content_type))
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def send_json(self, status: int, content: dict):
+        self.send(status, json.dumps(content, ensure_ascii=False))
+
+    def do_GET(self):
+        service = self.server.service
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif path == "/ready":
+            if service.ready.is_set():
+                self.send_json(200, {"status": "ready", "models": sorted(service.taggers)})
+            elif service.error is not None:
+                self.send_json(503, {"status": "failed", "error": str(service.error)})
+            else:
+                self.send_json(503, {"status": "loading"})
+        elif path == "/models":
+            self.send_json(200, {"models": sorted(service.taggers)})
+        else:
+            self.send_json(404, {"error": "Unknown route"})
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "tag":
+            return self.send_json(404, {"error": "Unknown route"})
+        if not service.ready.is_set():
+            return self.send_json(503, {"error": "Models are not loaded yet"})
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        no_tokenizer = query.get("no_tokenizer", "") in {"1", "true"}
+        if self.headers.get_content_type() == "application/json":
+            try:
+                content = json.loads(body)
+                if "tokens" in content:
+                    # Pre-tokenized input goes through the bypass tokenizer
+                    sentences = content["tokens"]
+                    if not isinstance(sentences, list) or any(
+                            not isinstance(sent, list) or not sent or
+                            any(not isinstance(token, str) or not token.strip() or "\n" in token for token in sent)
+                            for sent in sentences):
+                        return self.send_json(400, {
+                            "error": "Tokens should be non-empty lists of non-blank strings without line breaks"})
+                    body, no_tokenizer = "\n\n".join("\n".join(sent) for sent in sentences), True
+                else:
+                    body = content["text"]
+            except (ValueError, KeyError, TypeError):
+                return self.send_json(400, {"error": "Expected a JSON object with a text or a tokens key"})
+
+        output = query.get("format", "tsv")
+        if output not in {"tsv", "json"}:
+            return self.send_json(400, {"error": "Unknown format {}".format(output)})
+        try:
+            tagged = service.tag(parts[1], body, no_tokenizer=no_tokenizer, output=output)
+        except UnknownModel:
+            return self.send_json(404, {"error": "Unknown model {}".format(parts[1])})
+        except InvalidInput as E:
+            return self.send_json(400, {"error": str(E)})
+        except Exception as E:
+            traceback.print_exc()
+            return self.send_json(500, {"error": str(E)})
+        self.send(200, tagged, content_type="application/json" if output == "json" else "text/tab-separated-values")
+
+
+class TaggerServer(ThreadingHTTPServer):
+    """ HTTP server answering with a TaggerService """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], service: TaggerService):
+        super(TaggerServer, self).__init__(address, TaggerRequestHandler)
+        self.service: TaggerService = service
@@ -1,15 +1,21 @@
 import os
 import sys
-from typing import Tuple, Iterable, List, Union
+import functools
+import multiprocessing
+import warnings
+import traceback
+from typing import Tuple, Iterable, List, Union, Optional, Iterator
 from importlib import import_module
 
-import requests
-
 from .. import models
 from ..utils import Metadata, PATH, get_path
-from ..tagger import ExtensibleTagger
-from ..utils import ObjectCreator
-from pie.utils import model_spec
+from ..cache import SentenceCache, SqliteSentenceCache
+from ..profiling import Profiler, DocumentStats
+from ..utils import ObjectCreator, limit_torch_threads
+# The tagger (and therefore pie and torch) and the tokenizers are imported by the functions tagging, so that listing
+#   or downloading models stays fast
+if "typing" == "nottyping":
+    from ..tagger import ExtensibleTagger
 
 
 def check(model: str, force: bool = False) -> bool:
@@ -37,6 +43,7 @@ def get_imports(module):
 
 
 def _download(url, filename):
+    import requests
     with open(filename, 'wb') as f:
         response = requests.get(url, stream=True)
         total = response.headers.get('content-length')
@@ -80,7 +87,10 @@ def get_list() -> Iterable[Tuple[str, Metadata]]:
 
 
 def get_tagger(model: str, batch_size: int = 16, device="cpu", model_path=None,
-               quantize: bool = True, cache: bool = True) -> ExtensibleTagger:
+               quantize: bool = True, cache: bool = True,
+               max_batch_tokens: Optional[int] = None, pipelined: bool = False,
+               sentence_cache_size: int = 0, cache_file: Optional[str] = None,
+               profile: bool = False) -> "ExtensibleTagger":
     """ Retrieve the tagger
 
     :param model: Module of the tagger
@@ -89,15 +99,27 @@ def get_tagger(model: str, batch_size: int = 16, device="cpu", model_path=None,
     :param model_path: Path to the model if you want to override the package one
     :param quantize: Use Int8 quantization
     :param cache: Use cache
+    :param max_batch_tokens: Group sentences by length and cap batches to this number of padded tokens
+    :param pipelined: Run tokenization, tagging and post-processing concurrently
+    :param sentence_cache_size: If set, keeps tagged sentences in memory up to this number of tokens
+    :param cache_file: If set, path to a SQLite file where tagged sentences are kept across runs
+    :param profile: Record time and counters of each stage of the pipeline in tagger.profiler
     :return: Tagger
     """
+    from ..tagger import ExtensibleTagger
+    from pie.utils import model_spec
     module = get_model(model)
 
     disambiguator = getattr(get_imports(module), "Disambiguator", None)
     if isinstance(disambiguator, ObjectCreator):
         disambiguator = disambiguator.create()
+    sentence_cache = SqliteSentenceCache(cache_file) if cache_file else None
+    if sentence_cache_size:
+        sentence_cache = SentenceCache(sentence_cache_size, backend=sentence_cache)
     tagger = ExtensibleTagger(disambiguation=disambiguator, batch_size=batch_size, device=device,
-                              quantize=quantize, cache=cache)
+                              quantize=quantize, cache=cache, max_batch_tokens=max_batch_tokens,
+                              pipelined=pipelined, sentence_cache=sentence_cache,
+                              profiler=Profiler() if profile else None)
     model_spec_string = model_path or getattr(module, "Models")
     for model, tasks in model_spec(model_spec_string):
         tagger.add_model(model, *tasks)
@@ -105,12 +127,15 @@ def get_tagger(model: str, batch_size: int = 16, device="cpu", model_path=None,
 
 
 def tag_file(
-        model: str, tagger: ExtensibleTagger,
+        model: str, tagger: "ExtensibleTagger",
         fpath: str,
         reset_exclude_patterns: bool = False,
         exclude_patterns: List[str] = None,
         no_tokenizer: bool = False,
-        max_tokens: int = 256):
+        max_tokens: int = 256,
+        stream: bool = False,
+        shard_workers: int = 1,
+        replacer_cache_size: int = 0):
     """ Tag a file with a given model
 
     :param model: Module name of the model
@@ -119,9 +144,16 @@ def tag_file(
     :param reset_exclude_patterns: Remove all pre-registered token exclusion regular expressions
     :param exclude_patterns: New exclude patterns to add to the data iterator (Does not require reset)
     :param no_tokenizer: Does not use usual tokenizers (new line = word separator, two new lines = sentence_
+    :param max_tokens: Maximum number of tokens per sentence
+    :param stream: Read the file by blocks instead of loading it whole
+    :param shard_workers: Number of processes tagging shards of the file in parallel
+    :param replacer_cache_size: Number of token types whose normalization by the tokenizer is memoized
     """
+    from ..pipeline.tokenizers.memorizing import MemorizingTokenizer
     module = get_model(model)
     iterator, processor = getattr(get_imports(module), "get_iterator_and_processor")(max_tokens=max_tokens)
+    if replacer_cache_size and isinstance(iterator.tokenizer, MemorizingTokenizer):
+        iterator.tokenizer.cache_replacer(replacer_cache_size)
     # Remove first pattern
     if reset_exclude_patterns:
         iterator.reset_patterns()
@@ -131,10 +163,79 @@ def tag_file(
         for pattern in exclude_patterns:
             iterator.add_pattern(pattern)
 
-    tagger.tag_file(fpath, iterator=iterator, processor=processor, no_tokenizer=no_tokenizer)
+    tagger.tag_file(fpath, iterator=iterator, processor=processor, no_tokenizer=no_tokenizer, stream=stream,
+                    shard_workers=shard_workers)
     return True
 
 
+# Model and tagger shared with forked workers, set before the pool is created so that they are inherited
+#   copy-on-write instead of being pickled or loaded again
+_WORKER_TAGGER: Optional[Tuple[str, "ExtensibleTagger"]] = None
+
+
+class WorkerError(Exception):
+    """ Error raised while tagging a file in a worker process
+
+    The original exception might not survive pickling, so only its formatted traceback is sent back.
+    """
+
+
+def _tag_file_in_worker(fpath: str, **kwargs) -> Tuple[str, Optional[str], Optional[List[DocumentStats]]]:
+    model, tagger = _WORKER_TAGGER
+    # Only what was recorded for this file is sent back to the parent process
+    if tagger.profiler is not None:
+        tagger.profiler.reset()
+    try:
+        tag_file(model, tagger, fpath, **kwargs)
+    except Exception:
+        error = traceback.format_exc()
+    else:
+        error = None
+    return fpath, error, tagger.profiler.documents if tagger.profiler is not None else None
+
+
+def iter_tag_files(
+        model: str, tagger: "ExtensibleTagger",
+        fpaths: Iterable[str],
+        workers: int = 1,
+        **kwargs) -> Iterator[Tuple[str, Optional[Exception]]]:
+    """ Tag multiple files with a given model, possibly in parallel processes
+
+    With more than one worker, processes are forked once the tagger is loaded, sharing the model weights
+    copy-on-write. Files are dealt one at a time to whichever worker is free.
+
+    :param model: Module name of the model
+    :param tagger: Tagger that should be used
+    :param fpaths: Paths to the files to tag
+    :param workers: Number of processes to use
+    :param kwargs: Parameters for tag_file()
+    :yields: Path of each file, as they are done (not necessarily in order), and the error that occurred, if any.
+        Errors of worker processes are WorkerError carrying the traceback of the original exception
+    """
+    if workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+        warnings.warn("Forking processes is not available on this platform, files are tagged sequentially")
+        workers = 1
+
+    if workers <= 1:
+        for fpath in fpaths:
+            try:
+                tag_file(model, tagger, fpath, **kwargs)
+            except Exception as E:
+                yield fpath, E
+            else:
+                yield fpath, None
+        return
+
+    global _WORKER_TAGGER
+    _WORKER_TAGGER = (model, tagger)
+    with multiprocessing.get_context("fork").Pool(workers, initializer=limit_torch_threads) as pool:
+        results = pool.imap_unordered(functools.partial(_tag_file_in_worker, **kwargs), fpaths, chunksize=1)
+        for fpath, error, documents in results:
+            if documents is not None and tagger.profiler is not None:
+                tagger.profiler.merge(documents)
+            yield fpath, WorkerError(error) if error is not None else None
+
+
 def get_addons(model: str):
     """ Runs the `addons` function from a module """
     module = get_model(model)
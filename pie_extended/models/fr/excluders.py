@@ -47,6 +47,15 @@ class AujourdhuiExcluder(ExcluderPrototype):
         self.char_registry: CharRegistry = char_registry or CharRegistry()
         self.apostrophes = apostrophe
         self.re = re.compile("(aujourd)(["+self.apostrophes+"])(hui)", flags=re.IGNORECASE)
+        self.char_registry[AUJOURDHUI_CONSTANT]  # Registered now in case the registry gets frozen
+
+    @property
+    def masked_chars(self) -> Tuple[str, ...]:
+        return AUJOURDHUI_CONSTANT,
+
+    @property
+    def trigger_chars(self) -> Optional[str]:
+        return self.apostrophes
 
     def _replace(self, regex_match: Match) -> str:
         return regex_match.group(1) + \
@@ -58,11 +67,11 @@ class AujourdhuiExcluder(ExcluderPrototype):
         return self.re.sub(self._replace, value)
 
     def after_sentence_tokenizer(self, value: str) -> str:
+        mask = self.char_registry[AUJOURDHUI_CONSTANT]
+        if mask not in value:
+            return value
         for index_apo, apostrophe in enumerate(self.apostrophes):
-            value = value.replace(
-                self.char_registry[AUJOURDHUI_CONSTANT] + str(index_apo),
-                apostrophe
-            )
+            value = value.replace(mask + str(index_apo), apostrophe)
         return value
 
 
@@ -92,6 +101,14 @@ class FrenchCliticsExcluder(ExcluderPrototype):
         if add_space_after:
             self.space_after = " "
 
+    @property
+    def masked_chars(self) -> Tuple[str, ...]:
+        return self.char_registry.APOSTROPHE_CONSTANT, "-"
+
+    @property
+    def trigger_chars(self) -> Optional[str]:
+        return "-"
+
     def _replace_clitic(self, match: Match) -> str:
         # Group 1: - (of -t)
         # Group 2: t (of -t)
@@ -1,4 +1,4 @@
-from typing import Dict, Generator
+from typing import Dict
 from pie_extended.pipeline.postprocessor.glue import GlueProcessor
 
 
@@ -10,31 +10,12 @@ class FrGlueProcessor(GlueProcessor):
     EMPTY_TAG: Dict[str, str] = {"CAS": "CAS=x", "NOMB.": "NOMB.=x", "MODE": "MODE=x", "TEMPS": "TEMPS=x",
                                  "GENRE": "GENRE=x", "PERS.": "PERS.=x"}
 
-    # We need to change the definition of this function, because, for now,
-    # the model gives us an output like
+    # The model gives us an output like
     # MODE=imp
     # and not
     # imp
-    def _yield_annotation(
-            self,
-            token_dict: Dict[str, str]
-        ) -> Generator[str, None, None]:
-        # For each key we should return
-        for head in self._out:
-            if head not in self._glue:
-                yield head, token_dict[head]
-            else:
-                # Otherwise, we glue together things that should be glued together
-                joined = self._glue_char.join([
-                    # HERE
-                    # glued_task + "=" +
-                    token_dict[glued_task]
-                    for glued_task in self._glue[head]
-                    if token_dict[glued_task] != self._empty_tags.get(glued_task, None)
-                ])
-                if not joined:
-                    joined = self._glue_empty[head]
-                yield head, joined
+    # so that values are glued without the name of their task
+    GLUE_TASK_NAME = False
 
     def __init__(self, *args, **kwargs):
         super(FrGlueProcessor, self).__init__(*args, **kwargs)
@@ -34,6 +34,7 @@ class FrMemorizingTokenizer(MemorizingTokenizer):
     re_add_space_around_punct = re.compile(regexps.NON_WORD_NON_SPACE)
     re_remove_ending_apostrophe = re.compile(regexps.ENDING_APOSTROPHE)
     re_sentence_boundaries = re.compile(r"([" + chars.DOTS_EXCEPT_APOSTROPHES + r"]+\s*)+")
+    _sentence_boundaries = re_sentence_boundaries
 
     def __init__(self):
         super(FrMemorizingTokenizer, self).__init__()
@@ -46,6 +47,7 @@ class FrMemorizingTokenizer(MemorizingTokenizer):
             CompoundAbbreviationsExcluder(abbrs=ABBREVIATIONS, ignore_case=False, char_registry=self.char_registry),
             ReferenceExcluder(char_registry=self.char_registry),
         )
+        self.populate_char_registry()
 
     @staticmethod
     def _sentence_tokenizer_merge_matches(match):
@@ -56,8 +58,7 @@ class FrMemorizingTokenizer(MemorizingTokenizer):
     def _real_sentence_tokenizer(self, string: str) -> List[str]:
         string = self.re_sentence_boundaries.sub(self._sentence_tokenizer_merge_matches, string)
 
-        for excluder in self.normalizers:
-            string = excluder.after_sentence_tokenizer(string)
+        string = self.restore(string)
 
         return string.split("<SPLIT>")
 
@@ -77,8 +78,7 @@ class FrMemorizingTokenizer(MemorizingTokenizer):
         yield from sentences
 
     def normalizer(self, data: str) -> str:
-        for excluder in self.normalizers:
-            data = excluder.before_sentence_tokenizer(data)
+        data = self.exclude(data)
 
         data = self.re_add_space_around_punct.sub(
             r" \g<2> ",
@@ -87,9 +87,8 @@ class FrMemorizingTokenizer(MemorizingTokenizer):
         return data
 
     def replacer(self, inp: str):
-        for excluder in self.normalizers:
-            if not excluder.can_be_replaced and excluder.exclude_regexp.match(inp):
-                return inp
+        if self.excluded_from_replacement(inp):
+            return inp
 
         return self.re_remove_ending_apostrophe.sub("'", inp)\
             .replace("-t-", "-")  # Temp feature until retrain has been done
@@ -17,13 +17,13 @@ class FroRulesProcessor(RuleBasedProcessor):
 
     def rules(self, annotation: Dict[str, str]) -> Dict[str, str]:
         token = annotation["form"]
-        if self.PONCTU.match(token):
+        if self.classifier.match(self.PONCTU, token):
             if token in self.PONFORT:
                 pos = "PONfrt"
             else:
                 pos = "PONfbl"
             return {"form": token, "lemma": token, "POS": pos, "morph": "MORPH=empty", "treated": token}
-        elif self.NUMBER.match(token):
+        elif self.classifier.match(self.NUMBER, token):
             annotation["pos"] = "ADJcar"
         elif annotation["treated"] == "2":
             annotation["lemma"] = str(roman_number(annotation["form"]))
@@ -46,9 +46,8 @@ class FroGlueProcessor(GlueProcessor):
                                  "TEMPS": "TEMPS=x",
                                  "GENRE": "GENRE=x",
                                  "PERS.": "PERS.=x"}
+    # Tempfix because tasks contains their own name
+    GLUE_TASK_NAME = False
 
     def __init__(self, *args, **kwargs):
         super(FroGlueProcessor, self).__init__(*args, **kwargs)
-    
-    def _get_glued(self, glued_task: str, token_dict: Dict[str, str]):
-        return token_dict[glued_task]  # Tempfix because tasks contains their own name
@@ -17,7 +17,7 @@ _Dots_collections = r"[" + _Dots_except_apostrophe + "‘’]"
 
 
 class FroMemorizingTokenizer(MemorizingTokenizer):
-    re_add_space_around_punct = re.compile(r"(\s*)([^\w\s])(\s*)")
+    re_add_space_around_punct = re.compile(r"(\s*)([^\w\s\p{Co}])(\s*)")
     re_remove_ending_apostrophe = re.compile(r"(?<=\w)([\'’ʼ])")
     re_roman_number = re.compile(r"^"+regexps.RomanNumbers+"$")
     _sentence_boundaries = re.compile(
@@ -33,6 +33,7 @@ class FroMemorizingTokenizer(MemorizingTokenizer):
             ReferenceExcluder(char_registry=self.char_registry),
             DottedNumberExcluder(char_registry=self.char_registry),
         )
+        self.populate_char_registry()
 
     @staticmethod
     def _sentence_tokenizer_merge_matches(match):
@@ -43,8 +44,7 @@ class FroMemorizingTokenizer(MemorizingTokenizer):
     def _real_sentence_tokenizer(self, string: str) -> List[str]:
         string = self._sentence_boundaries.sub(self._sentence_tokenizer_merge_matches, string)
 
-        for normalizer in self.normalizers:
-            string = normalizer.after_sentence_tokenizer(string)
+        string = self.restore(string)
 
         return string.split("<SPLIT>")
 
@@ -64,8 +64,7 @@ class FroMemorizingTokenizer(MemorizingTokenizer):
         yield from sentences
 
     def normalizer(self, data: str) -> str:
-        for excluder in self.normalizers:
-            data = excluder.before_sentence_tokenizer(data)
+        data = self.exclude(data)
 
         data = self.re_add_space_around_punct.sub(
             r" \g<2> ",
@@ -80,9 +79,8 @@ class FroMemorizingTokenizer(MemorizingTokenizer):
         return str(out)
 
     def replacer(self, inp: str):
-        if self.re_roman_number.match(inp):
+        if self.classifier.match(self.re_roman_number, inp):
             return self.roman_to_number(inp)
-        for excluder in self.normalizers:
-            if not excluder.can_be_replaced and excluder.exclude_regexp.match(inp):
-                return inp
+        if self.excluded_from_replacement(inp):
+            return inp
         return self.re_remove_ending_apostrophe.sub("", inp)
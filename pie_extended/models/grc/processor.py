@@ -32,9 +32,8 @@ class GreekMorphProcessor(GlueProcessor):
         "pers": "-", "pos": "-", "tense": "-", "voice": "-"
     }
     KEEP_EMPTY = True
+    # Values are glued without the name of their task
+    GLUE_TASK_NAME = False
 
     def __init__(self, *args, **kwargs):
         super(GreekMorphProcessor, self).__init__(*args, **kwargs)
-
-    def _get_glued(self, glued_task: str, token_dict: Dict[str, str]):
-        return token_dict[glued_task]
@@ -1,30 +1,31 @@
 import regex as re
-from typing import List, Generator, Tuple
+from typing import List, Generator, Tuple, Optional
 import unicodedata
 
 from pie_extended.pipeline.tokenizers.memorizing import MemorizingTokenizer
 from pie_extended.pipeline.tokenizers.utils.excluder import (
     ReferenceExcluder,
     ExcluderPrototype,
-    DEFAULT_CHAR_REGISTRY
+    CharRegistry
 )
 
 _Dots_except_apostrophe = r".?!\"“”\"«»…\[\]\(\)„“"
 
 
 class GrcMemorizingTokenizer(MemorizingTokenizer):
-    re_add_space_around_punct = re.compile(r"(\s*)([^\w\s])(\s*)")
+    re_add_space_around_punct = re.compile(r"(\s*)([^\w\s\p{Co}])(\s*)")
     _sentence_boundaries = re.compile(
         r"([" + _Dots_except_apostrophe + r"]+\s*)+"
     )
 
-    def __init__(self):
+    def __init__(self, char_registry: Optional[CharRegistry] = None):
         super(GrcMemorizingTokenizer, self).__init__()
         self.tokens = []
-        self.char_registry = DEFAULT_CHAR_REGISTRY
+        self.char_registry: CharRegistry = CharRegistry() if char_registry is None else char_registry
         self.normalizers: Tuple[ExcluderPrototype, ...] = (
             ReferenceExcluder(char_registry=self.char_registry),
         )
+        self.populate_char_registry()
 
     @staticmethod
     def _sentence_tokenizer_merge_matches(match):
@@ -35,8 +36,7 @@ class GrcMemorizingTokenizer(MemorizingTokenizer):
     def _real_sentence_tokenizer(self, string: str) -> List[str]:
         string = self._sentence_boundaries.sub(self._sentence_tokenizer_merge_matches, string)
 
-        for normalizer in self.normalizers:
-            string = normalizer.after_sentence_tokenizer(string)
+        string = self.restore(string)
 
         return string.split("<SPLIT>")
 
@@ -56,8 +56,7 @@ class GrcMemorizingTokenizer(MemorizingTokenizer):
         yield from sentences
 
     def normalizer(self, data: str) -> str:
-        for excluder in self.normalizers:
-            data = excluder.before_sentence_tokenizer(data)
+        data = self.exclude(data)
 
         data = self.re_add_space_around_punct.sub(
             r" \g<2> ",
@@ -66,8 +65,7 @@ class GrcMemorizingTokenizer(MemorizingTokenizer):
         return data
 
     def replacer(self, inp: str):
-        for excluder in self.normalizers:
-            if not excluder.can_be_replaced and excluder.exclude_regexp.match(inp):
-                return inp
+        if self.excluded_from_replacement(inp):
+            return inp
 
         return unicodedata.normalize("NFKD", inp)
@@ -1,7 +1,8 @@
 import regex as re
 from typing import Dict, List, Optional, Generator, Tuple
 
-from pie_extended.pipeline.postprocessor.proto import ChainedProcessor, ProcessorPrototype
+from pie_extended.pipeline.postprocessor.proto import ChainedProcessor, ProcessorPrototype, BatchItem
+from pie_extended.pipeline.postprocessor.compiled import ProcessorPlan, Row
 from pie_extended.pipeline.postprocessor.glue import GlueProcessor
 from pie_extended.pipeline.postprocessor.rulebased import RuleBasedProcessor
 from pie_extended.utils import roman_number
@@ -71,10 +72,10 @@ class LatinRulesProcessor(RuleBasedProcessor):
                 "Dis": "_"
             }
 
-        if self.PONCTU.match(token):
+        if self.classifier.match(self.PONCTU, token):
             return {"form": token, "lemma": token, "pos": "PUNC", "morph": "MORPH=empty",
                     "treated": annotation['treated'], "Dis": "_"}
-        elif self.GREEK.match(token):
+        elif self.classifier.match(self.GREEK, token):
             return {"form": token, "lemma": "[Greek]", "pos": "FOR", "morph": "MORPH=empty",
                     "treated": annotation['treated'], "Dis": "_"}
         elif token.startswith("[IGN:"):
@@ -144,3 +145,42 @@ class MoodTenseVoice(ChainedProcessor):
     def reset(self):
         self.head_processor.reset()
 
+    def _get_batch(self, items: List[BatchItem]) -> List[List[Row]]:
+        if self._overrides(MoodTenseVoice, "get_dict", "reinsert", "_yield_key"):
+            return self._get_batch_by_token(items)
+        return [
+            [self.reinsert(token)] if rows is None else [dict(self._yield_key(dic)) for dic in rows]
+            for (token, _), rows in zip(items, self._get_head_batch(items, reinserted=False))
+        ]
+
+    def _plan(self) -> Optional[ProcessorPlan]:
+        """ Sub-tasks are split from the columns of the head processor, without the dictionary it builds """
+        if self._overrides(MoodTenseVoice, "get_dict", "_yield_key"):
+            return None
+        plan = self.head_processor._plan()
+        if plan is None or plan.stages:
+            return None
+        row = plan.row
+        keys, indexes = [], []
+        for key, index in zip(row.keys, row.indexes):
+            if "_" in key:
+                subkeys = key.split("_")
+                first = row.add_step(self._split_step(index, len(subkeys)), count=len(subkeys), inputs=[index])
+                keys.extend(subkeys)
+                indexes.extend(range(first, first + len(subkeys)))
+            else:
+                keys.append(key)
+                indexes.append(index)
+        if len(set(keys)) != len(keys):
+            return None
+        row.keys, row.indexes = keys, indexes
+        return plan
+
+    def _split_step(self, index: int, count: int):
+        padding = [self.empty_value] * count
+
+        def split(values: List[str]):
+            # Missing values are filled with empty ones, extra ones are dropped
+            values.extend((values[index].split("|") + padding)[:count])
+        return split
+
@@ -1,5 +1,5 @@
 import regex as re
-from typing import List, Generator, Tuple
+from typing import List, Generator, Tuple, Optional
 from unidecode import unidecode
 
 from pie_extended.models.fro.tokenizer import _Dots_except_apostrophe
@@ -10,24 +10,24 @@ from pie_extended.pipeline.tokenizers.utils.excluder import (
     ExcluderPrototype,
     RegexpExcluder,
     AbbreviationsRemoverExcluder,
-    DEFAULT_CHAR_REGISTRY
+    CharRegistry
 )
 from pie_extended.pipeline.tokenizers.utils import regexps
 from pie_extended.utils import roman_number
 
 
 class LatMemorizingTokenizer(MemorizingTokenizer):
-    re_add_space_around_punct = re.compile(r"(\s*)([^\w\s])(\s*)")
+    re_add_space_around_punct = re.compile(r"(\s*)([^\w\s\p{Co}])(\s*)")
     re_words = re.compile("^\w+$")
     _sentence_boundaries = re.compile(
         r"([" + _Dots_except_apostrophe + r"]+\s*)+"
     )
     re_roman_number = re.compile(r"^"+regexps.RomanNumbers+"$")
 
-    def __init__(self):
+    def __init__(self, char_registry: Optional[CharRegistry] = None):
         super(LatMemorizingTokenizer, self).__init__()
         self.tokens = []
-        self.char_registry = DEFAULT_CHAR_REGISTRY
+        self.char_registry: CharRegistry = CharRegistry() if char_registry is None else char_registry
         self.normalizers: Tuple[ExcluderPrototype, ...] = (
             ReferenceExcluder(char_registry=self.char_registry),
             ReferenceExcluder(regex_string=r"(\[IGN:[^\]]+\])", char_registry=self.char_registry),
@@ -35,6 +35,7 @@ class LatMemorizingTokenizer(MemorizingTokenizer):
             RegexpExcluder(r"(\p{No})"),
             AbbreviationsRemoverExcluder(abbrs=abbrs, char_registry=self.char_registry)
         )
+        self.populate_char_registry()
 
     @staticmethod
     def _sentence_tokenizer_merge_matches(match):
@@ -45,8 +46,7 @@ class LatMemorizingTokenizer(MemorizingTokenizer):
     def _real_sentence_tokenizer(self, string: str) -> List[str]:
         string = self._sentence_boundaries.sub(self._sentence_tokenizer_merge_matches, string)
 
-        for normalizer in self.normalizers:
-            string = normalizer.after_sentence_tokenizer(string)
+        string = self.restore(string)
 
         return string.split("<SPLIT>")
 
@@ -72,8 +72,7 @@ class LatMemorizingTokenizer(MemorizingTokenizer):
         yield from sentences
 
     def normalizer(self, data: str) -> str:
-        for excluder in self.normalizers:
-            data = excluder.before_sentence_tokenizer(data)
+        data = self.exclude(data)
 
         data = self.re_add_space_around_punct.sub(
             r" \g<2> ",
@@ -94,10 +93,9 @@ class LatMemorizingTokenizer(MemorizingTokenizer):
         :return:
 
         """
-        for excluder in self.normalizers:
-            if not excluder.can_be_replaced and excluder.exclude_regexp.match(inp):
-                return inp
-        if self.re_roman_number.match(inp):
+        if self.excluded_from_replacement(inp):
+            return inp
+        if self.classifier.match(self.re_roman_number, inp):
             return self.roman_to_number(inp)
         elif inp.isnumeric():
             if inp.isdigit():  # avoid. ↀ
@@ -1,18 +1,51 @@
 import regex as re
 from pie_extended.pipeline.tokenizers.memorizing import MemorizingTokenizer
-from typing import List, Generator, Tuple
+from typing import List, Generator, Tuple, Optional
 import unicodedata
 from pie_extended.pipeline.tokenizers.utils.excluder import (
     ReferenceExcluder,
-    DEFAULT_CHAR_REGISTRY,
     ApostropheExcluder,
+    CharRegistry,
     chars
 )
+from pie_extended.pipeline.tokenizers.utils.rules import SubstitutionRule, apply_rules
 
 _Dots_except_apostrophe = r".?!\"“”\"«»…\[\]\(\)„“"
 _SpaceNormalizer = re.compile(r"(\s+)")
 _APO = chars.APOSTROPHE
 
+# Rules applied once by OccMemorizingTokenizer._real_word_tokenizer to the segment it receives, before splitting it
+_TEXT_RULES: Tuple[SubstitutionRule, ...] = (
+    # Normalize apostrophe of qu' d' l'
+    SubstitutionRule(rf"((?:qu)|[dl])[{_APO}]", r"\1' ", triggers=_APO),
+    SubstitutionRule(r'(\d)\s(\d)', r'\1<PPLesp>\2'),
+)
+# Rules applied to each chunk of the split segment which is neither a normalized token nor a separator
+_CHUNK_RULES: Tuple[SubstitutionRule, ...] = (
+    SubstitutionRule(r"(-[nz]-)(\P{L}*)", r"\t\1\t\2", "-", flags=re.IGNORECASE),  # pas d'espace
+    SubstitutionRule(r"(\P{L}|^)"+rf"([dlmnst][{_APO}])", r"\1\t\2\t", _APO, flags=re.IGNORECASE),  # espace avant
+    SubstitutionRule(r"(\P{L}|^)(\p{L}*[qnv][us]"+rf"[{_APO}])", r"\1\t\2\t", _APO,
+                     flags=re.IGNORECASE),  # espace avant
+    SubstitutionRule(r"(\P{L}|^)(\p{L}*"+rf"qu[{_APO}])", r"\1\t\2\t", _APO,
+                     flags=re.IGNORECASE),  # espace avant  # TODO Duplicate of [qnv][us]' ?
+    SubstitutionRule(r"(\P{L}|^)(\p{L}*"+rf"ent[{_APO}])", r"\1\t\2\t", _APO, flags=re.IGNORECASE),  # espace avant
+    SubstitutionRule(r"(\P{L}|^)(\p{L}*"+rf"[çcbzu][{_APO}])", r"\1\t\2\t", _APO,
+                     flags=re.IGNORECASE),  # espace avant  # TODO Merge with [dlmnst] ?
+    SubstitutionRule(r"([\p{L}\d]+(\.[\p{L}\d]+)+)", r"\t\1\t", "."),  # espace avant et après
+    SubstitutionRule(r"\.($|\P{L})", r"\t.\1", "."),
+    SubstitutionRule(r"(\D|^),", r"\1\t,\t", ","),
+    SubstitutionRule(r",($|\D)", r"\t,\t\1", ","),
+    SubstitutionRule(rf"-(vos|ne|[st][eu]?[{_APO}]?|l[aoi{_APO}]s?|me|d[{_APO}]|en|[nv]os|u)"+r"($|\P{L})",
+                     r"\t-\1\t\2", "-", flags=re.IGNORECASE),  # espace après  # TODO Try to simplify ?
+    SubstitutionRule(rf"[{_APO}]"+r"([unv]\p{L}*)($|\P{L})", rf"\t'\1\t\2", _APO,
+                     flags=re.IGNORECASE),  # règle pour 'u 'us 'n 'v 'ns 'vs... # espace après
+    SubstitutionRule(rf"[{_APO}]"r"([dlmnsti])($|\P{L})", r"\t'\1\t\2", _APO,
+                     flags=re.IGNORECASE),  # règle pour 'm 't 'i 's 'ac ... # espace après
+    SubstitutionRule(r"(\p{P})(\p{P})", r"\t\1\t\2\t"),
+    SubstitutionRule(r"<PPLesp>", ' ', "<"),
+    SubstitutionRule(r"([<>])", r"\t\1\t", "<>"),
+)
+
 
 class OccMemorizingTokenizer(MemorizingTokenizer):
     """ Occitan Tokenizer with memorizing capacities (for normalization steps)
@@ -25,7 +58,7 @@ class OccMemorizingTokenizer(MemorizingTokenizer):
     _sentence_boundaries = re.compile(
         r"([" + _Dots_except_apostrophe + r"]+\s*)+"
     )
-    re_add_space_around_punct = re.compile(r"(\s*)([^\w\s])(\s*)")
+    re_add_space_around_punct = re.compile(r"(\s*)([^\w\s\p{Co}])(\s*)")
 
     # Define a pattern that matches any punctuation or symbol, with exceptions
     re_in_non_amb = re.compile(rf"(?![{_APO}\-,.<>])"+r"[\p{P}\p{S}]")
@@ -35,16 +68,17 @@ class OccMemorizingTokenizer(MemorizingTokenizer):
 
     re_split_match = re.compile(rf"(\.{2,})|({re_in_non_amb.pattern})|{re_tags.pattern}")
 
-    def __init__(self):
+    def __init__(self, char_registry: Optional[CharRegistry] = None):
         super(OccMemorizingTokenizer, self).__init__()
         self.tokens = []
-        self.char_registry = DEFAULT_CHAR_REGISTRY
+        self.char_registry: CharRegistry = CharRegistry() if char_registry is None else char_registry
         self.normalizers: Tuple[ReferenceExcluder] = (
             ReferenceExcluder(char_registry=self.char_registry),
         )
         self.re_split_step_one = re.compile(
             rf"(?:{self.normalizers[0].re.pattern})|({self.re_in_non_amb.pattern}|\s|\.{2,}|{self.re_tags.pattern})"
         )
+        self.populate_char_registry()
 
     @staticmethod
     def _sentence_tokenizer_merge_matches(match):
@@ -56,8 +90,7 @@ class OccMemorizingTokenizer(MemorizingTokenizer):
         string = _SpaceNormalizer.sub(" ", string.strip())
         string = self._sentence_boundaries.sub(self._sentence_tokenizer_merge_matches, string)
 
-        for normalizer in self.normalizers:
-            string = normalizer.after_sentence_tokenizer(string)
+        string = self.restore(string)
 
         return string.split("<SPLIT>")
 
@@ -69,11 +102,7 @@ class OccMemorizingTokenizer(MemorizingTokenizer):
         :returns: list of segmented tokens
         """
         res = []
-        # Normalize apostrophe of qu' d' l'
-        # ToDo: Unclear if we should not simply use the regulizer for apostrophes...
-        # ToDo: Unclear if it is not already taken care of by the rest of the regexp
-        text = re.sub(rf"((?:qu)|[dl])[{_APO}]", r"\1' ", text)
-        text = re.sub(r'(\d)\s(\d)', r'\1<PPLesp>\2', text)
+        text = apply_rules(_TEXT_RULES, text)
         for m in self.re_split_step_one.split(text):
             if not m or not m.strip():
                 continue
@@ -82,31 +111,14 @@ class OccMemorizingTokenizer(MemorizingTokenizer):
             elif self.re_split_match.match(m):
                 res.append(m)
             else:
-                m = re.sub(r"(-[nz]-)(\P{L}*)", r"\t\1\t\2", m, flags=re.IGNORECASE)  # pas d'espace
-                m = re.sub(r"(\P{L}|^)"+rf"([dlmnst][{_APO}])", r"\1\t\2\t", m, flags=re.IGNORECASE)  # espace avant
-                m = re.sub(r"(\P{L}|^)(\p{L}*[qnv][us]"+rf"[{_APO}])", r"\1\t\2\t", m, flags=re.IGNORECASE)  # espace avant
-                m = re.sub(r"(\P{L}|^)(\p{L}*"+rf"qu[{_APO}])", r"\1\t\2\t", m, flags=re.IGNORECASE)  # espace avant  # TODO Duplicate of [qnv][us]' ?
-                m = re.sub(r"(\P{L}|^)(\p{L}*"+rf"ent[{_APO}])", r"\1\t\2\t", m, flags=re.IGNORECASE)  # espace avant
-                m = re.sub(r"(\P{L}|^)(\p{L}*"+rf"[çcbzu][{_APO}])", r"\1\t\2\t", m, flags=re.IGNORECASE)  # espace avant  # TODO Merge with [dlmnst] ?
-                m = re.sub(r"([\p{L}\d]+(\.[\p{L}\d]+)+)", r"\t\1\t", m)  # espace avant et après
-                m = re.sub(r"\.($|\P{L})", r"\t.\1", m)
-                m = re.sub(r"(\D|^),", r"\1\t,\t", m)
-                m = re.sub(r",($|\D)", r"\t,\t\1", m)
-                m = re.sub(rf"-(vos|ne|[st][eu]?[{_APO}]?|l[aoi{_APO}]s?|me|d[{_APO}]|en|[nv]os|u)"+r"($|\P{L})", r"\t-\1\t\2", m, flags=re.IGNORECASE)  # espace après  # TODO Try to simplify ?
-                m = re.sub(rf"[{_APO}]"+r"([unv]\p{L}*)($|\P{L})", rf"\t'\1\t\2", m, flags=re.IGNORECASE)  # règle pour 'u 'us 'n 'v 'ns 'vs... # espace après
-                m = re.sub(rf"[{_APO}]"r"([dlmnsti])($|\P{L})", r"\t'\1\t\2", m, flags=re.IGNORECASE)  # règle pour 'm 't 'i 's 'ac ... # espace après
-                m = re.sub(r"(\p{P})(\p{P})", r"\t\1\t\2\t", m)
-                m = re.sub(r"<PPLesp>", ' ', m)
-                m = re.sub(r"([<>])", r"\t\1\t", m)
-                res.extend(m.split('\t'))
+                res.extend(apply_rules(_CHUNK_RULES, m).split('\t'))
 
         # Remove empty tokens
         res = [item for item in res if item.strip()]
         return res
 
     def normalizer(self, data: str) -> str:
-        for excluder in self.normalizers:
-            data = excluder.before_sentence_tokenizer(data)
+        data = self.exclude(data)
         return data
 
     def sentence_tokenizer(self, text: str, lower: bool = False) -> Generator[List[str], None, None]:
@@ -120,7 +132,7 @@ class OccMemorizingTokenizer(MemorizingTokenizer):
 
     def replacer(self, inp: str):
         for excluder in self.normalizers:
-            if excluder.exclude_regexp.match(inp):
+            if self.classifier.match(excluder.exclude_regexp, inp):
                 if excluder.can_be_replaced:
                     return inp
 
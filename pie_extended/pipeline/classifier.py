@@ -0,0 +1,178 @@
+import regex as re
+from typing import Dict, Optional, Pattern, Tuple, Sequence, List, Union, Iterable
+
+# Backreferences (\1, \g<1>), conditionals (?(1)...), calls to groups (?1), (?&name), (?P>name) and recursion (?R)
+RE_GROUP_REFERENCE = re.compile(r"\\(?:[1-9]|g<[-+]?\d)|\(\?(?:\(|[0-9+-]|&|P>|R\))")
+
+
+class PatternSet:
+    """ Ordered set of patterns compiled into as few regular expressions as possible, each an alternation of
+    consecutive patterns sharing the same flags, which tells which pattern matches the start of a token first.
+
+    Patterns which cannot be merged (named groups, which regex numbers alike across alternatives, anything referring to
+    groups by number or to the whole pattern, such as backreferences, conditionals or recursion, or anything making
+    the alternation invalid) are matched on their own.
+
+    :param patterns: Patterns, in the order they are checked
+
+    >>> patterns = PatternSet([re.compile(r"(\\d+)"), re.compile(r"(\\W+)"), re.compile(r"^[_||[^\\s\\w]]+$", re.V1)])
+    >>> len(patterns.regexes)
+    2
+    >>> [patterns.first_match(token) for token in ["12", "...", "_", "arma"]]
+    [0, 1, 2, None]
+    >>> patterns = PatternSet([re.compile(r"zz"), re.compile(r"(<)?\\w+(?(1)>)$")])
+    >>> len(patterns.regexes), patterns.first_match("<abc>"), patterns.first_match("<abc")
+    (2, 1, None)
+    """
+    __slots__ = ("patterns", "regexes")
+
+    def __init__(self, patterns: Iterable[Pattern]):
+        self.patterns: Tuple[Pattern, ...] = tuple(patterns)
+        # Compiled regexes along with the index of the pattern each of their top-level groups stands for, or the index
+        #   of the pattern they are
+        self.regexes: List[Tuple[Pattern, Union[Dict[str, int], int]]] = []
+
+        run: List[int] = []
+        for index, pattern in enumerate(self.patterns):
+            mergeable = self._mergeable(pattern)
+            if run and (not mergeable or self.patterns[run[0]].flags != pattern.flags):
+                self._add_run(run)
+                run = []
+            run.append(index)
+            if not mergeable:
+                self._add_run(run)
+                run = []
+        self._add_run(run)
+
+    @staticmethod
+    def _mergeable(pattern: Pattern) -> bool:
+        return not pattern.groupindex and not RE_GROUP_REFERENCE.search(pattern.pattern)
+
+    def _add_run(self, run: List[int]):
+        if not run:
+            return
+        if len(run) > 1:
+            names = {"_pattern_{}".format(index): index for index in run}
+            try:
+                regex = re.compile(
+                    "|".join("(?P<_pattern_{}>{})".format(index, self.patterns[index].pattern) for index in run),
+                    flags=self.patterns[run[0]].flags
+                )
+            except re.error:
+                for index in run:
+                    self._add_run([index])
+                return
+            self.regexes.append((regex, names))
+        else:
+            self.regexes.append((self.patterns[run[0]], run[0]))
+
+    def first_match(self, token: str) -> Optional[int]:
+        """ Index of the first pattern matching the start of [token], None if none does """
+        for regex, names in self.regexes:
+            match = regex.match(token)
+            if match is not None:
+                if isinstance(names, int):
+                    return names
+                # Alternatives are tried in order, so the group which matched is the one of the first pattern matching
+                return names[match.lastgroup]
+        return None
+
+
+class TokenClassifier:
+    """ Memoizes the classification of token types by regular expressions (exclusion patterns, punctuation, Greek,
+    roman numbers...), so that a form seen again, or checked against the same pattern by another step of the
+    pipeline (iterator, tokenizer, post-processors), does not go through the regular expression again.
+
+    Results only depend on the pattern and the token, so one classifier can be shared by every tokenizer, iterator and
+    processor of a process (cf. DEFAULT_TOKEN_CLASSIFIER). Memos of a pattern are emptied once they reach [max_size]
+    tokens.
+
+    :param max_size: Maximum number of tokens memoized per pattern (or sequence of patterns)
+
+    >>> import regex
+    >>> classifier = TokenClassifier()
+    >>> punctuation, number = regex.compile(r"^\\W+$"), regex.compile(r"^\\d+$")
+    >>> classifier.match(punctuation, "..."), classifier.match(punctuation, "arma"), classifier.match(punctuation, "...")
+    (True, False, True)
+    >>> classifier.first_match((number, punctuation), "?"), classifier.first_match((number, punctuation), "arma")
+    (1, None)
+    >>> classifier.hits, classifier.misses
+    (1, 4)
+    """
+    def __init__(self, max_size: int = 100000):
+        self.max_size: int = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._matches: Dict[Pattern, Dict[str, bool]] = {}
+        self._first_matches: Dict[Tuple[Pattern, ...], Dict[str, Optional[int]]] = {}
+        self._pattern_sets: Dict[Tuple[Pattern, ...], PatternSet] = {}
+
+    def _memo(self, pattern: Pattern) -> Dict[str, bool]:
+        memo = self._matches.get(pattern)
+        if memo is None:
+            memo = self._matches[pattern] = {}
+        return memo
+
+    def _classify(self, memo: Dict[str, bool], pattern: Pattern, token: str) -> bool:
+        if len(memo) >= self.max_size:
+            memo.clear()
+        matched = memo[token] = pattern.match(token) is not None
+        return matched
+
+    def match(self, pattern: Pattern, token: str) -> bool:
+        """ Whether [pattern] matches the start of [token] """
+        memo = self._memo(pattern)
+        matched = memo.get(token)
+        if matched is None:
+            self.misses += 1
+            return self._classify(memo, pattern, token)
+        self.hits += 1
+        return matched
+
+    def pattern_set(self, patterns: Union[PatternSet, Sequence[Pattern]]) -> PatternSet:
+        """ Compiled PatternSet of [patterns], built once for each sequence of patterns """
+        if isinstance(patterns, PatternSet):
+            return patterns
+        patterns = tuple(patterns)
+        pattern_set = self._pattern_sets.get(patterns)
+        if pattern_set is None:
+            pattern_set = self._pattern_sets[patterns] = PatternSet(patterns)
+        return pattern_set
+
+    def first_match(self, patterns: Union[PatternSet, Sequence[Pattern]], token: str) -> Optional[int]:
+        """ Index of the first of [patterns] matching the start of [token], None if none does """
+        return self.first_matches(patterns, [token])[0]
+
+    def first_matches(self, patterns: Union[PatternSet, Sequence[Pattern]], tokens: Sequence[str]
+                      ) -> List[Optional[int]]:
+        """ Index of the first of [patterns] matching the start of each of [tokens], None where none does """
+        pattern_set = self.pattern_set(patterns)
+        memo = self._first_matches.get(pattern_set.patterns)
+        if memo is None:
+            memo = self._first_matches[pattern_set.patterns] = {}
+        out = []
+        for token in tokens:
+            if token in memo:
+                self.hits += 1
+                out.append(memo[token])
+                continue
+            self.misses += 1
+            if len(memo) >= self.max_size:
+                memo.clear()
+            first = memo[token] = pattern_set.first_match(token)
+            out.append(first)
+        return out
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
+
+    def clear(self):
+        self._matches.clear()
+        self._first_matches.clear()
+        self._pattern_sets.clear()
+
+
+# Classifier shared by default by the tokenizers, iterators and processors
+DEFAULT_TOKEN_CLASSIFIER = TokenClassifier()
@@ -1,5 +1,6 @@
 from typing import List, Iterable, Callable, Dict
 import sys
+from ..postprocessor.rows import AnnotationRow
 
 
 class Formatter:  # Default is TSV
@@ -20,6 +21,9 @@ class Formatter:  # Default is TSV
 
     def format_line_3_6(self, annotation: Dict[str, str]) -> List[str]:
         """ Format the tags """
+        if isinstance(annotation, AnnotationRow):
+            # Values are taken from the row at once, through its schema
+            return list(annotation.select(["form", *self.tasks]))
         return [annotation["form"]] + [annotation[task] for task in self.tasks]
 
     def format_line_3_7(self, annotation: Dict[str, str]) -> List[str]:
@@ -1,8 +1,10 @@
 import regex as re
 
-from typing import List, Tuple, Dict, Iterable, Pattern, Union
+from typing import List, Tuple, Dict, Iterable, Pattern, Union, Optional, TextIO
 
 from pie_extended.pipeline.tokenizers.simple_tokenizer import SimpleTokenizer
+from pie_extended.pipeline.classifier import TokenClassifier, PatternSet, DEFAULT_TOKEN_CLASSIFIER
+from pie_extended.profiling import Profiler
 from enum import Enum
 
 
@@ -16,6 +18,9 @@ class GenericExcludePatterns(Enum):
 
 
 class DataIterator:
+    # Memo of the patterns matching each token, shared with the tokenizers and processors using the same patterns
+    classifier: TokenClassifier = DEFAULT_TOKEN_CLASSIFIER
+
     def __init__(self, tokenizer: SimpleTokenizer = None, exclude_patterns: List[Union[str, Pattern]] = None,
                  max_tokens: int = 256):
         """ Iterator used to parse the text and returns bits to tag
@@ -24,6 +29,7 @@ class DataIterator:
         """
         self.tokenizer: SimpleTokenizer = tokenizer or SimpleTokenizer()
         self.exclude_patterns: List[Pattern] = []
+        self._matcher: Optional[PatternSet] = None
         if exclude_patterns:
             for pattern in exclude_patterns:
                 self.add_pattern(pattern)
@@ -53,6 +59,19 @@ class DataIterator:
         """
         self.exclude_patterns = []
 
+    @property
+    def matcher(self) -> PatternSet:
+        """ Exclude patterns compiled into a single matcher, rebuilt when they change
+
+        >>> x = DataIterator(exclude_patterns=[r'\W+', GenericExcludePatterns.PassageMarker])
+        >>> x.matcher.first_match("_Passage_45_78"), x.matcher.first_match("...")
+        (1, 0)
+        """
+        patterns = tuple(self.exclude_patterns)
+        if self._matcher is None or self._matcher.patterns != patterns:
+            self._matcher = PatternSet(patterns)
+        return self._matcher
+
     def exclude_tokens(self, sentence: List[str]) -> Tuple[List[str], Dict[int, str]]:
         """ Removes punctuation from a list and keeps its index
 
@@ -83,15 +102,11 @@ class DataIterator:
             return sentence, {}
 
         clean, removed = [], {}
-        for index, token in enumerate(sentence):
-            match = False
-            for exclude_pattern in self.exclude_patterns:
-                if exclude_pattern.match(token):
-                    removed[index] = token
-                    match = True
-                    break
-            if not match:
+        for index, (token, match) in enumerate(zip(sentence, self.classifier.first_matches(self.matcher, sentence))):
+            if match is None:
                 clean.append(token)
+            else:
+                removed[index] = token
 
         return clean, removed
 
@@ -103,31 +118,92 @@ class DataIterator:
                 for n in range(0, len(sentence), self.max_tokens):
                     yield sentence[n:n+self.max_tokens]
 
-    def __call__(self, data: str, lower: bool = False,
-                 no_tokenizer: bool = False) -> Iterable[Tuple[List[str], int, Dict[int, str]]]:
+    def read_blocks(self, file: TextIO, block_size: int = 1024 * 1024, no_tokenizer: bool = False,
+                    max_block_size: Optional[int] = None) -> Iterable[str]:
+        """ Reads an opened file by blocks of text that can be tokenized independently.
+
+        Blocks are cut at the last safe boundary found by the tokenizer (cf. SimpleTokenizer.stream_boundary). If no
+        boundary is found before the buffer reaches [max_block_size], the buffer is cut after its last sentence-final
+        punctuation, line break or space (cf. SimpleTokenizer.stream_fallback_boundary) to keep memory bounded, which
+        might split a sentence.
+
+        :param file: Opened text file
+        :param block_size: Number of characters read at once
+        :param no_tokenizer: Whether the data will go through the bypass_tokenizer
+        :param max_block_size: Maximum size of a block (unless it has no space to be cut at), defaults to four times
+            [block_size]
+        :yields: Blocks of text
+
+        >>> import io
+        >>> x = DataIterator()
+        >>> list(x.read_blocks(io.StringIO("Prima.\\n\\nSecunda.\\n\\nTertia."), block_size=8))
+        ['Prima.\\n\\n', 'Secunda.\\n\\n', 'Tertia.']
+        >>> list(x.read_blocks(io.StringIO("Prima. Secunda. Tertia."), block_size=4, max_block_size=8))
+        ['Prima. ', 'Secunda. ', 'Tertia.']
+        """
+        max_block_size = max_block_size or block_size * 4
+        buffer = ""
+        while True:
+            data = file.read(block_size)
+            if not data:
+                break
+            buffer += data
+            cut = self.tokenizer.stream_boundary(buffer, no_tokenizer=no_tokenizer)
+            if not cut and len(buffer) >= max_block_size:
+                cut = self.tokenizer.stream_fallback_boundary(buffer[:max_block_size], no_tokenizer=no_tokenizer) or \
+                    self.tokenizer.stream_fallback_boundary(buffer, no_tokenizer=no_tokenizer)
+            if cut:
+                yield buffer[:cut]
+                buffer = buffer[cut:]
+        if buffer:
+            yield buffer
+
+    def __call__(self, data: Union[str, Iterable[str]], lower: bool = False,
+                 no_tokenizer: bool = False,
+                 profiler: Optional[Profiler] = None) -> Iterable[Tuple[List[str], int, Dict[int, str]]]:
         """ Default iter data takes a text, an option to make lower
         and yield lists of words along with the length of the list
 
-        :param data: A plain text
+        :param data: A plain text or an iterable of text blocks (cf. DataIterator.read_blocks)
         :param lower: Whether or not to lower the text
+        :param profiler: If set, records the time spent in the tokenizer and in the exclusion of tokens
         :yields: (Sentence as a list of word, Size of the sentence, Elements removed from the sentence)
+
+        >>> x = DataIterator(exclude_patterns=[r'\W+'])
+        >>> list(x(["Prima sententia .\\n\\n", "Secunda !"]))
+        [(['Prima', 'sententia'], 2, {2: '.'}), (['Secunda'], 1, {1: '!'})]
         """
-        sentences = []
+        if isinstance(data, str):
+            data = [data]
 
         func = self.tokenizer.sentence_tokenizer
         if no_tokenizer:
             func = self.tokenizer.bypass_tokenizer
 
+        exclude_tokens = self.exclude_tokens
+        if profiler is not None:
+            exclude_tokens = profiler.wrap("exclude", exclude_tokens, sentences=1)
+
+        # A sentence is only yielded once the next non-empty one is found, because sentences made of
+        #   excluded tokens only are merged into the previous one.
+        previous = None
         last_sentence_index = 0
-        for sentence in self._max_out(func(data, lower=lower)):
-            clean_sentence, removed_from_input = self.exclude_tokens(sentence)
-            if len(clean_sentence) == 0 and len(sentences):
-                sentences[-1][2].update({
-                    last_sentence_index + removed_index: removed_value
-                    for removed_index, removed_value in removed_from_input.items()
-                })
-                last_sentence_index += len(removed_from_input)
-            else:
-                sentences.append((clean_sentence, len(clean_sentence), removed_from_input))
-                last_sentence_index = len(sentence)
-        yield from sentences
+        for block in data:
+            sentences = func(block, lower=lower)
+            if profiler is not None:
+                sentences = profiler.iter_sentences("tokenize", sentences)
+            for sentence in self._max_out(sentences):
+                clean_sentence, removed_from_input = exclude_tokens(sentence)
+                if len(clean_sentence) == 0 and previous is not None:
+                    previous[2].update({
+                        last_sentence_index + removed_index: removed_value
+                        for removed_index, removed_value in removed_from_input.items()
+                    })
+                    last_sentence_index += len(removed_from_input)
+                else:
+                    if previous is not None:
+                        yield previous
+                    previous = (clean_sentence, len(clean_sentence), removed_from_input)
+                    last_sentence_index = len(sentence)
+        if previous is not None:
+            yield previous
@@ -0,0 +1,223 @@
+from sys import intern
+from typing import List, Dict, Callable, Optional, Sequence, MutableMapping, Tuple, Set
+import numpy as np
+from .rows import RowSchema, AnnotationRow, tuple_getter
+
+Row = MutableMapping[str, str]
+GetDict = Callable[[str, List[str]], List[Row]]
+Stage = Callable[[str, List[Row]], List[Row]]
+# Function given the tagged tokens of a window (token and tags), returning the GetDict of each of them, in order
+GetWindow = Callable[[Sequence[Tuple[str, List[str]]]], GetDict]
+
+
+class RowPlan:
+    """ Builds the annotation of a token from its tags in one go. Values are kept in a flat list, starting with the
+    token and its tags, to which each of .steps appends the values it derives from the previous ones (split or glued
+    tags for example). The row is then made of the values at .indexes, under .keys.
+
+    :param tasks: Tasks of the tags, in the order they are given
+
+    >>> plan = RowPlan(["lemma", "pos"])
+    >>> plan.add_step(lambda values: values.append(values[1].upper()))
+    3
+    >>> plan.keys, plan.indexes = ["form", "LEMMA", "pos"], [0, 3, 2]
+    >>> plan.build("arma", ["arma", "NOMcom"])
+    {'form': 'arma', 'LEMMA': 'ARMA', 'pos': 'NOMcom'}
+    """
+    __slots__ = ("tags", "size", "steps", "keys", "indexes", "from_form")
+
+    def __init__(self, tasks: Sequence[str]):
+        self.tags: int = len(tasks)
+        self.size: int = 1 + len(tasks)
+        self.steps: List[Callable[[List[str]], None]] = []
+        self.keys: List[str] = ["form", *tasks]
+        self.indexes: List[int] = list(range(self.size))
+        # Values depending on the token
+        self.from_form: Set[int] = {0}
+
+    @property
+    def positions(self) -> Dict[str, int]:
+        """ Index of the value of each key of the row """
+        return dict(zip(self.keys, self.indexes))
+
+    @property
+    def from_tags(self) -> bool:
+        """ Whether the values of the row, but the token itself (once at most), only depend on the tags """
+        indexes = [index for index in self.indexes if index in self.from_form]
+        return indexes == [0] or not indexes
+
+    def add_step(self, step: Callable[[List[str]], None], count: int = 1, inputs: Optional[Sequence[int]] = None
+                 ) -> int:
+        """ Adds a [step] appending [count] values, returns the index of the first one
+
+        :param inputs: Indexes of the values the step reads, None if unknown
+        """
+        self.steps.append(step)
+        self.size += count
+        if inputs is None or any(index in self.from_form for index in inputs):
+            self.from_form.update(range(self.size - count, self.size))
+        return self.size - count
+
+    def build(self, token: str, tags: List[str]) -> AnnotationRow:
+        values = [token, *tags]
+        for step in self.steps:
+            step(values)
+        return RowSchema.of(self.keys).row([values[index] for index in self.indexes])
+
+
+class TagTable:
+    """ Tags of each task encoded as integer ids, as label encoders do, along with the values a RowPlan derives from
+    each combination of them, computed once and then looked up by id.
+
+    Each task has its vocabulary, to which tags are added when they are first seen. The tags of a batch of tokens
+    become an array of ids, one row per token and one column per task, whose distinct rows are each given the index of
+    their output in .outputs: the values of the row, but the token, which is put back in them.
+
+    :param plan: Plan of the rows, whose values only depend on the tags (cf. RowPlan.from_tags)
+    :param max_size: Number of combinations of tags after which the table is emptied, before the next batch
+
+    >>> plan = RowPlan(["lemma", "pos"])
+    >>> upper = plan.add_step(lambda values: values.append(values[1].upper()), inputs=[1])
+    >>> plan.keys, plan.indexes = ["LEMMA", "form", "pos"], [upper, 0, 2]
+    >>> table = TagTable(plan)
+    >>> table.encode([["arma", "NOMcom"], ["cano", "VER"], ["arma", "NOMcom"]]).tolist()
+    [[0, 0], [1, 1], [0, 0]]
+    >>> table.values(["arma", "cano", "Arma"], [["arma", "NOMcom"], ["cano", "VER"], ["arma", "NOMcom"]])
+    [('ARMA', 'arma', 'NOMcom'), ('CANO', 'cano', 'VER'), ('ARMA', 'Arma', 'NOMcom')]
+    >>> table.vocabularies, len(table.outputs)
+    ([{'arma': 0, 'cano': 1}, {'NOMcom': 0, 'VER': 1}], 2)
+    """
+    __slots__ = ("vocabularies", "outputs", "max_size", "_combinations", "_steps", "_select", "_form")
+
+    def __init__(self, plan: RowPlan, max_size: int = 0):
+        if not plan.from_tags:
+            raise ValueError("Values of the rows depend on the token")
+        self.vocabularies: List[Dict[str, int]] = [{} for _ in range(plan.tags)]
+        # Values before and after the token, for each combination of tags
+        self.outputs: List[Tuple[Tuple[str, ...], Tuple[str, ...]]] = []
+        self.max_size: int = max_size
+        self._combinations: Dict[Tuple[int, ...], int] = {}
+        self._steps = tuple(plan.steps)
+        self._select = tuple_getter(plan.indexes)
+        self._form: Optional[int] = plan.indexes.index(0) if 0 in plan.indexes else None
+
+    def clear(self):
+        for vocabulary in self.vocabularies:
+            vocabulary.clear()
+        self.outputs.clear()
+        self._combinations.clear()
+
+    def encode(self, tags: Sequence[Sequence[str]]) -> np.ndarray:
+        """ Ids of [tags], the tags of each token, in the vocabulary of their task """
+        ids = np.empty((len(tags), len(self.vocabularies)), dtype=np.int64)
+        for task, vocabulary in enumerate(self.vocabularies):
+            add = vocabulary.setdefault
+            ids[:, task] = [add(token_tags[task], len(vocabulary)) for token_tags in tags]
+        return ids
+
+    def _output(self, tags: Sequence[str]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        values = ["", *map(intern, tags)]
+        for step in self._steps:
+            step(values)
+        selected = self._select(values)
+        if self._form is None:
+            return selected, ()
+        return selected[:self._form], selected[self._form + 1:]
+
+    def values(self, tokens: Sequence[str], tags: Sequence[Sequence[str]]) -> List[Tuple[str, ...]]:
+        """ Values of the rows of [tokens] and their [tags] """
+        if not tokens:
+            return []
+        if self.max_size and len(self.outputs) >= self.max_size:
+            self.clear()
+        combinations, first, inverse = np.unique(self.encode(tags), axis=0, return_index=True, return_inverse=True)
+        outputs, known = self.outputs, self._combinations
+        lookup = np.empty(len(combinations), dtype=np.int64)
+        for row, (combination, index) in enumerate(zip(map(tuple, combinations.tolist()), first.tolist())):
+            output = known.get(combination)
+            if output is None:
+                output = known[combination] = len(outputs)
+                outputs.append(self._output(tags[index]))
+            lookup[row] = output
+        if self._form is None:
+            return [outputs[output][0] for output in lookup[inverse.reshape(-1)].tolist()]
+        return [
+            before + (intern(token), ) + after
+            for token, (before, after) in zip(tokens, map(outputs.__getitem__, lookup[inverse.reshape(-1)].tolist()))
+        ]
+
+
+class ProcessorPlan:
+    """ Compiled ProcessorPrototype.get_dict() of a chain of processors: the row of each token is built by a RowPlan,
+    then goes through .stages, functions taking the token and the list of its rows and returning its new list of rows
+    (memory, splitting, rules...)
+
+    :param row: Plan of the row built from the tags
+    :param stages: Functions applied to the rows, in order
+    """
+    __slots__ = ("row", "stages")
+
+    def __init__(self, row: RowPlan, stages: Optional[List[Stage]] = None):
+        self.row: RowPlan = row
+        self.stages: List[Stage] = stages or []
+
+    def _build(self) -> Callable[[str, List[str]], Tuple[str, ...]]:
+        steps, select = tuple(self.row.steps), tuple_getter(self.row.indexes)
+
+        def build(token: str, tags: List[str]) -> Tuple[str, ...]:
+            values = [*map(intern, (token, *tags))]
+            for step in steps:
+                step(values)
+            return select(values)
+        return build
+
+    def function(self, fallback: GetDict) -> GetDict:
+        """ Flat function computing the rows of a token. Tags whose number is not the one the plan was made for are
+        given to [fallback]
+
+        :param fallback: Function computing the rows of tags the plan cannot build
+        """
+        build, stages, size = self._build(), tuple(self.stages), self.row.tags
+        schema = RowSchema.of(self.row.keys)
+
+        def get_dict(token: str, tags: List[str]) -> List[Row]:
+            if len(tags) != size:
+                return fallback(token, tags)
+            rows = [AnnotationRow(schema, build(token, tags))]
+            for stage in stages:
+                rows = stage(token, rows)
+            return rows
+        return get_dict
+
+    def window_function(self, fallback: GetDict, table_size: int = 0) -> GetWindow:
+        """ Function computing the row values of all the tagged tokens of a window at once, through a TagTable when
+        they only depend on the tags, and returning the function giving the rows of each of these tokens, which is
+        to be called for each of them in the same order (the stages run token after token, as they might depend on
+        the document, such as memory or reinsertions)
+
+        :param fallback: Function computing the rows of tags the plan cannot build
+        :param table_size: Number of combinations of tags after which the TagTable is emptied, 0 for none
+        """
+        stages, size = tuple(self.stages), self.row.tags
+        schema = RowSchema.of(self.row.keys)
+        if self.row.from_tags:
+            values = TagTable(self.row, max_size=table_size).values
+        else:
+            build = self._build()
+
+            def values(tokens: Sequence[str], tags: Sequence[List[str]]) -> List[Tuple[str, ...]]:
+                return [build(token, token_tags) for token, token_tags in zip(tokens, tags)]
+
+        def get_window(items: Sequence[Tuple[str, List[str]]]) -> GetDict:
+            tagged = [item for item in items if len(item[1]) == size]
+            data = iter(values([token for token, _ in tagged], [tags for _, tags in tagged]))
+
+            def get_dict(token: str, tags: List[str]) -> List[Row]:
+                if len(tags) != size:
+                    return fallback(token, tags)
+                rows = [AnnotationRow(schema, next(data))]
+                for stage in stages:
+                    rows = stage(token, rows)
+                return rows
+            return get_dict
+        return get_window
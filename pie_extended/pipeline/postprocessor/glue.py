@@ -1,5 +1,62 @@
-from pie_extended.pipeline.postprocessor.proto import ChainedProcessor, ProcessorPrototype, RenamedTaskProcessor
-from typing import Generator, Dict, List
+from pie_extended.pipeline.postprocessor.proto import ChainedProcessor, ProcessorPrototype, RenamedTaskProcessor, \
+    BatchItem
+from pie_extended.pipeline.postprocessor.compiled import ProcessorPlan, Row
+from pie_extended.pipeline.postprocessor.rows import RowSchema, AnnotationRow, tuple_getter
+from typing import Generator, Dict, List, Optional, Tuple, Callable, Sequence, Mapping
+import sys
+
+
+class GluedColumn:
+    """ Value of a column glued from several tasks. Each distinct combination of their values is glued once: the
+    glued string is kept (interned) in a cache, emptied once it reaches [max_size] combinations, and shared by every
+    token with the same values.
+
+    :param tasks: Tasks glued together
+    :param prefixes: What precedes the value of each task
+    :param empty_tags: Value meaning the task is empty for each task, None if there is none
+    :param glue_char: String between glued values
+    :param glue_empty: Value of the column when all glued values are empty
+    :param keep_empty: Whether empty values are glued as well
+    :param max_size: Maximum number of combinations kept
+
+    >>> column = GluedColumn(["Case", "Numb"], ["Case=", "Numb="], ["_", "_"], "|", "MORPH=empty")
+    >>> column.glue(("Nom", "_")), column.glue(("_", "_"))
+    ('Case=Nom', 'MORPH=empty')
+    >>> column.glue(("Nom", "_")) is column.glue(tuple(["No" + "m", "_"]))
+    True
+    """
+    __slots__ = ("tasks", "parts", "glue_char", "glue_empty", "keep_empty", "max_size", "cache", "getter")
+
+    def __init__(self, tasks: Sequence[str], prefixes: Sequence[str], empty_tags: Sequence[Optional[str]],
+                 glue_char: str, glue_empty: str, keep_empty: bool = False, max_size: int = 10000):
+        self.tasks: Tuple[str, ...] = tuple(tasks)
+        self.parts: Tuple[Tuple[str, Optional[str]], ...] = tuple(zip(prefixes, empty_tags))
+        self.glue_char: str = glue_char
+        self.glue_empty: str = glue_empty
+        self.keep_empty: bool = keep_empty
+        self.max_size: int = max_size
+        self.cache: Dict[Tuple[str, ...], str] = {}
+        self.getter: Callable[[Mapping[str, str]], Tuple[str, ...]] = tuple_getter(self.tasks)
+
+    def glue(self, values: Tuple[str, ...]) -> str:
+        """ Glued value of the [values] of .tasks """
+        glued = self.cache.get(values)
+        if glued is None:
+            if len(self.cache) >= self.max_size:
+                self.cache.clear()
+            glued = self.glue_char.join([
+                prefix + value
+                for (prefix, empty), value in zip(self.parts, values)
+                if self.keep_empty or value != empty
+            ])
+            glued = self.cache[values] = sys.intern(glued or self.glue_empty)
+        return glued
+
+    def glue_row(self, row: Mapping[str, str]) -> str:
+        """ Glued value of .tasks in [row] """
+        if isinstance(row, AnnotationRow):
+            return self.glue(row.select(self.tasks))
+        return self.glue(self.getter(row))
 
 
 class GlueProcessor(ChainedProcessor):
@@ -51,6 +108,10 @@ class GlueProcessor(ChainedProcessor):
     EMPTY_TAG: Dict[str, str] = {"Case": "_", "Numb": "_", "Deg": "_", "Mood": "_", "Tense": "_", "Voice": "_",
                                  "Person": "_"}
     KEEP_EMPTY = False
+    # Whether glued values are preceded by the name of their task -> Tense=Pres, or not -> Pres
+    GLUE_TASK_NAME: bool = True
+    # Maximum number of combinations of glued values kept for each glued column (cf. GluedColumn)
+    GLUE_CACHE_SIZE: int = 10000
 
     def __init__(self, *args, **kwargs):
         super(GlueProcessor, self).__init__(*args, **kwargs)
@@ -62,6 +123,13 @@ class GlueProcessor(ChainedProcessor):
         self._glue_empty = self.GLUE_EMPTY
         self._empty_tags = self.EMPTY_TAG
         self._keep_empty = self.KEEP_EMPTY
+        self._glue_task_name = self.GLUE_TASK_NAME
+        # Columns to output, with how they are glued if they are, once tasks are set (cf. set_tasks())
+        self._glue_plan: Optional[List[Tuple[str, Optional[GluedColumn]]]] = None
+        self._out_schema: Optional[RowSchema] = None
+        if len(set(self._out)) == len(self._out):
+            self._out_schema = RowSchema.of(self._out)
+        self._glued_columns: Dict[str, GluedColumn] = {}
 
     def _yield_annotation(
             self, 
@@ -83,14 +151,126 @@ class GlueProcessor(ChainedProcessor):
                 yield head, joined
 
     def _get_glued(self, glued_task: str, token_dict: Dict[str, str]):
-        return glued_task + "=" + token_dict[glued_task]
+        if self._glue_task_name:
+            return glued_task + "=" + token_dict[glued_task]
+        return token_dict[glued_task]
 
     def reinsert(self, form: str) -> Dict[str, str]:
         return dict(form=form, **{key: self.empty_value for key in self._out if key != "form"})
 
+    def set_tasks(self, tasks):
+        """ Sets the tasks of the head processor, and plans how its output is glued
+
+        >>> x = GlueProcessor(head_processor=ProcessorPrototype())
+        >>> x.set_tasks(["lemma", "POS", "Case", "Numb", "Deg", "Mood", "Tense", "Voice", "Person"])
+        ['lemma', 'POS', 'morph']
+        >>> [(head, column.tasks if column else None) for head, column in x._glue_plan]  # doctest: +NORMALIZE_WHITESPACE
+        [('form', None), ('lemma', None), ('POS', None),
+         ('morph', ('Case', 'Numb', 'Deg', 'Mood', 'Tense', 'Voice', 'Person'))]
+        """
+        super(GlueProcessor, self).set_tasks(tasks)
+        self._glue_plan = self._get_glue_plan()
+        return self.tasks
+
+    def _get_glue_plan(self) -> Optional[List[Tuple[str, Optional[GluedColumn]]]]:
+        """ Output keys along with the column gluing their value, None for keys copied from the head processor. None
+        when the subclass glues values on its own (._yield_annotation() or ._get_glued()) """
+        if self._overrides(GlueProcessor, "_yield_annotation", "_get_glued"):
+            return None
+        plan = []
+        for head in self._out:
+            if head not in self._glue:
+                plan.append((head, None))
+                continue
+            # Columns are kept along with their cache when tasks change
+            column = self._glued_columns.get(head)
+            if column is None:
+                glued_tasks = self._glue[head]
+                column = self._glued_columns[head] = GluedColumn(
+                    glued_tasks,
+                    prefixes=[glued_task + "=" if self._glue_task_name else "" for glued_task in glued_tasks],
+                    empty_tags=[self._empty_tags.get(glued_task, None) for glued_task in glued_tasks],
+                    glue_char=self._glue_char,
+                    glue_empty=self._glue_empty[head],
+                    keep_empty=self._keep_empty,
+                    max_size=self.GLUE_CACHE_SIZE
+                )
+            plan.append((head, column))
+        return plan
+
     def get_dict(self, token: str, tags: List[str]) -> List[Dict[str, str]]:
-        return [dict(self._yield_annotation(as_dict)) for as_dict in super(GlueProcessor, self).get_dict(token, tags)]
+        plan = self._glue_plan
+        if plan is None:
+            return [
+                dict(self._yield_annotation(as_dict))
+                for as_dict in super(GlueProcessor, self).get_dict(token, tags)
+            ]
+        return [self._glued_row(plan, as_dict) for as_dict in super(GlueProcessor, self).get_dict(token, tags)]
+
+    def _glued_row(self, plan: List[Tuple[str, Optional[GluedColumn]]], row: Row) -> Row:
+        values = [row[head] if column is None else column.glue_row(row) for head, column in plan]
+        if self._out_schema is None:
+            return dict(zip(self._out, values))
+        return self._out_schema.row(values)
 
     @property
     def tasks(self) -> List[str]:
         return [key for key in self._out if key != "form"]
+
+    def _get_batch(self, items: List[BatchItem]) -> List[List[Row]]:
+        """ Glues the rows of the head processor for the whole batch, reinsertions are built from the output keys
+
+        >>> x = GlueProcessor(head_processor=ProcessorPrototype())
+        >>> x.set_tasks(["lemma", "POS", "Case", "Numb", "Deg", "Mood", "Tense", "Voice", "Person"])
+        ['lemma', 'POS', 'morph']
+        >>> tags = ["arma", "NOMcom", "Nom", "Plur", "_", "_", "_", "_", "_"]
+        >>> x.get_batch([("arma", tags)], {0: "«"}) == [x.reinsert("«"), *x.get_dict("arma", tags)]
+        True
+        """
+        plan = self._glue_plan
+        if plan is None or self._overrides(GlueProcessor, "get_dict", "reinsert"):
+            return self._get_batch_by_token(items)
+        return [
+            [self.reinsert(token)] if rows is None else [self._glued_row(plan, row) for row in rows]
+            for (token, _), rows in zip(items, self._get_head_batch(items, reinserted=False))
+        ]
+
+    def _plan(self) -> Optional[ProcessorPlan]:
+        """ Glued values are computed from the columns of the head processor, without the dictionary it builds
+
+        >>> x = GlueProcessor(head_processor=ProcessorPrototype())
+        >>> x.set_tasks(["lemma", "POS", "Case", "Numb", "Deg", "Mood", "Tense", "Voice", "Person"])
+        ['lemma', 'POS', 'morph']
+        >>> tags = ["arma", "NOMcom", "Nom", "Plur", "_", "_", "_", "_", "_"]
+        >>> x.compile()("arma", tags) == x.get_dict("arma", tags) == [
+        ...     {"form": "arma", "lemma": "arma", "POS": "NOMcom", "morph": "Case=Nom|Numb=Plur"}]
+        True
+        """
+        if self._glue_plan is None or self._overrides(GlueProcessor, "get_dict"):
+            return None
+        plan = self.head_processor._plan()
+        if plan is None or plan.stages or len(set(self._out)) != len(self._out):
+            return None
+        row = plan.row
+        positions = row.positions
+        indexes = []
+        for head, column in self._glue_plan:
+            if column is None:
+                if head not in positions:
+                    return None
+                indexes.append(positions[head])
+                continue
+            if any(glued_task not in positions for glued_task in column.tasks):
+                return None
+            inputs = [positions[task] for task in column.tasks]
+            indexes.append(row.add_step(self._glue_step(column, inputs), inputs=inputs))
+        row.keys, row.indexes = list(self._out), indexes
+        return plan
+
+    @staticmethod
+    def _glue_step(column: GluedColumn, indexes: List[int]):
+        getter, glue_values = tuple_getter(indexes), column.glue
+
+        def glue(values: List[str]):
+            values.append(glue_values(getter(values)))
+        return glue
@@ -1,5 +1,7 @@
-from pie_extended.pipeline.postprocessor.proto import ProcessorPrototype, ChainedProcessor
-from typing import Optional, Dict, List
+from pie_extended.pipeline.postprocessor.proto import ProcessorPrototype, ChainedProcessor, BatchItem
+from pie_extended.pipeline.postprocessor.compiled import ProcessorPlan, Row
+from sys import intern
+from typing import Optional, Dict, List, Iterable
 if "typing" == "nottyping":
     from ..tokenizers.memorizing import MemorizingTokenizer
 
@@ -45,17 +47,39 @@ class MemoryzingProcessor(ChainedProcessor):
 
     def get_dict(self, token: str, tags: List[str]) -> List[Dict[str, str]]:
         # First we get the dictionary
+        return self._restore(token, self.head_processor.get_dict(token, tags))
+
+    def _restore(self, token: str, token_dicts: Iterable[Dict[str, str]]) -> List[Dict[str, str]]:
         list_token_dict = []
-        for token_dict in self.head_processor.get_dict(token, tags):
-            index, input_token, out_token = self.memory.tokens.pop(0)
-            if token != out_token:
-                raise Exception("The output token does not match our inputs %s : %s" % (token, out_token))
+        for token_dict in token_dicts:
+            index, input_token, out_token = self.memory.tokens.consume(token)
 
-            token_dict[self._key] = out_token
-            token_dict["form"] = input_token
+            token_dict[self._key] = intern(out_token)
+            token_dict["form"] = intern(input_token)
             list_token_dict.append(token_dict)
         return list_token_dict
 
+    def _get_batch(self, items: List[BatchItem]) -> List[List[Row]]:
+        if self._overrides(MemoryzingProcessor, "get_dict", "reinsert"):
+            return self._get_batch_by_token(items)
+        batch = []
+        for (token, tags), rows in zip(items, self._get_head_batch(items)):
+            if tags is None:
+                self.memory.tokens.consume()
+                rows[0]['treated'] = '--IGN.--'
+                batch.append(rows)
+            else:
+                batch.append(self._restore(token, rows))
+        return batch
+
+    def _plan(self) -> Optional[ProcessorPlan]:
+        if self._overrides(MemoryzingProcessor, "get_dict"):
+            return None
+        plan = self.head_processor._plan()
+        if plan is not None:
+            plan.stages.append(self._restore)
+        return plan
+
     @property
     def tasks(self) -> List[str]:
         return self.head_processor.tasks + ["treated"]
@@ -72,7 +96,7 @@ class MemoryzingProcessor(ChainedProcessor):
         >>> x.reinsert("$")
         {'form': '$', 'task1': '_', 'task2': '_', 'treated': '--IGN.--'}
         """
-        self.memory.tokens.pop(0)
+        self.memory.tokens.consume()
         annotations = super(MemoryzingProcessor, self).reinsert(form)
         annotations['treated'] = '--IGN.--'
         return annotations
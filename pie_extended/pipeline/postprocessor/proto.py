@@ -1,10 +1,44 @@
-from typing import List, Dict, Optional, Type, Generator, Tuple
+from sys import intern
+from typing import List, Dict, Optional, Type, Generator, Tuple, Sequence
+from .compiled import RowPlan, ProcessorPlan, GetDict, GetWindow, Row
+from .rows import RowSchema, compact
 
 DEFAULT_EMPTY = "_"
 
+# Token and its tags, None for tokens reinserted after tagging
+BatchItem = Tuple[str, Optional[List[str]]]
+
+
+def interleave(sentence: Sequence[Tuple[str, List[str]]], reinsertion: Optional[Dict[int, str]] = None
+               ) -> List[BatchItem]:
+    """ Puts back the tokens of [reinsertion] (index in the original sentence -> form) where they were removed from
+    [sentence], with None as tags. Reinsertions past the end of the sentence come last, in order.
+
+    >>> interleave([("arma", ["arma"]), ("cano", ["cano"])], {0: "«", 2: ",", 5: "»"})
+    [('«', None), ('arma', ['arma']), (',', None), ('cano', ['cano']), ('»', None)]
+    """
+    if not reinsertion:
+        return list(sentence)
+    items: List[BatchItem] = []
+    reinserted = 0
+    for index, item in enumerate(sentence):
+        while reinserted + index in reinsertion:
+            items.append((reinsertion[reinserted + index], None))
+            reinserted += 1
+        items.append(item)
+    items.extend(
+        (reinsertion[index], None)
+        for index in sorted(reinsertion)
+        if index >= reinserted + len(sentence)
+    )
+    return items
+
 
 class ProcessorPrototype:
     empty_value: str
+    # Schema of the rows of the tasks and the tasks it was made for (cf. _row_schema())
+    _schema: Optional[RowSchema] = None
+    _schema_tasks: Optional[List[str]] = None
 
     def __init__(self, empty_value: Optional[str] = None):
         """ Applies postprocessing. Simplest Processor one could use.
@@ -49,7 +83,10 @@ class ProcessorPrototype:
         >>> x.reinsert("x") == {"form": "x", "a": "%", "b": "%"}
         True
         """
-        return dict(form=form, **{task: self.empty_value for task in self._tasks})
+        schema = self._row_schema()
+        if schema is None:
+            return dict(form=form, **{task: self.empty_value for task in self._tasks})
+        return schema.row((intern(form), *[self.empty_value] * len(self._tasks)))
 
     def get_dict(self, token: str, tags: List[str]) -> List[Dict[str, str]]:
         """ Get the dictionary representation of a token annotation
@@ -64,7 +101,20 @@ class ProcessorPrototype:
         >>> x.get_dict("y", ["1", "2"]) == [{"form": "y", "a": "1", "b": "2"}]
         True
         """
-        return [{"form": token, **{k: val for k, val in zip(self._tasks, tags)}}]
+        schema = self._row_schema()
+        if schema is None or len(tags) != len(self._tasks):
+            return [{"form": token, **{k: val for k, val in zip(self._tasks, tags)}}]
+        return [schema.row(map(intern, (token, *tags)))]
+
+    def _row_schema(self) -> Optional[RowSchema]:
+        """ Schema of the rows of the tasks, None when they cannot make one (duplicated tasks or a task named form) """
+        tasks = self._tasks
+        if tasks is not self._schema_tasks:
+            self._schema_tasks = tasks
+            self._schema = None
+            if "form" not in tasks and len(set(tasks)) == len(tasks):
+                self._schema = RowSchema.of(["form", *tasks])
+        return self._schema
 
     def reset(self):
         """ Functions that should be run in between documents
@@ -76,6 +126,105 @@ class ProcessorPrototype:
         """
         pass
 
+    def get_batch(self, sentence: Sequence[Tuple[str, List[str]]], reinsertion: Optional[Dict[int, str]] = None,
+                  get_dict: Optional[GetDict] = None) -> List[Dict[str, str]]:
+        """ Get the annotations of a whole sentence at once, in the order .get_dict() and .reinsert() would give them
+        token by token
+
+        :param sentence: Tokens used as input for pie along with their tags
+        :param reinsertion: Tokens removed from the sentence before tagging, by their index in the original sentence
+        :param get_dict: Function used instead of .get_dict() for the tagged tokens, such as the one of .compile()
+        :return: Annotations of the tokens, as AnnotationRow
+
+        >>> x = ProcessorPrototype(empty_value="%")
+        >>> x.set_tasks(["a", "b"])
+        ['a', 'b']
+        >>> x.get_batch([("y", ["1", "2"])], {1: "!"}) == [
+        ...     {"form": "y", "a": "1", "b": "2"}, {"form": "!", "a": "%", "b": "%"}]
+        True
+        """
+        items = interleave(sentence, reinsertion)
+        if get_dict is not None:
+            batch = self._get_batch_by_token(items, get_dict=get_dict)
+        else:
+            batch = self._get_batch(items)
+        return [compact(row) for rows in batch for row in rows]
+
+    def _get_batch(self, items: List[BatchItem]) -> List[List[Row]]:
+        """ Rows of each of [items], reinserted when they have no tags. Processors implement it on the rows of
+        their head processor for the whole batch, instead of one call per token and per processor, and fall back to
+        ._get_batch_by_token() when their subclass changes .get_dict() or .reinsert().
+        """
+        if self._overrides(ProcessorPrototype, "get_dict", "reinsert"):
+            return self._get_batch_by_token(items)
+        schema, size = self._row_schema(), len(self._tasks)
+        if schema is None:
+            return self._get_batch_by_token(items)
+        empty = [self.empty_value] * size
+        return [
+            [schema.row((intern(token), *empty))] if tags is None else
+            [schema.row(map(intern, (token, *tags)))] if len(tags) == size else
+            self.get_dict(token, tags)
+            for token, tags in items
+        ]
+
+    def _get_batch_by_token(self, items: List[BatchItem], get_dict: Optional[GetDict] = None) -> List[List[Row]]:
+        """ Rows of each of [items] through .get_dict() and .reinsert(), for processors without their own
+        ._get_batch() """
+        get_dict, reinsert = get_dict or self.get_dict, self.reinsert
+        return [[reinsert(token)] if tags is None else list(get_dict(token, tags)) for token, tags in items]
+
+    def compile(self) -> GetDict:
+        """ Flattens the processor and the ones it is chained to into a single function equivalent to .get_dict()
+        (cf. ProcessorPlan), which builds the row of each token once instead of a dictionary per processor. Meant to be
+        called once tasks are set, and again if they change. Returns .get_dict() itself when one of the processors of
+        the chain cannot be compiled.
+
+        >>> x = ProcessorPrototype(empty_value="%")
+        >>> x.set_tasks(["a", "b"])
+        ['a', 'b']
+        >>> x.compile()("y", ["1", "2"]) == x.get_dict("y", ["1", "2"])
+        True
+        """
+        plan = self._plan()
+        if plan is None:
+            return self.get_dict
+        return plan.function(fallback=self.get_dict)
+
+    def compile_window(self, table_size: int = 0) -> Optional[GetWindow]:
+        """ Compiles the chain of processors like .compile(), into a function given all the tagged tokens of a window,
+        which computes their rows at once from the ids of their tags (cf. ProcessorPlan.window_function) and returns
+        the function giving the rows of each token. None when one of the processors of the chain cannot be compiled.
+
+        :param table_size: Number of combinations of tags after which the TagTable of ids is emptied, 0 for none
+
+        >>> x = ProcessorPrototype(empty_value="%")
+        >>> x.set_tasks(["a", "b"])
+        ['a', 'b']
+        >>> get_dict = x.compile_window()([("y", ["1", "2"]), ("z", ["1", "2"])])
+        >>> get_dict("y", ["1", "2"]) + get_dict("z", ["1", "2"]) == [
+        ...     {"form": "y", "a": "1", "b": "2"}, {"form": "z", "a": "1", "b": "2"}]
+        True
+        """
+        plan = self._plan()
+        if plan is None:
+            return None
+        return plan.window_function(fallback=self.get_dict, table_size=table_size)
+
+    def _plan(self) -> Optional[ProcessorPlan]:
+        """ Plan of .get_dict(), None if it cannot be compiled """
+        if self._overrides(ProcessorPrototype, "get_dict"):
+            return None
+        tasks = list(self._tasks)
+        if "form" in tasks or len(set(tasks)) != len(tasks):
+            return None
+        return ProcessorPlan(RowPlan(tasks))
+
+    def _overrides(self, cls: Type["ProcessorPrototype"], *methods: str) -> bool:
+        """ Whether the class of the processor changes one of the [methods] of [cls], which the plan of [cls] relies
+        on """
+        return any(getattr(type(self), method) is not getattr(cls, method) for method in methods)
+
 
 class RenamedTaskProcessor(ProcessorPrototype):
     def __init__(self, task_map: Dict[str, str], **kwargs):
@@ -155,3 +304,21 @@ class ChainedProcessor(ProcessorPrototype):
 
     def reset(self):
         self.head_processor.reset()
+
+    def _get_batch(self, items: List[BatchItem]) -> List[List[Row]]:
+        if self._overrides(ChainedProcessor, "get_dict", "reinsert"):
+            return self._get_batch_by_token(items)
+        return self.head_processor._get_batch(items)
+
+    def _get_head_batch(self, items: List[BatchItem], reinserted: bool = True) -> List[Optional[List[Row]]]:
+        """ Rows of [items] given by the head processor. Unless [reinserted], reinsertions are not given to
+        it and have None as rows (for processors building them on their own) """
+        if reinserted or all(tags is not None for _, tags in items):
+            return self.head_processor._get_batch(items)
+        batch = iter(self.head_processor._get_batch([item for item in items if item[1] is not None]))
+        return [None if tags is None else next(batch) for _, tags in items]
+
+    def _plan(self) -> Optional[ProcessorPlan]:
+        if self._overrides(ChainedProcessor, "get_dict"):
+            return None
+        return self.head_processor._plan()
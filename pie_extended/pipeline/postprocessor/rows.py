@@ -0,0 +1,190 @@
+from copy import deepcopy
+from operator import itemgetter
+from typing import Dict, Tuple, Sequence, Callable, Iterator, Mapping, Optional, Iterable
+from collections.abc import MutableMapping, ItemsView, ValuesView
+
+
+def tuple_getter(keys: Sequence) -> Callable[[Sequence], Tuple]:
+    """ Function giving the tuple of the values at [keys] of a row (dict, list or tuple)
+
+    >>> tuple_getter([2, 0])("abc"), tuple_getter([1])("abc"), tuple_getter([])("abc")
+    (('c', 'a'), ('b',), ())
+    """
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda row: (row[key], )
+    if not keys:
+        return lambda row: ()
+    return itemgetter(*keys)
+
+
+class RowSchema:
+    """ Keys of annotation rows, in order. A schema is fixed once tasks are set and shared by all the rows with the
+    same keys (cf. RowSchema.of()), which only keep their values.
+
+    :param keys: Keys of the rows, without duplicates
+
+    >>> schema = RowSchema.of(["form", "lemma"])
+    >>> schema is RowSchema.of(("form", "lemma")), schema.with_key("pos").keys
+    (True, ('form', 'lemma', 'pos'))
+    >>> schema.row(["arma", "arma"])
+    {'form': 'arma', 'lemma': 'arma'}
+    """
+    __slots__ = ("keys", "index", "_with", "_without", "_getters")
+    _schemas: Dict[Tuple[str, ...], "RowSchema"] = {}
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys: Tuple[str, ...] = tuple(keys)
+        self.index: Dict[str, int] = {key: index for index, key in enumerate(self.keys)}
+        if len(self.index) != len(self.keys):
+            raise ValueError("Keys of a row must be unique: {}".format(self.keys))
+        self._with: Dict[str, RowSchema] = {}
+        self._without: Dict[str, RowSchema] = {}
+        self._getters: Dict[Tuple[str, ...], Callable[[Tuple[str, ...]], Tuple[str, ...]]] = {}
+
+    @classmethod
+    def of(cls, keys: Sequence[str]) -> "RowSchema":
+        """ Shared schema of [keys] """
+        keys = tuple(keys)
+        schema = cls._schemas.get(keys)
+        if schema is None:
+            schema = cls._schemas[keys] = cls(keys)
+        return schema
+
+    def row(self, values: Iterable[str]) -> "AnnotationRow":
+        """ Row with [values] for .keys """
+        return AnnotationRow(self, tuple(values))
+
+    def with_key(self, key: str) -> "RowSchema":
+        """ Schema of rows to which [key] is added """
+        schema = self._with.get(key)
+        if schema is None:
+            schema = self._with[key] = RowSchema.of((*self.keys, key))
+        return schema
+
+    def without_key(self, key: str) -> "RowSchema":
+        """ Schema of rows from which [key] is removed """
+        schema = self._without.get(key)
+        if schema is None:
+            schema = self._without[key] = RowSchema.of([other for other in self.keys if other != key])
+        return schema
+
+    def getter(self, keys: Sequence[str]) -> Callable[[Tuple[str, ...]], Tuple[str, ...]]:
+        """ Function giving the values of [keys] from the values of a row, raises KeyError for unknown keys """
+        keys = tuple(keys)
+        getter = self._getters.get(keys)
+        if getter is None:
+            getter = self._getters[keys] = tuple_getter([self.index[key] for key in keys])
+        return getter
+
+    def __reduce__(self):
+        return RowSchema.of, (self.keys, )
+
+    def __repr__(self):
+        return "RowSchema({!r})".format(self.keys)
+
+
+class _RowItems(ItemsView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return zip(self._mapping.schema.keys, self._mapping.data)
+
+
+class _RowValues(ValuesView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return iter(self._mapping.data)
+
+
+class AnnotationRow(MutableMapping):
+    """ Annotation of a token: a mapping, usable as the dictionaries processors used to return, which only keeps a
+    tuple of its values and the schema of its keys.
+
+    :param schema: Keys of the row
+    :param data: Values of the keys, in order
+
+    >>> row = RowSchema.of(["form", "lemma"]).row(["arma", "arma"])
+    >>> row["lemma"] = "armum"
+    >>> row["treated"] = "arma"
+    >>> row, row == {"form": "arma", "lemma": "armum", "treated": "arma"}
+    ({'form': 'arma', 'lemma': 'armum', 'treated': 'arma'}, True)
+    >>> del row["lemma"]
+    >>> dict(row), row.data, list(row.values())
+    ({'form': 'arma', 'treated': 'arma'}, ('arma', 'arma'), ['arma', 'arma'])
+    """
+    __slots__ = ("schema", "data")
+
+    def __init__(self, schema: RowSchema, data: Tuple[str, ...]):
+        self.schema: RowSchema = schema
+        self.data: Tuple[str, ...] = data
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping[str, str]) -> "AnnotationRow":
+        """ Row with the same keys and values as [mapping] """
+        if isinstance(mapping, AnnotationRow):
+            return mapping.copy()
+        return cls(RowSchema.of(tuple(mapping)), tuple(mapping.values()))
+
+    def __getitem__(self, key: str) -> str:
+        return self.data[self.schema.index[key]]
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        index = self.schema.index.get(key)
+        return default if index is None else self.data[index]
+
+    def __setitem__(self, key: str, value: str):
+        index = self.schema.index.get(key)
+        if index is None:
+            self.schema = self.schema.with_key(key)
+            self.data = (*self.data, value)
+        else:
+            self.data = (*self.data[:index], value, *self.data[index + 1:])
+
+    def __delitem__(self, key: str):
+        index = self.schema.index[key]
+        self.schema = self.schema.without_key(key)
+        self.data = (*self.data[:index], *self.data[index + 1:])
+
+    def __contains__(self, key) -> bool:
+        return key in self.schema.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.schema.keys)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def items(self) -> ItemsView:
+        return _RowItems(self)
+
+    def values(self) -> ValuesView:
+        return _RowValues(self)
+
+    def select(self, keys: Sequence[str]) -> Tuple[str, ...]:
+        """ Values of [keys], raises KeyError for unknown keys """
+        return self.schema.getter(keys)(self.data)
+
+    def copy(self) -> "AnnotationRow":
+        return AnnotationRow(self.schema, self.data)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo) -> "AnnotationRow":
+        # The schema is shared, values are copied
+        return AnnotationRow(self.schema, deepcopy(self.data, memo))
+
+    def __reduce__(self):
+        return AnnotationRow, (self.schema, self.data)
+
+    def __repr__(self):
+        return repr(dict(zip(self.schema.keys, self.data)))
+
+
+def compact(annotation: Mapping[str, str]) -> AnnotationRow:
+    """ [annotation] as an AnnotationRow (itself if it is one) """
+    if isinstance(annotation, AnnotationRow):
+        return annotation
+    return AnnotationRow.from_mapping(annotation)
+
@@ -1,4 +1,6 @@
-from pie_extended.pipeline.postprocessor.proto import ProcessorPrototype, ChainedProcessor
+from pie_extended.pipeline.postprocessor.proto import ProcessorPrototype, ChainedProcessor, BatchItem
+from pie_extended.pipeline.postprocessor.compiled import ProcessorPlan, Row
+from pie_extended.pipeline.classifier import TokenClassifier, DEFAULT_TOKEN_CLASSIFIER
 from typing import Optional, Dict, List
 if "typing" == "nottyping":
     from ..tokenizers.memorizing import MemorizingTokenizer
@@ -8,6 +10,8 @@ class RuleBasedProcessor(ChainedProcessor):
     """ Applies rules found in rules(token_annotation)
 
     """
+    # Memo of the patterns matching each token, for rules checking the type of tokens (punctuation, numbers...)
+    classifier: TokenClassifier = DEFAULT_TOKEN_CLASSIFIER
 
     def __init__(self, apply_on_reinsert: bool = False, head_processor: Optional[ProcessorPrototype] = None, **kwargs):
         """ Apply rules on output of the taggers
@@ -42,3 +46,23 @@ class RuleBasedProcessor(ChainedProcessor):
 
     def get_dict(self, token: str, tags: List[str]) -> List[Dict[str, str]]:
         return [self.rules(anno) for anno in self.head_processor.get_dict(token, tags)]
+
+    def _apply_rules(self, token: str, annotations: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        return [self.rules(anno) for anno in annotations]
+
+    def _get_batch(self, items: List[BatchItem]) -> List[List[Row]]:
+        if self._overrides(RuleBasedProcessor, "get_dict", "reinsert"):
+            return self._get_batch_by_token(items)
+        rules, apply_on_reinsert = self.rules, self.apply_on_reinsert
+        return [
+            rows if tags is None and not apply_on_reinsert else [rules(anno) for anno in rows]
+            for (token, tags), rows in zip(items, self._get_head_batch(items))
+        ]
+
+    def _plan(self) -> Optional[ProcessorPlan]:
+        if self._overrides(RuleBasedProcessor, "get_dict"):
+            return None
+        plan = self.head_processor._plan()
+        if plan is not None:
+            plan.stages.append(self._apply_rules)
+        return plan
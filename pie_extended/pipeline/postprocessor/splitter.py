@@ -1,5 +1,6 @@
-from typing import List, Dict, Optional
-from .proto import ChainedProcessor, ProcessorPrototype
+from typing import List, Dict, Optional, Iterable
+from .proto import ChainedProcessor, ProcessorPrototype, BatchItem
+from .compiled import ProcessorPlan, Row
 from copy import deepcopy
 
 
@@ -46,8 +47,11 @@ class SplitterPostProcessor(ChainedProcessor):
         self.prefix: str = prefix
 
     def get_dict(self, token: str, tags: List[str]) -> List[Dict[str, str]]:
+        return self._split(token, super(SplitterPostProcessor, self).get_dict(token=token, tags=tags))
+
+    def _split(self, token: str, annotations: Iterable[Dict[str, str]]) -> List[Dict[str, str]]:
         out = []
-        for anno in super(SplitterPostProcessor, self).get_dict(token=token, tags=tags):
+        for anno in annotations:
             if self.split_char in anno[self.column]:
                 for number, new_val in enumerate(anno[self.column].split(self.split_char)):
                     if number > 0:
@@ -61,3 +65,19 @@ class SplitterPostProcessor(ChainedProcessor):
             else:
                 out.append(anno)
         return out
+
+    def _get_batch(self, items: List[BatchItem]) -> List[List[Row]]:
+        if self._overrides(SplitterPostProcessor, "get_dict", "reinsert"):
+            return self._get_batch_by_token(items)
+        return [
+            rows if tags is None else self._split(token, rows)
+            for (token, tags), rows in zip(items, self._get_head_batch(items))
+        ]
+
+    def _plan(self) -> Optional[ProcessorPlan]:
+        if self._overrides(SplitterPostProcessor, "get_dict"):
+            return None
+        plan = self.head_processor._plan()
+        if plan is not None:
+            plan.stages.append(self._split)
+        return plan
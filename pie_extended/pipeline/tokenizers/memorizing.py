@@ -1,5 +1,84 @@
 from .simple_tokenizer import SimpleTokenizer, RE_BYPASS_SENTENCE, RE_BYPASS_WORD
-from typing import List, Tuple, Dict, Generator
+from .utils.normalizer import CompiledNormalizer
+from ..classifier import TokenClassifier, DEFAULT_TOKEN_CLASSIFIER
+import functools
+from collections import deque
+from typing import List, Tuple, Dict, Generator, Iterable, Iterator, Optional, Deque, Callable
+
+# (Index in the document, Original token, Token seen by the tagger)
+MemorizedToken = Tuple[int, str, str]
+
+
+class MemoryAlignmentError(Exception):
+    """ Raised when the tokens consumed by a processor do not match the ones produced by the tokenizer """
+
+
+class TokenMemory:
+    """ First-in first-out memory of the tokens produced by a MemorizingTokenizer and consumed by a
+    MemoryzingProcessor. Tokens are forgotten once consumed, so that only the ones waiting to be tagged are kept.
+
+    >>> memory = TokenMemory()
+    >>> memory.append("Q'", "q")
+    >>> memory.append("b", "b")
+    >>> memory.consume("q")
+    (0, "Q'", 'q')
+    >>> list(memory), memory.produced, memory.consumed
+    ([(1, 'b', 'b')], 2, 1)
+    >>> memory.consume("c")
+    Traceback (most recent call last):
+     ...
+    pie_extended.pipeline.tokenizers.memorizing.MemoryAlignmentError: Token 1 was tokenized as 'b' but 'c' was tagged
+    """
+    __slots__ = ("_entries", "produced", "consumed")
+
+    def __init__(self, tokens: Iterable[MemorizedToken] = ()):
+        self._entries: Deque[MemorizedToken] = deque(tokens)
+        self.produced: int = len(self._entries)
+        self.consumed: int = 0
+
+    def append(self, token: str, out: str):
+        """ Memorizes [token], which was given to the tagger as [out] """
+        self._entries.append((self.produced, token, out))
+        self.produced += 1
+
+    def consume(self, expected: Optional[str] = None) -> MemorizedToken:
+        """ Returns and forgets the oldest token
+
+        :param expected: If set, the token seen by the tagger that should be consumed
+        """
+        try:
+            entry = self._entries.popleft()
+        except IndexError:
+            raise MemoryAlignmentError(
+                "{} tokens were tokenized but more were tagged".format(self.produced)) from None
+        if expected is not None and entry[2] != expected:
+            self._entries.appendleft(entry)
+            raise MemoryAlignmentError("Token {} was tokenized as {!r} but {!r} was tagged".format(
+                self.consumed, entry[2], expected))
+        self.consumed += 1
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+        self.produced = 0
+        self.consumed = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[MemorizedToken]:
+        return iter(self._entries)
+
+    def __eq__(self, other) -> bool:
+        try:
+            return list(self._entries) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(list(self._entries))
 
 
 class MemorizingTokenizer(SimpleTokenizer):
@@ -9,19 +88,116 @@ class MemorizingTokenizer(SimpleTokenizer):
 
     """
 
+    # Run the .normalizers through a CompiledNormalizer instead of one after the other
+    compile_normalizers: bool = True
+    # Number of token types whose .replacer() output is memoized (cf. .cache_replacer()), 0 for none
+    replacer_cache_size: int = 0
+    # Whether the output of .replacer() only depends on the token, so that it can be memoized. Tokenizers whose
+    #   replacement depends on some state or on the context of the token should set it to False.
+    memoizable_replacer: bool = True
+    # Freeze the .char_registry once filled with what the .normalizers might mask (cf. .populate_char_registry()), so
+    #   that tokenizing never allocates masks and the tokenizer can run in several threads. Characters of references
+    #   which were not registered are then left as they are.
+    freeze_char_registry: bool = True
+    # Memo of the patterns matching each token, shared with the iterators and processors using the same patterns
+    classifier: TokenClassifier = DEFAULT_TOKEN_CLASSIFIER
+
     def replacer(self, token: str) -> str:
         """ This function allows for changing input and keeping it in memory """
         return token
 
+    def excluded_from_replacement(self, token: str) -> bool:
+        """ Whether [token] is matched by one of the .normalizers whose matches cannot be replaced """
+        for excluder in getattr(self, "normalizers", ()):
+            if not excluder.can_be_replaced and self.classifier.match(excluder.exclude_regexp, token):
+                return True
+        return False
+
     def __init__(self):
-        self.tokens: List[Tuple[int, str, str]] = []
+        self._tokens: TokenMemory = TokenMemory()
+        self._compiled_normalizer: Optional[CompiledNormalizer] = None
+        self._replace: Optional[Callable[[str], str]] = None
+        if self.replacer_cache_size:
+            self.cache_replacer(self.replacer_cache_size)
+
+    def cache_replacer(self, size: int):
+        """ Memoizes the output of .replacer() for the [size] most recently seen token types. As tokens follow Zipf's
+        law, most of them are repeats. Does nothing if the replacer is not memoizable.
+
+        >>> class Upper(MemorizingTokenizer):
+        ...     def replacer(self, token):
+        ...         return token.upper()
+        >>> tokenizer = Upper()
+        >>> tokenizer.cache_replacer(100)
+        >>> list(tokenizer.bypass_tokenizer("a\\nb\\na\\na"))
+        [['A', 'B', 'A', 'A']]
+        >>> tokenizer.replacer_cache_info
+        CacheInfo(hits=2, misses=2, maxsize=100, currsize=2)
+        """
+        if not self.memoizable_replacer:
+            return
+        # .replacer is looked up on misses, as it can be replaced on the instance
+        self._replace = functools.lru_cache(maxsize=size)(lambda token: self.replacer(token)) if size else None
+
+    @property
+    def replacer_cache_info(self):
+        """ Hits, misses, maximum and current size of the memo of .replacer(), None if it is not memoized """
+        cache_info = getattr(self._replace, "cache_info", None)
+        return cache_info() if cache_info is not None else None
+
+    @property
+    def replacer_hit_rate(self) -> float:
+        info = self.replacer_cache_info
+        if info is None or not info.hits + info.misses:
+            return 0.
+        return info.hits / (info.hits + info.misses)
+
+    @property
+    def compiled_normalizer(self) -> CompiledNormalizer:
+        """ CompiledNormalizer of the excluders in .normalizers, rebuilt if they change """
+        normalizers = tuple(getattr(self, "normalizers", ()))
+        if self._compiled_normalizer is None or self._compiled_normalizer.excluders != normalizers:
+            self._compiled_normalizer = CompiledNormalizer(normalizers)
+        return self._compiled_normalizer
+
+    def populate_char_registry(self):
+        """ Registers in the .char_registry of the tokenizer the characters its .normalizers might need a mask for, then
+        freezes it if .freeze_char_registry is set (cf. CharRegistry.freeze()). Meant to be called once the normalizers
+        are created. """
+        registry = getattr(self, "char_registry", None)
+        if registry is None or registry.frozen:
+            return
+        for excluder in getattr(self, "normalizers", ()):
+            registry.populate(excluder.masked_chars)
+        if self.freeze_char_registry:
+            registry.freeze()
+
+    def exclude(self, data: str) -> str:
+        """ Applies the .before_sentence_tokenizer() of each of the .normalizers to [data] """
+        if not self.compile_normalizers:
+            for excluder in getattr(self, "normalizers", ()):
+                data = excluder.before_sentence_tokenizer(data)
+            return data
+        return self.compiled_normalizer.before_sentence_tokenizer(data)
+
+    def restore(self, data: str) -> str:
+        """ Applies the .after_sentence_tokenizer() of each of the .normalizers to [data] """
+        return self.compiled_normalizer.after_sentence_tokenizer(data)
+
+    @property
+    def tokens(self) -> TokenMemory:
+        return self._tokens
+
+    @tokens.setter
+    def tokens(self, tokens: Iterable[MemorizedToken]):
+        self._tokens = tokens if isinstance(tokens, TokenMemory) else TokenMemory(tokens)
 
     def _real_word_tokenizer(self, data: str, lower: bool = False) -> List[str]:
         return super(MemorizingTokenizer, self).word_tokenizer(data, lower=lower)
 
     def _word_logic(self, token: str) -> str:
-        out = self.replacer(token)
-        self.tokens.append((len(self.tokens), token, out))
+        out = self.replacer(token) if self._replace is None else self._replace(token)
+        self._tokens.append(token, out)
         return out
 
     def word_tokenizer(self, text: str, lower: bool = False) -> List[str]:
@@ -31,7 +207,7 @@ class MemorizingTokenizer(SimpleTokenizer):
         return sentence
 
     def reset(self):  # Empty
-        self.tokens = []
+        self._tokens.clear()
 
     def bypass_tokenizer(self, data: str, lower: bool = False) -> Generator[List[str], None, None]:
         """ Function to enable pretokenized input while using replaces or the likes
@@ -43,7 +219,7 @@ class MemorizingTokenizer(SimpleTokenizer):
        >>> tokenizer = MemorizingTokenizer()
        >>> list(tokenizer.bypass_tokenizer("One\\ntwo\\nthree\\n\\n.//.\\na\\nz"))
        [['One', 'two', 'three'], ['.//.', 'a', 'z']]
-       >>> tokenizer.tokens
+       >>> list(tokenizer.tokens)
        [(0, 'One', 'One'), (1, 'two', 'two'), (2, 'three', 'three'), (3, './/.', './/.'), (4, 'a', 'a'), (5, 'z', 'z')]
 
        """
@@ -8,6 +8,11 @@ WORD = r'([{}])'.format(string.punctuation)
 RE_BYPASS_SENTENCE = re.compile(r"(?:\r?\n){2,}")
 RE_BYPASS_WORD = re.compile(r"(?:\r?\n)")
 
+# Streaming boundaries are searched backward (REVERSE) so that .search() returns the last one of a buffer
+RE_STREAM_BOUNDARY = re.compile(r"[.?!…][\"“”«»'’)\]]*[ \t]*(?:\r?\n[ \t]*){2,}", flags=re.REVERSE)
+RE_BYPASS_STREAM_BOUNDARY = re.compile(r"(?:\r?\n){2,}", flags=re.REVERSE)
+RE_LAST_SPACE = re.compile(r"\s", flags=re.REVERSE)
+
 
 class SimpleTokenizer(object):
     """ Tokenizer that memoryze what it tokenized.
@@ -15,6 +20,9 @@ class SimpleTokenizer(object):
     Mostly used to normalized input as input time and then reinserting normalized input
 
     """
+    # Sentence-final punctuation, along with the spaces following it
+    _sentence_boundaries = re.compile(r"([.?!…]+\s*)+")
+
     def __init__(self):
         self.section = regexsplitter(SECTION)
         self.fullstop = regexsplitter(FULLSTOP)
@@ -35,6 +43,64 @@ class SimpleTokenizer(object):
         """Can be used between documents for example """
         pass
 
+    def stream_boundary(self, text: str, no_tokenizer: bool = False) -> int:
+        """ Find the last position in [text] before which the text can be tokenized independently of what
+        follows. Boundaries are sentence-final punctuation followed by an empty line (or simply an empty line
+        when the tokenizer is bypassed).
+
+        :param text: Buffer of text read so far
+        :param no_tokenizer: Whether the data will go through the bypass_tokenizer
+        :return: Index at which the text can be cut, 0 if no safe boundary was found
+
+        >>> tokenizer = SimpleTokenizer()
+        >>> text = "Prima sententia.\\n\\nSecunda sententia.\\n\\nTertia"
+        >>> text[:tokenizer.stream_boundary(text)]
+        'Prima sententia.\\n\\nSecunda sententia.\\n\\n'
+        >>> tokenizer.stream_boundary("Prima sententia\\n\\nSecunda")
+        0
+        >>> tokenizer.stream_boundary("one\\ntwo\\n\\nthree", no_tokenizer=True)
+        9
+        """
+        regex = RE_BYPASS_STREAM_BOUNDARY if no_tokenizer else RE_STREAM_BOUNDARY
+        match = regex.search(text)
+        # A boundary at the very end of the buffer might be continued by the next read
+        if match is None or match.end() == len(text):
+            return 0
+        return match.end()
+
+    def stream_fallback_boundary(self, text: str, no_tokenizer: bool = False) -> int:
+        """ Find the last position at which [text] can be cut when it has no stream_boundary(): after the last
+        sentence-final punctuation followed by a space (cf. ._sentence_boundaries), otherwise after the last line
+        break, otherwise after the last space. Such cuts might split what the tokenizer would have kept together.
+
+        :param text: Buffer of text read so far
+        :param no_tokenizer: Whether the data will go through the bypass_tokenizer
+        :return: Index at which the text can be cut, 0 if it has no space
+
+        >>> tokenizer = SimpleTokenizer()
+        >>> text = "Prima sententia. Secunda sententia. Tertia"
+        >>> text[:tokenizer.stream_fallback_boundary(text)]
+        'Prima sententia. Secunda sententia. '
+        >>> text = "Prima sententia\\nSecunda sententia"
+        >>> text[:tokenizer.stream_fallback_boundary(text)], text[:tokenizer.stream_fallback_boundary(text[:20])]
+        ('Prima sententia\\n', 'Prima sententia\\n')
+        >>> text[:tokenizer.stream_fallback_boundary(text[:15])]
+        'Prima '
+        """
+        if not no_tokenizer:
+            cut = 0
+            for match in self._sentence_boundaries.finditer(text):
+                end = match.end()
+                if end < len(text) and end > match.start() and text[end - 1].isspace():
+                    cut = end
+            if cut:
+                return cut
+        cut = text.rfind("\n") + 1
+        if cut:
+            return cut
+        match = RE_LAST_SPACE.search(text)
+        return match.end() if match is not None else 0
+
     def bypass_tokenizer(self, data: str, lower: bool = False) -> Generator[List[str], None, None]:
         """ Function to enable pretokenized input while using replaces or the likes
 
@@ -1,10 +1,13 @@
 from abc import ABC
 import regex as re
-from typing import Match, List, Optional, Dict
+from typing import Match, List, Optional, Dict, Iterable, Tuple
 
 import pie_extended.pipeline.tokenizers.utils.chars as chars
 import pie_extended.pipeline.tokenizers.utils.regexps as regexps
+from pie_extended.pipeline.tokenizers.utils.trie import trie_pattern
 import copy
+import string
+import threading
 
 # Common values so that there is not (too much) collision
 DOT = '語'
@@ -26,24 +29,131 @@ _DEFAULT_CHAR_REGISTRY = {
 }
 
 
+class FrozenCharRegistryError(KeyError):
+    """ Raised when a character without mask is looked up in a frozen CharRegistry """
+
+
 class CharRegistry:
+    """ Registry of the characters (or strings) masked by excluders, with the character masking each of them. Unknown
+    characters are given a new mask when they are first looked up, taken from the Private Use Area of Unicode so that
+    it does not stand for a character of the text (tokenizers keep these characters within words).
+
+    The registry keeps what masking and unmasking need up to date as masks are added, instead of going through all of
+    its entries each time (cf. .mask() and .unmask()).
+
+    Registries can be shared by tokenizers running in several threads: masks are allocated under a lock, and the
+    mappings are replaced rather than modified, so that lookups, masking and unmasking do not need the lock. A
+    registry can also be filled beforehand (cf. .populate()) then frozen, so that no mask is allocated anymore.
+
+    >>> registry = CharRegistry()
+    >>> registry.mask("[REF:1.a]#APOSTROPHE#")
+    '左REF桁1語a右風'
+    >>> registry["#"]
+    '\\ue007'
+    >>> registry.unmask("左REF桁1語a右風\\ue007")
+    "[REF:1.a]'#"
+    >>> registry.freeze()
+    >>> registry["$"]
+    Traceback (most recent call last):
+     ...
+    pie_extended.pipeline.tokenizers.utils.excluder.FrozenCharRegistryError: "No mask for '$' in a frozen registry"
+    """
     APOSTROPHE_CONSTANT: str = "#APOSTROPHE#"
 
-    def __init__(self, use_default=True, unicode_start_range=0x8d00):
-        self._char_to_code = {}
-        if use_default:
-            self._char_to_code.update(_DEFAULT_CHAR_REGISTRY)
+    def __init__(self, use_default=True, unicode_start_range=0xe000):
+        self._char_to_code: Dict[str, str] = {}
         self._start_range = unicode_start_range
+        # Translation table of single characters to their masks
+        self._mask_table: Dict[int, str] = {}
+        # Longer strings and their masks, replaced before single characters
+        self._mask_strings: Tuple[Tuple[str, str], ...] = ()
+        # Masks and the characters they are restored to
+        self._unmask_pairs: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._frozen: bool = False
+        if use_default:
+            for char, code in _DEFAULT_CHAR_REGISTRY.items():
+                self[char] = code
 
     def __getitem__(self, item):
-        if item in self._char_to_code:
-            return self._char_to_code[item]
-        else:
-            self._char_to_code[item] = chr(self._start_range + len(self._char_to_code))
+        code = self._char_to_code.get(item)
+        if code is not None:
+            return code
+        with self._lock:
+            if item not in self._char_to_code:  # Another thread might have allocated it in the meantime
+                if self._frozen:
+                    raise FrozenCharRegistryError("No mask for {!r} in a frozen registry".format(item))
+                self._set(item, chr(self._start_range + len(self._char_to_code)))
             return self._char_to_code[item]
 
     def __setitem__(self, key, value):
-        self._char_to_code[key] = value
+        with self._lock:
+            if self._frozen:
+                raise FrozenCharRegistryError("Cannot change the mask of {!r} in a frozen registry".format(key))
+            self._set(key, value)
+
+    def _set(self, char: str, code: str):
+        """ Registers [code] as the mask of [char], publishing new mappings once they are complete """
+        char_to_code = dict(self._char_to_code)
+        if char in char_to_code:  # A new mask for a known character changes what comes after it
+            char_to_code[char] = code
+            self._rebuild(char_to_code)
+            return
+        mask_table, mask_strings, unmask_pairs = self._mask_table, self._mask_strings, self._unmask_pairs
+        if len(char) == 1:
+            mask_table = {**mask_table, ord(char): code}
+        # A string containing something registered before it is never seen, as this was masked first
+        elif not any(earlier in char for earlier in char_to_code):
+            mask_strings = (*mask_strings, (char, code))
+        # When several characters share a mask, the first one registered is restored
+        if code not in unmask_pairs:
+            unmask_pairs = {**unmask_pairs, code: char}
+        char_to_code[char] = code
+        self._mask_table, self._mask_strings, self._unmask_pairs = mask_table, mask_strings, unmask_pairs
+        self._char_to_code = char_to_code
+
+    def _rebuild(self, char_to_code: Dict[str, str]):
+        """ Rebuilds the mappings of [char_to_code] from scratch, then publishes them """
+        mask_table, mask_strings, unmask_pairs = {}, [], {}
+        chars = list(char_to_code)
+        for index, other in enumerate(chars):
+            other_code = char_to_code[other]
+            if len(other) == 1:
+                mask_table[ord(other)] = other_code
+            elif not any(earlier in other for earlier in chars[:index]):
+                mask_strings.append((other, other_code))
+            unmask_pairs.setdefault(other_code, other)
+        self._mask_table, self._mask_strings, self._unmask_pairs = mask_table, tuple(mask_strings), unmask_pairs
+        self._char_to_code = char_to_code
+
+    def populate(self, chars: Iterable[str]):
+        """ Allocates a mask for each of [chars] which does not have one yet """
+        for char in chars:
+            self[char]
+
+    def freeze(self):
+        """ Forbids the allocation of new masks """
+        self._frozen = True
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def mask(self, value: str) -> str:
+        """ Replaces the registered characters and strings of [value] with their masks. Meant for short strings
+        (such as references): str.translate() is slower than str.replace() on long texts. """
+        mask_table = self._mask_table
+        for string, code in self._mask_strings:
+            value = value.replace(string, code)
+        return value.translate(mask_table)
+
+    def unmask(self, value: str) -> str:
+        """ Replaces the masks of [value] with the characters they stand for """
+        # Each str.replace() is a fast scan, and all of them are faster than any single pass of str.translate()
+        # or of a regular expression on long texts
+        for code, char in self._unmask_pairs.items():
+            value = value.replace(code, char)
+        return value
 
     def items(self):
         return self._char_to_code.items()
@@ -72,6 +182,24 @@ class ExcluderPrototype(ABC):
     def exclude_regexp(self) -> Optional[re.Regex]:
         return None
 
+    @property
+    def masked_chars(self) -> Tuple[str, ...]:
+        """ Characters (or strings) the excluder might need a mask for, to register in its CharRegistry before it gets
+        frozen (cf. MemorizingTokenizer.populate_char_registry) """
+        return ()
+
+    @property
+    def trigger_chars(self) -> Optional[str]:
+        """ Characters of which at least one is part of anything .before_sentence_tokenizer() changes, for excluders
+        which only look at whitespace-delimited runs of characters (their matches and lookarounds never contain
+        whitespace, their replacements never contain new lines). Runs without any of these characters are then left
+        untouched by the excluder (cf. CompiledNormalizer), which is worth it when its regex has no literal prefix the
+        regex engine could quickly search for.
+
+        None when the excluder can work across whitespace, or is fast enough on whole texts.
+        """
+        return None
+
 
 class ReferenceExcluder(ExcluderPrototype):
     """ Allows for exclusion of reference tokens such as [REF:1.b.Z]
@@ -83,11 +211,17 @@ class ReferenceExcluder(ExcluderPrototype):
     True
     >>> ref.after_sentence_tokenizer(ref.before_sentence_tokenizer("ici [REF:###abc??<>] Paris"))
     'ici  [REF:###abc??<>]  Paris'
+
+    Characters which are not registered in a frozen registry are left as they are:
+
+    >>> ref.char_registry.freeze()
+    >>> ref.before_sentence_tokenizer("ici [REF:1@2#3] Paris")
+    'ici  左REF桁1@2\\ue0073右  Paris'
      """
 
     def __init__(self,
                  regex_string: str = r"(\[REF:[^\]]+\])",
-                 regex_needs_replacement: str = r"[^\w\s]",
+                 regex_needs_replacement: str = r"[^\w\s\p{Co}]",
                  char_registry: Optional[CharRegistry] = None
                  ):
         self.re: re.Regex = re.compile(regex_string)
@@ -103,13 +237,21 @@ class ReferenceExcluder(ExcluderPrototype):
     def exclude_regexp(self) -> Optional[re.Regex]:
         return self.re
 
+    @property
+    def masked_chars(self) -> Tuple[str, ...]:
+        # Any character of a reference might need a mask: ASCII punctuation and sentence boundaries are registered
+        #   beforehand, others are registered when they are met (or left as they are in a frozen registry)
+        candidates = dict.fromkeys(string.punctuation + chars.DOTS_EXCEPT_APOSTROPHES + chars.APOSTROPHE)
+        return tuple(char for char in candidates if self.needs_replacement.match(char))
+
     def _replace_in(self, match: Match) -> str:
-        data = match.group()
-        for char, repl in self.char_registry.items():
-            data = data.replace(char, repl)
+        data = self.char_registry.mask(match.group())
 
-        for char in sorted(list(set(self.needs_replacement.findall(data)))):
-            data = data.replace(char, self.char_registry[char])
+        new_chars = sorted(set(self.needs_replacement.findall(data)))
+        if new_chars and not self.char_registry.frozen:  # Registered characters were masked, others are kept
+            for char in new_chars:  # Registers them
+                self.char_registry[char]
+            data = self.char_registry.mask(data)
 
         return f" {data} "
 
@@ -135,9 +277,7 @@ class ReferenceExcluder(ExcluderPrototype):
         'Choubidou [REF:1.a.Z] choubida [REF:1.b.Z]'
 
         """
-        for char, repl in self.char_registry.items():
-            value = value.replace(repl, char)
-        return value
+        return self.char_registry.unmask(value)
 
     def ignore(self, string: str) -> bool:
         return bool(self.re.match(string))
@@ -169,6 +309,10 @@ class RegexpExcluder(ExcluderPrototype):
     def exclude_regexp(self) -> Optional[re.Regex]:
         return self.re
 
+    @property
+    def trigger_chars(self) -> Optional[str]:
+        return ""  # Never changes anything
+
     def before_sentence_tokenizer(self, value: str) -> str:
         return value
 
@@ -176,19 +320,51 @@ class RegexpExcluder(ExcluderPrototype):
         return value
 
 
+# Characters which are not matched literally by regular expressions
+_REGEX_META_CHARS = set("\\^$.|?*+()[]{}#")
+
+
+def _is_literal(abbr: str, ignore_case: bool = False) -> bool:
+    """ Whether the characters of [abbr] (but dots and spaces) match themselves, and only characters of the same
+    lowercase when [ignore_case] """
+    for char in abbr:
+        if char in ". ":
+            continue
+        if char in _REGEX_META_CHARS or char.isspace():
+            return False
+        if ignore_case and (len(char.swapcase()) != 1 or char.swapcase().swapcase() != char):
+            return False
+    return True
+
+
 class AbbreviationsExcluder(ExcluderPrototype):
+    # Factor the common prefixes of the abbreviations in their regular expression (cf. trie_pattern). Lists with
+    #   characters which are not literals in regular expressions keep a plain alternation.
+    factor_prefixes: bool = True
+
     def __init__(self, abbrs: List[str], apply_replacements: bool = True,
                  char_registry: Optional[CharRegistry] = None):
         """
 
         :param: List of abbreviation (dot included), eg. ['cf.', 'p.']
+
+        >>> AbbreviationsExcluder(['cf.', 'col.', 'p.']).re.pattern
+        '((?:c(?:f|ol)|p))(\\\\.)'
         """
         self.char_registry: CharRegistry = char_registry or CharRegistry()
-        self.re = re.compile(
-            r"("+r"|".join([abbr.replace(".", "") for abbr in abbrs])+r")(\.)"
-        )
+        abbrs = [abbr.replace(".", "") for abbr in abbrs]
+        if self.factor_prefixes and all(_is_literal(abbr) for abbr in abbrs):
+            # All the words followed by a dot match the same characters, whichever is tried first
+            alternation = trie_pattern(abbrs)
+        else:
+            alternation = r"|".join(abbrs)
+        self.re = re.compile(r"(" + alternation + r")(\.)")
         self._apply_replacements = apply_replacements
 
+    @property
+    def masked_chars(self) -> Tuple[str, ...]:
+        return ".",
+
     def _replace_in(self, match: Match) -> str:
         return match.group()\
             .replace(".", self.char_registry["."])
@@ -257,14 +433,20 @@ class CompoundAbbreviationsExcluder(AbbreviationsExcluder):
         re_kwargs = {}
         if ignore_case:
             re_kwargs["flags"] = re.IGNORECASE
-        self.re = re.compile(
-            r"\b("+"|".join([
-                token.replace(" ", r"\s+").replace(".", r"\.")
-                for token in abbrs
-                if token  # Small check.
-            ])+r")",
-            **re_kwargs
-        )
+        units = {" ": r"\s+", ".": r"\."}
+        abbrs = [token for token in abbrs if token]  # Small check.
+        if self.factor_prefixes and all(
+                _is_literal(token, ignore_case=ignore_case) and "  " not in token for token in abbrs):
+            # Nothing follows the alternation, so the first word matching is the longest one of those not starting
+            #   with an earlier word, which is the one the trie matches
+            alternation = trie_pattern(
+                [[units.get(char, char) for char in token] for token in abbrs],
+                key=str.lower if ignore_case else None,
+                longest_only=True
+            )
+        else:
+            alternation = "|".join([token.replace(" ", r"\s+").replace(".", r"\.") for token in abbrs])
+        self.re = re.compile(r"\b(" + alternation + r")", **re_kwargs)
 
 
 class DottedNumberExcluder(ExcluderPrototype):
@@ -273,6 +455,10 @@ class DottedNumberExcluder(ExcluderPrototype):
         self.re = re.compile(r"\.(" + number_regex + r")\.")
         self.char_registry: CharRegistry = char_registry or CharRegistry()
 
+    @property
+    def masked_chars(self) -> Tuple[str, ...]:
+        return ".",
+
     def before_sentence_tokenizer(self, value: str) -> str:
         return self.re.sub(
             r"{0}\g<1>{0}".format(self.char_registry["."]),
@@ -298,6 +484,8 @@ class ApostropheExcluder(ExcluderPrototype):
         self.apostrophes = match_apostrophes
         self.re: re.Regex = re.compile(regex or (r"(\w+)([" + self.apostrophes + r"])(\w+)"))
         self.char_registry = char_registry or CharRegistry()
+        # A custom regex might not need an apostrophe to match
+        self._local: bool = regex is None
 
         # Space handling
         self.space_before: str = ""
@@ -308,6 +496,14 @@ class ApostropheExcluder(ExcluderPrototype):
         if add_space_after:
             self.space_after = " "
 
+    @property
+    def masked_chars(self) -> Tuple[str, ...]:
+        return self.char_registry.APOSTROPHE_CONSTANT,
+
+    @property
+    def trigger_chars(self) -> Optional[str]:
+        return self.apostrophes if self._local else None
+
     def _before_sentence_tokenizer(self, regex_match: Match) -> str:
         """ Given a match on `l'abbé` returns `l風0abbé` where
             風 is the character mask and 0 the index of the apostrophe in the match_apostrophes value
@@ -342,8 +538,9 @@ class ApostropheExcluder(ExcluderPrototype):
         "l' abbé lorsqu’ il"
 
         """
+        mask = self.char_registry[self.char_registry.APOSTROPHE_CONSTANT]
+        if mask not in value:
+            return value
         for index_apo, apostrophe in enumerate(self.apostrophes):
-            value = value.replace(
-                self.char_registry[self.char_registry.APOSTROPHE_CONSTANT] + str(index_apo),
-                self.space_before + apostrophe + self.space_after)
+            value = value.replace(mask + str(index_apo), self.space_before + apostrophe + self.space_after)
         return value
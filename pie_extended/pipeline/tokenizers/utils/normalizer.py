@@ -0,0 +1,96 @@
+import re
+from typing import Sequence, List, Tuple, Optional
+
+from pie_extended.pipeline.tokenizers.utils.excluder import ExcluderPrototype
+
+
+class CompiledNormalizer:
+    """ Runs the excluders of a tokenizer over a text, giving the same output as running their
+    .before_sentence_tokenizer() (or .after_sentence_tokenizer()) one after the other.
+
+    Consecutive excluders which only work inside whitespace-delimited runs (cf. ExcluderPrototype.trigger_chars) are
+    grouped: a single scan finds the runs containing one of the characters triggering them, and the excluders of the
+    group are only applied to these runs, joined by new lines, instead of the whole text. Other excluders run over the
+    whole text, in their original order. When the runs cover most of the text or do not come back as many as they
+    went, the group is applied to the whole text instead.
+
+    :param excluders: Excluders of the tokenizer, in the order they would be applied
+    :param max_coverage: Share of the text above which the excluders of a group are applied to the whole text
+
+    >>> from pie_extended.pipeline.tokenizers.utils.excluder import ApostropheExcluder, ReferenceExcluder
+    >>> normalizer = CompiledNormalizer([ApostropheExcluder(), ReferenceExcluder()])
+    >>> normalizer.before_sentence_tokenizer("Et l'abbé de [REF:1.a] lorsqu'il vint.")
+    'Et l風0abbé de  左REF桁1語a右  lorsqu風0il vint.'
+    >>> normalizer.after_sentence_tokenizer(_)
+    "Et l' abbé de  [REF:1.a]  lorsqu' il vint."
+    """
+    def __init__(self, excluders: Sequence[ExcluderPrototype], max_coverage: float = .5):
+        self.excluders: Tuple[ExcluderPrototype, ...] = tuple(excluders)
+        self.max_coverage: float = max_coverage
+        self.fallbacks: int = 0
+        # Steps are either a group of local excluders with the regex of their runs, or a single excluder
+        self._steps: List[Tuple[Tuple[ExcluderPrototype, ...], Optional[re.Pattern]]] = []
+        group, chars = [], ""
+        for excluder in self.excluders:
+            trigger = excluder.trigger_chars
+            if trigger is None:
+                self._add_group(group, chars)
+                group, chars = [], ""
+                self._steps.append(((excluder, ), None))
+            elif trigger:  # Excluders triggered by nothing never change anything
+                group.append(excluder)
+                chars += "".join(char for char in trigger if char not in chars)
+        self._add_group(group, chars)
+
+    def _add_group(self, group: List[ExcluderPrototype], chars: str):
+        if not group:
+            return
+        chars = "".join(re.escape(char) for char in chars)
+        # Runs are only looked for at their start, so that words without any of the characters are scanned once
+        self._steps.append((tuple(group), re.compile(r"(?<!\S)[^\s" + chars + r"]*[" + chars + r"]\S*")))
+
+    @staticmethod
+    def _apply(excluders: Sequence[ExcluderPrototype], value: str) -> str:
+        for excluder in excluders:
+            value = excluder.before_sentence_tokenizer(value)
+        return value
+
+    def _apply_to_runs(self, excluders: Sequence[ExcluderPrototype], runs: re.Pattern, value: str) -> str:
+        found = runs.findall(value)
+        if not found:
+            return value
+        if sum(map(len, found)) > self.max_coverage * len(value):
+            return self._apply(excluders, value)
+
+        # What surrounds the runs, including the empty strings before or after them at the edges of the text
+        between = runs.split(value)
+        # Runs are separated and surrounded by new lines so that ^, $, \b and lookarounds see at their edges what they
+        # would see in the text (whitespace, or its start or end). $ also matches before a final new line, hence two.
+        lead = "\n" if between[0] else ""
+        trail = "\n\n" if between[-1] else ""
+        parts = self._apply(excluders, lead + "\n".join(found) + trail).split("\n")
+        first, stop = len(lead), len(parts) - len(trail)
+        if stop - first != len(found) or any(parts[:first]) or any(parts[stop:]):
+            self.fallbacks += 1
+            return self._apply(excluders, value)
+
+        out = [""] * (2 * len(found) + 1)
+        out[0::2] = between
+        out[1::2] = parts[first:stop]
+        return "".join(out)
+
+    def before_sentence_tokenizer(self, value: str) -> str:
+        """ Applies the .before_sentence_tokenizer() of the excluders """
+        for excluders, runs in self._steps:
+            if runs is None:
+                value = self._apply(excluders, value)
+            else:
+                value = self._apply_to_runs(excluders, runs, value)
+        return value
+
+    def after_sentence_tokenizer(self, value: str) -> str:
+        """ Applies the .after_sentence_tokenizer() of the excluders. These are plain str.replace() of masks, which
+        are faster one after the other than any single scan for all of them. """
+        for excluder in self.excluders:
+            value = excluder.after_sentence_tokenizer(value)
+        return value
@@ -12,4 +12,5 @@ RomanNumbers = r"(?:M{1,4}(?:CM|CD|D?C{0,3})(?:XC|XL|L?X{0,3})" \
 DOTS_EXCEPT_APOSTROPHES = r"[" + chars.DOTS_EXCEPT_APOSTROPHES + "‘’]"
 ENDING_APOSTROPHE = r"(?<=\w)([\'’ʼ])"
 
-NON_WORD_NON_SPACE = r"(\s*)([^\w\s])(\s*)"
+# Masks of the excluders (private use characters, cf. CharRegistry) are part of words
+NON_WORD_NON_SPACE = r"(\s*)([^\w\s\p{Co}])(\s*)"
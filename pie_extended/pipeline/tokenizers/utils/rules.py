@@ -0,0 +1,38 @@
+import regex as re
+from typing import Optional, Iterable
+
+
+class SubstitutionRule:
+    r""" Precompiled substitution of a rule-based tokenizer, skipped on texts where it cannot match
+
+    :param pattern: Regular expression to replace
+    :param replacement: Replacement template (cf. regex.sub)
+    :param triggers: Characters of which at least one is part of any match of [pattern], None if there are none
+    :param flags: Flags of [pattern]
+
+    >>> rule = SubstitutionRule(r"(\w+)'", r"\1' ", triggers="'")
+    >>> rule.apply("l'ostal"), rule.apply("ostal")
+    ("l' ostal", 'ostal')
+    """
+    __slots__ = ("pattern", "replacement", "triggers")
+
+    def __init__(self, pattern: str, replacement: str, triggers: Optional[str] = None, flags: int = 0):
+        self.pattern: re.Regex = re.compile(pattern, flags=flags)
+        self.replacement: str = replacement
+        self.triggers: Optional[str] = triggers
+
+    def apply(self, text: str) -> str:
+        if self.triggers is not None:
+            for char in self.triggers:
+                if char in text:
+                    break
+            else:
+                return text
+        return self.pattern.sub(self.replacement, text)
+
+
+def apply_rules(rules: Iterable[SubstitutionRule], text: str) -> str:
+    """ Applies [rules] to [text], one after the other """
+    for rule in rules:
+        text = rule.apply(text)
+    return text
@@ -0,0 +1,61 @@
+from typing import Iterable, Sequence, Dict, Tuple, Callable, Optional
+
+
+class _Node:
+    __slots__ = ("children", "end")
+
+    def __init__(self):
+        # Key of the unit -> (regex of the unit, node)
+        self.children: Dict[str, Tuple[str, "_Node"]] = {}
+        self.end: bool = False
+
+    def render(self) -> str:
+        alternatives = [unit + node.render() for unit, node in self.children.values()]
+        if not alternatives:
+            return ""
+        if len(alternatives) == 1 and not self.end:
+            return alternatives[0]
+        # The optional group is greedy: longer alternatives are tried before stopping here
+        return "(?:" + "|".join(alternatives) + (")?" if self.end else ")")
+
+
+def trie_pattern(words: Iterable[Sequence[str]], key: Optional[Callable[[str], str]] = None,
+                 longest_only: bool = False) -> str:
+    """ Builds a regular expression matching the same strings as the alternation of [words], with common prefixes
+    factored, so that the regex engine reads each character once instead of trying every alternative in turn.
+
+    Words are sequences of units (regular expressions matching a single character or a run of characters). Units
+    with the same key are considered equal. Units following each other in a word must not be able to both match the
+    same characters and two units which do not have the same key must never match the same character, so that
+    two words only match the same start of a string when one is a prefix of the other.
+
+    :param words: Words, in the order they are tried in the alternation
+    :param key: Function giving the key of a unit, defaults to the unit itself
+    :param longest_only: Whether the pattern is meant to match the words on their own, without anything following them
+        that would make the regex engine backtrack. In that case, the first word matching the start of a string
+        in the alternation is the one matched, so words which have a prefix earlier in [words] never match and are
+        dropped. The pattern then matches the same word as the alternation.
+    :return: Regular expression, without groups
+
+    >>> trie_pattern(["ab", "ac", "b"])
+    '(?:a(?:b|c)|b)'
+    >>> trie_pattern([["V", r"\\."], ["V", r"\\.", r"\\s+", "a", "c", "t"]])
+    'V\\\\.(?:\\\\s+act)?'
+    >>> trie_pattern([["V", r"\\."], ["V", r"\\.", r"\\s+", "a", "c", "t"]], longest_only=True)
+    'V\\\\.'
+    """
+    key = key or (lambda unit: unit)
+    root = _Node()
+    for word in words:
+        node = root
+        for unit in word:
+            if longest_only and node.end:  # An earlier word is a prefix of this one
+                break
+            unit_key = key(unit)
+            child = node.children.get(unit_key)
+            if child is None:
+                child = node.children[unit_key] = (unit, _Node())
+            node = child[1]
+        else:
+            node.end = True
+    return root.render()
@@ -0,0 +1,165 @@
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Iterable, Iterator, Callable, TypeVar, Any
+
+_T = TypeVar("_T")
+
+
+class StageStats:
+    """ Counters of a stage of the pipeline: time spent in it, number of calls and of sentences and tokens processed,
+    and, for stages working on batches, the number of batches per size """
+    __slots__ = ("time", "calls", "sentences", "tokens", "batch_sizes")
+
+    def __init__(self):
+        self.time: float = 0.
+        self.calls: int = 0
+        self.sentences: int = 0
+        self.tokens: int = 0
+        self.batch_sizes: Counter = Counter()
+
+    def update(self, other: "StageStats"):
+        self.time += other.time
+        self.calls += other.calls
+        self.sentences += other.sentences
+        self.tokens += other.tokens
+        self.batch_sizes.update(other.batch_sizes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "time": self.time,
+            "calls": self.calls,
+            "sentences": self.sentences,
+            "tokens": self.tokens,
+            "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())}
+        }
+
+
+class DocumentStats:
+    """ Stages counters and wall time of a document """
+    __slots__ = ("name", "wall", "stages")
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.wall: float = 0.
+        self.stages: Dict[str, StageStats] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "wall": self.wall,
+                "stages": {stage: stats.to_dict() for stage, stats in self.stages.items()}}
+
+
+class Profiler:
+    """ Records the time spent in each stage of the tagger (tokenize, exclude, cache, tag, disambiguate, postprocess,
+    format) along with call, sentence, token and batch counts, for each document and for the whole run.
+
+    When stages run concurrently (cf. ExtensibleTagger.pipelined), their times overlap and add up to more than the
+    wall time of the document.
+
+    >>> profiler = Profiler()
+    >>> with profiler.document("file.txt"):
+    ...     profiler.record("tag", 0.5, sentences=2, tokens=10, batch_size=2)
+    ...     tokens = list(profiler.iter_sentences("tokenize", [["a", "b"], ["c"]]))
+    >>> profiler.total["tag"].to_dict()
+    {'time': 0.5, 'calls': 1, 'sentences': 2, 'tokens': 10, 'batch_sizes': {'2': 1}}
+    >>> profiler.documents[0].stages["tokenize"].tokens
+    3
+    """
+    def __init__(self):
+        self.total: Dict[str, StageStats] = {}
+        self.documents: List[DocumentStats] = []
+        self._current: Optional[DocumentStats] = None
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, elapsed: float, sentences: int = 0, tokens: int = 0,
+               batch_size: Optional[int] = None, calls: int = 1):
+        """ Records a call to [stage] which took [elapsed] seconds """
+        with self._lock:
+            for stages in (self.total, self._current.stages if self._current else None):
+                if stages is None:
+                    continue
+                stats = stages.get(stage)
+                if stats is None:
+                    stats = stages[stage] = StageStats()
+                stats.time += elapsed
+                stats.calls += calls
+                stats.sentences += sentences
+                stats.tokens += tokens
+                if batch_size is not None:
+                    stats.batch_sizes[batch_size] += 1
+
+    def wrap(self, stage: str, func: Callable[..., _T], sentences: int = 0, tokens: int = 0) -> Callable[..., _T]:
+        """ Returns [func] recording each of its calls in [stage] """
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            out = func(*args, **kwargs)
+            self.record(stage, time.perf_counter() - start, sentences=sentences, tokens=tokens)
+            return out
+        return timed
+
+    def iter_sentences(self, stage: str, sentences: Iterable[List[str]]) -> Iterator[List[str]]:
+        """ Yields from [sentences], recording the time spent producing each of them in [stage] """
+        iterator = iter(sentences)
+        while True:
+            start = time.perf_counter()
+            try:
+                sentence = next(iterator)
+            except StopIteration:
+                self.record(stage, time.perf_counter() - start, calls=0)
+                return
+            self.record(stage, time.perf_counter() - start, sentences=1, tokens=len(sentence))
+            yield sentence
+
+    @contextmanager
+    def document(self, name: str):
+        """ Records the stages run in this context as part of the document [name] """
+        document = DocumentStats(name)
+        self.documents.append(document)
+        self._current = document
+        start = time.perf_counter()
+        try:
+            yield document
+        finally:
+            document.wall = time.perf_counter() - start
+            self._current = None
+
+    def add(self, stages: Dict[str, StageStats]):
+        """ Adds [stages] recorded elsewhere (such as in another process) to the current document and to the total """
+        with self._lock:
+            for target in (self.total, self._current.stages if self._current else None):
+                if target is None:
+                    continue
+                for stage, stats in stages.items():
+                    target.setdefault(stage, StageStats()).update(stats)
+
+    def merge(self, documents: List[DocumentStats]):
+        """ Adds [documents] recorded elsewhere (such as in another process) """
+        for document in documents:
+            self.documents.append(document)
+            self.add(document.stages)
+
+    def reset(self):
+        self.total = {}
+        self.documents = []
+        self._current = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": {stage: stats.to_dict() for stage, stats in self.total.items()},
+            "documents": [document.to_dict() for document in self.documents]
+        }
+
+    def report(self) -> str:
+        """ Formats the total of each stage as a table """
+        lines = ["{:<14}{:>10}{:>10}{:>12}{:>12}{:>14}".format(
+            "stage", "time (s)", "calls", "sentences", "tokens", "tokens/s")]
+        for stage, stats in sorted(self.total.items(), key=lambda item: -item[1].time):
+            lines.append("{:<14}{:>10.3f}{:>10}{:>12}{:>12}{:>14}".format(
+                stage, stats.time, stats.calls, stats.sentences, stats.tokens,
+                "{:.0f}".format(stats.tokens / stats.time) if stats.time and stats.tokens else "-"
+            ))
+        if self.documents:
+            lines.append("{} documents, {:.3f}s of wall time".format(
+                len(self.documents), sum(document.wall for document in self.documents)))
+        return "\n".join(lines)
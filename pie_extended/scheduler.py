@@ -0,0 +1,156 @@
+import os
+import time
+import threading
+from collections import deque, Counter
+from concurrent.futures import Future
+from typing import List, Tuple, Callable, Optional, Deque
+
+
+TagFunction = Callable[..., Tuple[List[list], List[str]]]
+
+
+class _Submission:
+    """ Sentences submitted by a caller, some of which might already be tagged """
+    __slots__ = ("sents", "lengths", "tagged", "remaining", "taken", "submitted", "future")
+
+    def __init__(self, sents: List[List[str]], lengths: List[int]):
+        self.sents: List[List[str]] = sents
+        self.lengths: List[int] = lengths
+        self.tagged: List[Optional[list]] = [None] * len(sents)
+        self.remaining: int = len(sents)
+        self.taken: int = 0
+        self.submitted: float = time.monotonic()
+        self.future: Future = Future()
+
+
+class BatchScheduler:
+    """ Collects sentences submitted by concurrent callers (such as the requests of a server) into shared batches, so
+    that the models run on full batches instead of one small batch per caller.
+
+    A batch is sent to [tag] once it holds [batch_size] sentences, once the padded tokens of its sentences reach
+    [max_tokens] or once its oldest sentence waited [max_wait] seconds. Each caller receives its own sentences,
+    so that its tokenizer and processor state stay its own.
+
+    :param tag: Function tagging a batch, usually ExtensibleTagger.tag
+    :param batch_size: Maximum number of sentences per batch
+    :param max_tokens: Maximum number of padded tokens per batch
+    :param max_wait: Maximum time (in seconds) a sentence waits for other ones before being tagged
+
+    >>> scheduler = BatchScheduler(lambda sents, lengths: ([[w.upper() for w in s] for s in sents], ["task"]))
+    >>> scheduler.submit([["a", "b"], ["c"]], [2, 1]).result()
+    ([['A', 'B'], ['C']], ['task'])
+    >>> scheduler.close()
+    """
+    def __init__(self, tag: TagFunction, batch_size: int = 100, max_tokens: Optional[int] = None,
+                 max_wait: float = 0.005):
+        self.tag: TagFunction = tag
+        self.batch_size: int = batch_size
+        self.max_tokens: Optional[int] = max_tokens
+        self.max_wait: float = max_wait
+        self.tasks: Optional[List[str]] = None
+        self.batch_sizes: Counter = Counter()
+
+        self._pending: Deque[_Submission] = deque()
+        self._queued_sentences: int = 0
+        self._queued_tokens: int = 0
+        self._condition = threading.Condition()
+        self._closed: bool = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def submit(self, sents: List[List[str]], lengths: List[int]) -> Future:
+        """ Submits sentences to be tagged
+
+        :return: Future of the tagged sentences, in the order of [sents], and of the tasks
+        """
+        submission = _Submission(list(sents), list(lengths))
+        if not submission.sents and self.tasks is not None:
+            submission.future.set_result(([], self.tasks))
+            return submission.future
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The scheduler is closed")
+            # Threads do not survive forks
+            if self._thread is None or self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+            self._pending.append(submission)
+            self._queued_sentences += len(submission.sents)
+            self._queued_tokens += sum(submission.lengths)
+            self._condition.notify()
+        return submission.future
+
+    def close(self):
+        """ Tags what is still pending and stops the scheduler thread """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+
+    def _full(self) -> bool:
+        return self._queued_sentences >= self.batch_size or \
+            (self.max_tokens is not None and self._queued_tokens >= self.max_tokens)
+
+    def _take(self) -> Tuple[List[_Submission], List[Tuple[_Submission, int]]]:
+        """ Takes the sentences of the next batch, in order of submission """
+        involved, batch = [], []
+        longest = 0
+        while self._pending and len(batch) < self.batch_size:
+            submission = self._pending[0]
+            if submission.future.done():  # Failed in a previous batch
+                self._pending.popleft()
+                self._queued_sentences -= len(submission.sents) - submission.taken
+                self._queued_tokens -= sum(submission.lengths[submission.taken:])
+                continue
+            if submission.taken < len(submission.sents):
+                length = submission.lengths[submission.taken]
+                if self.max_tokens and batch and (len(batch) + 1) * max(longest, length) > self.max_tokens:
+                    break
+                longest = max(longest, length)
+                batch.append((submission, submission.taken))
+                submission.taken += 1
+                self._queued_sentences -= 1
+                self._queued_tokens -= length
+            if not involved or involved[-1] is not submission:
+                involved.append(submission)
+            if submission.taken == len(submission.sents):
+                self._pending.popleft()
+        return involved, batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                deadline = self._pending[0].submitted + self.max_wait
+                while not self._full() and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                involved, batch = self._take()
+            self._tag_batch(involved, batch)
+
+    def _tag_batch(self, involved: List[_Submission], batch: List[Tuple[_Submission, int]]):
+        try:
+            tagged, tasks = self.tag(
+                sents=[submission.sents[index] for submission, index in batch],
+                lengths=[submission.lengths[index] for submission, index in batch]
+            )
+        except Exception as E:
+            for submission in involved:
+                if not submission.future.done():
+                    submission.future.set_exception(E)
+            return
+        self.tasks = tasks
+        self.batch_sizes[len(batch)] += 1
+        for (submission, index), sent in zip(batch, tagged):
+            submission.tagged[index] = sent
+            submission.remaining -= 1
+        for submission in involved:
+            if submission.remaining == 0 and not submission.future.done():
+                submission.future.set_result((submission.tagged, tasks))
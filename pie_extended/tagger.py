@@ -1,5 +1,11 @@
 import os
-from typing import Optional, Dict, Generator, Type
+import time
+import shutil
+import tempfile
+import contextlib
+import collections
+import multiprocessing
+from typing import Optional, Dict, Generator, Type, Union, Iterable, List, Tuple, TextIO
 
 from pie.utils import shutup
 
@@ -11,6 +17,11 @@ from .pipeline.formatters.proto import Formatter
 from .pipeline.disambiguators.proto import Disambiguator
 from .pipeline.iterators.proto import DataIterator
 from .pipeline.postprocessor.proto import ProcessorPrototype
+from .pipeline.postprocessor.compiled import GetWindow
+from .cache import SentenceCache, SqliteSentenceCache
+from .profiling import Profiler
+from .scheduler import BatchScheduler
+from .utils import bucket_batches, iter_in_thread, limit_torch_threads
 
 
 class ExtensibleTagger(Tagger):
@@ -18,9 +29,44 @@ class ExtensibleTagger(Tagger):
 
     :param quantize: Use Int8 quantization
     :param cache: Use cache
+    :param max_batch_tokens: If set, sentences are grouped by length and each batch is capped to this number of
+        padded tokens (on top of [batch_size] sentences)
+    :param bucket_window: Number of sentences read ahead and sorted by length when [max_batch_tokens] is set,
+        defaults to ten times the batch size
+    :param pipelined: Run tokenization, model inference and post-processing in concurrent stages
+    :param pipeline_queue_size: Number of batches each stage can prepare in advance when [pipelined] is True
+    :param sentence_cache: Cache of tagged sentences (in memory or in a SQLite file), so that only sentences that
+        were not seen reach the models
+    :param profiler: If set, records time and counters of each stage of the pipeline (cf. Profiler)
+    :param batch_scheduler: If set, sentences are sent to this scheduler, which batches them with the ones of other
+        threads using the same tagger, instead of being tagged in batches of their own
+    :param compile_processors: Flatten the chain of processors into a single function once tasks are known
+        (cf. ProcessorPrototype.compile)
+    :param tag_ids: Along with [compile_processors], encode the tags of each window as integer ids of the vocabulary of
+        their task, so that what the processors derive from tags is computed once for each combination of ids and then
+        looked up (cf. TagTable)
+    :param tag_table_size: Number of combinations of tags after which the table of [tag_ids] is emptied, 0 for none
     """
+    max_batch_tokens: Optional[int] = None
+    bucket_window: Optional[int] = None
+    pipelined: bool = False
+    pipeline_queue_size: int = 4
+    sentence_cache: Optional[Union[SentenceCache, SqliteSentenceCache]] = None
+    profiler: Optional[Profiler] = None
+    batch_scheduler: Optional[BatchScheduler] = None
+    compile_processors: bool = True
+    tag_ids: bool = False
+    tag_table_size: int = 100000
+
     def __init__(self, device='cpu', batch_size=100, lower=False, disambiguation=None,
-                 quantize=True, cache=True):
+                 quantize=True, cache=True, max_batch_tokens: Optional[int] = None,
+                 bucket_window: Optional[int] = None, pipelined: bool = False, pipeline_queue_size: int = 4,
+                 sentence_cache: Optional[Union[SentenceCache, SqliteSentenceCache]] = None,
+                 profiler: Optional[Profiler] = None,
+                 batch_scheduler: Optional[BatchScheduler] = None,
+                 compile_processors: bool = True,
+                 tag_ids: bool = False,
+                 tag_table_size: int = 100000):
         super(ExtensibleTagger, self).__init__(
             device=device,
             batch_size=batch_size,
@@ -29,34 +75,124 @@ class ExtensibleTagger(Tagger):
             cache=cache
         )
         self.disambiguation: Optional[Disambiguator] = disambiguation
+        self.max_batch_tokens: Optional[int] = max_batch_tokens
+        self.bucket_window: Optional[int] = bucket_window
+        self.pipelined: bool = pipelined
+        self.pipeline_queue_size: int = pipeline_queue_size
+        self.sentence_cache: Optional[Union[SentenceCache, SqliteSentenceCache]] = sentence_cache
+        self.model_specs: List[Tuple[str, Tuple[str, ...]]] = []
+        self.profiler: Optional[Profiler] = profiler
+        self.batch_scheduler: Optional[BatchScheduler] = batch_scheduler
+        self.compile_processors: bool = compile_processors
+        self.tag_ids: bool = tag_ids
+        self.tag_table_size: int = tag_table_size
 
-    def tag_file(self, fpath: str, iterator: DataIterator, processor: ProcessorPrototype, no_tokenizer: bool = False):
-        # Read content of the file
-        with open(fpath) as f:
-            data = f.read()
+    def add_model(self, model_path, *tasks):
+        super(ExtensibleTagger, self).add_model(model_path, *tasks)
+        self.model_specs.append((model_path, tasks))
 
-        _, ext = os.path.splitext(fpath)
+    @property
+    def model_identity(self) -> Tuple:
+        """ Identifies the models (and options) used by the tagger, so that cached outputs are not shared between
+        different taggers """
+        return self.lower, tuple(getattr(self, "model_specs", ()))
+
+    def tag_file(self, fpath: str, iterator: DataIterator, processor: ProcessorPrototype, no_tokenizer: bool = False,
+                 stream: bool = False, block_size: int = 1024 * 1024,
+                 shard_workers: int = 1, shard_size: int = 4 * 1024 * 1024):
+        """ Tags the file at [FPATH] and writes the output next to it
 
+        :param fpath: Path to the file to tag
+        :param iterator: Iterator used to read data
+        :param processor: Processor used to post-process data
+        :param no_tokenizer: Disable the tokenizer inside the iterator
+        :param stream: Read the file by blocks cut at sentence boundaries instead of loading it whole
+        :param block_size: Number of characters read at once when streaming
+        :param shard_workers: If higher than one, the file is cut at sentence boundaries in shards of about
+            [shard_size] characters which are tagged in parallel by this number of forked processes
+        :param shard_size: Number of characters per shard
+        :return: Path of the output file
+        """
+        _, ext = os.path.splitext(fpath)
         out_file = utils.ensure_ext(fpath, ext, 'pie')
-        with open(out_file, 'w+') as f:
-            for line in self.iter_tag(data, iterator, processor=processor, no_tokenizer=no_tokenizer):
-                f.write(line)
+
+        # Daemonic processes (such as the ones of a pool tagging multiple files) cannot fork
+        if shard_workers > 1 and multiprocessing.current_process().daemon:
+            shard_workers = 1
+
+        profiling = self.profiler.document(fpath) if self.profiler is not None else contextlib.nullcontext()
+        with profiling, open(fpath) as in_f:
+            if shard_workers > 1:
+                with open(out_file, 'w+') as f:
+                    self._tag_shards(
+                        iterator.read_blocks(in_f, block_size=shard_size, no_tokenizer=no_tokenizer),
+                        out=f, iterator=iterator, processor=processor, no_tokenizer=no_tokenizer,
+                        workers=shard_workers
+                    )
+                return out_file
+
+            if stream:
+                data = iterator.read_blocks(in_f, block_size=block_size, no_tokenizer=no_tokenizer)
+            else:
+                # Read content of the file
+                data = in_f.read()
+
+            with open(out_file, 'w+') as f:
+                for line in self.iter_tag(data, iterator, processor=processor, no_tokenizer=no_tokenizer):
+                    f.write(line)
 
         return out_file
 
-    def tag_str(self, data: str, iterator: DataIterator, processor: ProcessorPrototype,
+    def _tag_shards(self, shards: Iterable[str], out: TextIO, iterator: DataIterator, processor: ProcessorPrototype,
+                    no_tokenizer: bool = False, workers: int = 2, formatter_class: Type[Formatter] = Formatter):
+        """ Tags [shards] of a same document in forked processes and writes their output in order to [out]
+
+        Each shard is treated as its own document by the workers (tokenizer memory and processor are reset), while
+        headers and footer are written once for the whole document.
+        """
+        global _SHARD_CONTEXT
+        _SHARD_CONTEXT = (self, iterator, processor, formatter_class, no_tokenizer)
+        formatter = None
+        pending = collections.deque()
+
+        def write(result):
+            nonlocal formatter
+            path, tasks, stages = result.get()
+            if stages is not None and self.profiler is not None:
+                self.profiler.add(stages)
+            if tasks is not None and not formatter:
+                formatter = formatter_class(tasks)
+                out.write(formatter.write_headers())
+            with open(path) as shard_output:
+                shutil.copyfileobj(shard_output, out)
+            os.remove(path)
+
+        with tempfile.TemporaryDirectory() as directory, \
+                multiprocessing.get_context("fork").Pool(workers, initializer=limit_torch_threads) as pool:
+            for index, shard in enumerate(shards):
+                pending.append(pool.apply_async(_tag_shard, (index, shard, directory)))
+                # Keeps a bounded number of shards in memory
+                if len(pending) > workers * 2:
+                    write(pending.popleft())
+            while pending:
+                write(pending.popleft())
+
+        if formatter:
+            out.write(formatter.write_footer())
+
+    def tag_str(self, data: Union[str, Iterable[str]], iterator: DataIterator, processor: ProcessorPrototype,
                 no_tokenizer: bool = False) -> str:
         return list(self.iter_tag_token(data, iterator, processor=processor, no_tokenizer=no_tokenizer))
 
     def iter_tag_token(self,
-                       data: str,
+                       data: Union[str, Iterable[str]],
                        iterator: DataIterator,
                        processor: ProcessorPrototype,
                        no_tokenizer: bool = False,
                        empty_token_on_sent_break: bool = False) -> Generator[Optional[Dict[str, str]], None, None]:
         """ Reads the string in [DATA] with [ITERATOR] and [PROCESSOR], then returns each token as a dict
 
-        :param data: Textual
+        :param data: Textual data, either as a string or as an iterable of blocks of text
         :param iterator: Iterator used to read data
         :param processor: Processor used to post-process data
         :param no_tokenizer: Disable the tokenizer inside the iterator
@@ -66,63 +202,208 @@ class ExtensibleTagger(Tagger):
         # Reset at each document
         processor.reset()
         iterator.tokenizer.reset()
-        # Iterate !
-        for chunk in utils.chunks(
-                iterator(data, lower=self.lower, no_tokenizer=no_tokenizer),
-                size=self.batch_size):
+        windows = utils.chunks(
+            iterator(data, lower=self.lower, no_tokenizer=no_tokenizer, profiler=self.profiler),
+            size=self._window_size
+        )
+        if self.pipelined:
+            # Tokenization runs in its own thread
+            windows = iter_in_thread(windows, maxsize=self.pipeline_queue_size)
 
-            # Unzip the batch into the sentences, their sizes and the dictionaries of things that needs
-            #  to be reinserted
-            sents, lengths, needs_reinsertion = zip(*chunk)
-            is_empty = [not bool(sent) for sent in sents]
+        # Unzip the batch into the sentences, their sizes and the dictionaries of things that needs
+        #  to be reinserted
+        tagged_windows = (
+            (needs_reinsertion, *self._tag_window(sents, lengths))
+            for sents, lengths, needs_reinsertion in (zip(*chunk) for chunk in windows)
+        )
+        if self.pipelined:
+            # Inference runs in its own thread, post-processing stays in the consumer's one
+            tagged_windows = iter_in_thread(tagged_windows, maxsize=self.pipeline_queue_size)
 
-            tagged, tasks = self.tag(
-                sents=[sent for sent in sents if sent],
-                lengths=[l for l in lengths if l != 0]
-            )
+        disambiguation = self.disambiguation
+        if self.profiler is not None and disambiguation:
+            disambiguation = self.profiler.wrap("disambiguate", disambiguation, sentences=1)
+        get_batch, get_batch_tasks = processor.get_batch, None
 
+        # Iterate !
+        for needs_reinsertion, tagged, tasks in tagged_windows:
             if not processor.task_init:
                 processor.set_tasks(tasks)
+            if tasks != get_batch_tasks:
+                get_batch, get_batch_tasks = self._get_batch_function(processor), tasks
 
-            # We keep a real sentence index
-            for sents_index, sent_is_empty in enumerate(is_empty):
-                if sent_is_empty:
-                    sent = []
-                else:
-                    sent = tagged.pop(0)
+            # If we have a disambiguator, we run the results into it
+            if disambiguation:
+                tagged = [disambiguation(sent, tasks) if sent else sent for sent in tagged]
 
-                # Gets things that needs to be reinserted
-                sent_reinsertion = needs_reinsertion[sents_index]
+            # Things that need to be reinserted go back where they were
+            for rows in get_batch(tagged, needs_reinsertion):
+                yield from rows
+                if empty_token_on_sent_break:
+                    yield None
 
-                # If we have a disambiguator, we run the results into it
-                if self.disambiguation and sent:
-                    sent = self.disambiguation(sent, tasks)
+    def _get_batch_function(self, processor: ProcessorPrototype):
+        """ Function post-processing the sentences of a window along with their reinsertions, once the tasks of
+        [processor] are set, which yields the rows of each sentence """
+        get_dict = processor.get_dict
+        get_window: Optional[GetWindow] = None
+        if self.compile_processors:
+            get_dict = processor.compile()
+            if self.tag_ids:
+                get_window = processor.compile_window(table_size=self.tag_table_size)
+        if get_dict == processor.get_dict:
+            # The processors post-process the sentence at once, layer by layer
+            get_batch = processor.get_batch
+        else:
+            def get_batch(sentence, reinsertion, get_dict=get_dict):
+                return processor.get_batch(sentence, reinsertion, get_dict=get_dict)
+        profiler = self.profiler
+        if profiler is not None:
+            function = get_batch
 
-                reinsertion_index = 0
+            def get_batch(sentence, reinsertion, **kwargs):
+                start = time.perf_counter()
+                out = function(sentence, reinsertion, **kwargs)
+                profiler.record("postprocess", time.perf_counter() - start, sentences=1,
+                                tokens=len(sentence) + len(reinsertion))
+                return out
 
-                for index, (token, tags) in enumerate(sent):
-                    # Before current index
-                    while reinsertion_index + index in sent_reinsertion:
-                        yield processor.reinsert(sent_reinsertion[reinsertion_index+index])
-                        del sent_reinsertion[reinsertion_index + index]
-                        reinsertion_index += 1
+        def postprocess(sentences: List[list], reinsertions: Tuple[Dict[int, str], ...]):
+            if get_window is None:
+                for sentence, reinsertion in zip(sentences, reinsertions):
+                    yield get_batch(sentence, reinsertion)
+                return
+            # Rows of the whole window are computed at once from the ids of their tags
+            start = time.perf_counter()
+            window_get_dict = get_window([item for sentence in sentences for item in sentence])
+            if profiler is not None:
+                profiler.record("postprocess", time.perf_counter() - start)
+            for sentence, reinsertion in zip(sentences, reinsertions):
+                yield get_batch(sentence, reinsertion, get_dict=window_get_dict)
+        return postprocess
 
-                    yield from processor.get_dict(token, tags)
+    @property
+    def _window_size(self) -> int:
+        """ Number of sentences read from the iterator before being tagged """
+        if self.max_batch_tokens:
+            return self.bucket_window or self.batch_size * 10
+        return self.batch_size
 
-                for reinsertion in sorted(list(sent_reinsertion.keys())):
-                    yield processor.reinsert(sent_reinsertion[reinsertion])
-                if empty_token_on_sent_break:
-                    yield None
+    def _tag_window(self, sents: Tuple[List[str], ...], lengths: Tuple[int, ...]) -> Tuple[List[list], List[str]]:
+        """ Tags a window of sentences read from the iterator, in one or more batches
+
+        :param sents: Sentences of the window, some of which might be empty
+        :param lengths: Length of each sentence
+        :return: Tagged sentences in the order of [sents] (empty sentences stay empty) and the tasks
+        """
+        indexes = [index for index, length in enumerate(lengths) if length != 0]
+        tagged: List[list] = [[] for _ in sents]
+        tasks = None
+
+        # Sentences found in the cache are not tagged again, neither are repetitions of a same sentence in the window
+        keys: Dict[int, Tuple] = {}
+        repeated: Dict[int, List[int]] = {}
+        profiler = self.profiler
+        if self.sentence_cache is not None:
+            start = time.perf_counter()
+            model_identity = self.model_identity
+            first_seen: Dict[Tuple, int] = {}
+            misses = []
+            for index in indexes:
+                keys[index] = (model_identity, tuple(sents[index]))
+            for index, cached in zip(indexes, self.sentence_cache.get_many([keys[index] for index in indexes])):
+                if cached is not None:
+                    tagged[index], tasks = list(cached[0]), cached[1]
+                elif keys[index] in first_seen:
+                    repeated.setdefault(first_seen[keys[index]], []).append(index)
+                else:
+                    first_seen[keys[index]] = index
+                    misses.append(index)
+            if profiler is not None:
+                profiler.record("cache", time.perf_counter() - start, sentences=len(indexes))
+            indexes = misses
 
-    def iter_tag(self, data: str, iterator: DataIterator, processor: ProcessorPrototype,
-                 formatter_class: Type[Formatter] = Formatter, no_tokenizer: bool = False):
+        if self.batch_scheduler is not None:
+            # The scheduler makes the batches
+            batches = [indexes]
+        elif self.max_batch_tokens:
+            batches = [
+                [indexes[position] for position in batch]
+                for batch in bucket_batches([lengths[index] for index in indexes],
+                                            batch_size=self.batch_size, max_tokens=self.max_batch_tokens)
+            ] or [[]]
+        else:
+            batches = [indexes]
+
+        for batch in batches:
+            if not batch and tasks is not None:
+                continue
+            start = time.perf_counter() if profiler is not None else None
+            if self.batch_scheduler is not None:
+                batch_tagged, tasks = self.batch_scheduler.submit(
+                    [sents[index] for index in batch],
+                    [lengths[index] for index in batch]
+                ).result()
+            else:
+                batch_tagged, tasks = self.tag(
+                    sents=[sents[index] for index in batch],
+                    lengths=[lengths[index] for index in batch]
+                )
+            if profiler is not None:
+                profiler.record("tag", time.perf_counter() - start, sentences=len(batch),
+                                tokens=sum(lengths[index] for index in batch), batch_size=len(batch))
+            for index, sent in zip(batch, batch_tagged):
+                tagged[index] = sent
+
+        if self.sentence_cache is not None:
+            start = time.perf_counter()
+            self.sentence_cache.set_many([(keys[index], tuple(tagged[index]), tasks) for index in indexes])
+            if profiler is not None:
+                profiler.record("cache", time.perf_counter() - start)
+            for index, repetitions in repeated.items():
+                for repetition in repetitions:
+                    tagged[repetition] = list(tagged[index])
+        return tagged, tasks
+
+    def iter_tag(self, data: Union[str, Iterable[str]], iterator: DataIterator, processor: ProcessorPrototype,
+                 formatter_class: Type[Formatter] = Formatter, no_tokenizer: bool = False, headers: bool = True):
         formatter = None
+        format_annotation = None
 
         for annotation in self.iter_tag_token(data, iterator, processor, no_tokenizer = no_tokenizer):
             if not formatter:
                 formatter = formatter_class(processor.tasks)
-                yield formatter.write_headers()
-            yield formatter.write_line(formatter.format_line(annotation))
+                format_annotation = lambda annot: formatter.write_line(formatter.format_line(annot))
+                if self.profiler is not None:
+                    format_annotation = self.profiler.wrap("format", format_annotation, tokens=1)
+                if headers:
+                    yield formatter.write_headers()
+            yield format_annotation(annotation)
 
-        if formatter:
+        if formatter and headers:
             yield formatter.write_footer()
+
+
+# Tagger, iterator, processor, formatter class and no_tokenizer option shared with forked shard workers.
+#   It is set before the pool is created so that models are inherited copy-on-write.
+_SHARD_CONTEXT: Optional[Tuple[ExtensibleTagger, DataIterator, ProcessorPrototype, Type[Formatter], bool]] = None
+
+
+def _tag_shard(index: int, shard: str, directory: str) -> Tuple[str, Optional[List[str]], Optional[Dict]]:
+    """ Tags a shard of a document in a worker and writes its lines, without headers, in [directory]
+
+    :return: Path of the shard output, tasks of the processor (None if nothing was tagged) and, if the tagger has a
+        profiler, the stages recorded for this shard
+    """
+    tagger, iterator, processor, formatter_class, no_tokenizer = _SHARD_CONTEXT
+    if tagger.profiler is not None:
+        tagger.profiler.reset()
+    path = os.path.join(directory, "{}.pie".format(index))
+    tasks = None
+    with open(path, "w") as f:
+        for line in tagger.iter_tag(shard, iterator, processor, formatter_class=formatter_class,
+                                    no_tokenizer=no_tokenizer, headers=False):
+            f.write(line)
+            if tasks is None:
+                tasks = processor.tasks
+    return path, tasks, tagger.profiler.total if tagger.profiler is not None else None
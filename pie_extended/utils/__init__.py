@@ -1,5 +1,8 @@
 from collections import namedtuple
+from typing import List, Iterable, Generator, TypeVar
 import os
+import queue
+import threading
 
 Metadata = namedtuple("Metadata", ["title", "lang", "authors", "description", "link"])
 
@@ -23,6 +26,9 @@ PATH = os.getenv(
 )
 
 
+_T = TypeVar("_T")
+
+
 def get_path(module, file):
     return os.path.join(PATH, module, file)
 
@@ -57,3 +63,98 @@ def roman_number(inp: str) -> int:
         else:
             result -= roman_numerals[c]
     return result
+
+
+def bucket_batches(lengths: List[int], batch_size: int, max_tokens: int) -> List[List[int]]:
+    """ Groups sentences of similar length together so that padding is minimal.
+
+    Sentences are sorted by length and batches are filled until either [batch_size] sentences
+    are in it or the padded size of the batch (number of sentences * longest sentence) would exceed
+    [max_tokens]. A sentence longer than [max_tokens] gets its own batch.
+
+    :param lengths: Length of each sentence
+    :param batch_size: Maximum number of sentences per batch
+    :param max_tokens: Maximum number of padded tokens per batch
+    :return: List of batches, as lists of indexes in [lengths]
+
+    >>> bucket_batches([3, 64, 2, 3, 60], batch_size=100, max_tokens=128)
+    [[2, 0, 3], [4, 1]]
+    >>> bucket_batches([3, 3, 3], batch_size=2, max_tokens=128)
+    [[0, 1], [2]]
+    >>> bucket_batches([200, 2], batch_size=10, max_tokens=128)
+    [[1], [0]]
+    """
+    batches, batch = [], []
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        if batch and (len(batch) == batch_size or (len(batch) + 1) * lengths[index] > max_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def iter_in_thread(iterable: Iterable[_T], maxsize: int = 4) -> Generator[_T, None, None]:
+    """ Consumes [iterable] in a background thread and yields its items through a bounded queue, so that
+    producing the next items overlaps with whatever is done with the current one.
+
+    Exceptions raised by [iterable] are raised again in the consumer. Closing the generator stops the thread and waits
+    for it.
+
+    :param iterable: Iterable to consume in the background
+    :param maxsize: Maximum number of items produced in advance
+
+    >>> list(iter_in_thread(range(5), maxsize=2))
+    [0, 1, 2, 3, 4]
+    """
+    items: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((False, item)):
+                    break
+            else:
+                put((True, None))
+        except BaseException as exception:
+            put((True, exception))
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            done, item = items.get()
+            if done:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+        # The producer might still be running [iterable] (e.g. filling the memory of a tokenizer the next document
+        #   resets): it is waited for, and what it had produced in advance is dropped
+        while thread.is_alive():
+            thread.join(.1)
+            while not items.empty():
+                items.get_nowait()
+
+
+def limit_torch_threads():
+    """ Restricts torch to one thread, used in forked workers where parallelism is across processes """
+    import torch
+    torch.set_num_threads(1)
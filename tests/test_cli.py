@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from unittest import TestCase
+
+from pie_extended.cli.utils import iter_tag_files, WorkerError
+from pie_extended.profiling import Profiler
+from .test_tagger import TokenTagger, TEXT
+
+
+class UnpicklableError(Exception):
+    def __init__(self, fpath):
+        super(UnpicklableError, self).__init__(fpath)
+        self.callback = lambda: fpath
+
+
+class UnpicklableErrorTagger(TokenTagger):
+    failing = None
+
+    def tag_file(self, fpath, *args, **kwargs):
+        if fpath == self.failing:
+            raise UnpicklableError(fpath)
+        return super(UnpicklableErrorTagger, self).tag_file(fpath, *args, **kwargs)
+
+
+class TestIterTagFiles(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.files = []
+        for index in range(5):
+            self.files.append(os.path.join(self.directory.name, "file{}.txt".format(index)))
+            with open(self.files[-1], "w") as f:
+                f.write(TEXT * (index + 1))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_outputs(self):
+        outputs = {}
+        for file in self.files:
+            with open(file.replace(".txt", "-pie.txt")) as f:
+                outputs[file] = f.read()
+        return outputs
+
+    def test_workers(self):
+        """ Check that forked workers give the same output as sequential tagging """
+        results = list(iter_tag_files("lasla", TokenTagger(batch_size=4), self.files))
+        self.assertEqual(results, [(file, None) for file in self.files])
+        expected = self.read_outputs()
+
+        results = list(iter_tag_files("lasla", TokenTagger(batch_size=4), self.files, workers=2))
+        self.assertEqual(sorted(results), [(file, None) for file in self.files])
+        self.assertEqual(self.read_outputs(), expected)
+
+    def test_failures(self):
+        """ Check that failures are reported per file """
+        files = self.files[:2] + [os.path.join(self.directory.name, "missing.txt")]
+        results = dict(iter_tag_files("lasla", TokenTagger(batch_size=4), files, workers=2))
+        self.assertIsNone(results[files[0]])
+        self.assertIsInstance(results[files[2]], WorkerError)
+        self.assertIn("FileNotFoundError", str(results[files[2]]))
+
+    def test_unpicklable_failures(self):
+        """ Check that errors which cannot be pickled are reported for their file instead of breaking the pool """
+        tagger = UnpicklableErrorTagger(batch_size=4)
+        tagger.failing = self.files[1]
+        results = dict(iter_tag_files("lasla", tagger, self.files, workers=2))
+        self.assertEqual(sorted(results), self.files)
+        self.assertEqual([file for file, error in results.items() if error is not None], [self.files[1]])
+        self.assertIn("UnpicklableError", str(results[self.files[1]]))
+
+    def test_profiles_of_workers_are_merged(self):
+        """ Check that what is recorded in forked workers reaches the profiler of the parent process """
+        tagger = TokenTagger(batch_size=4, profiler=Profiler())
+        list(iter_tag_files("lasla", tagger, self.files, workers=2))
+        self.assertEqual(sorted(document.name for document in tagger.profiler.documents), self.files)
+        self.assertEqual(tagger.profiler.total["tag"].sentences,
+                         sum(document.stages["tag"].sentences for document in tagger.profiler.documents))
+
+
+class TestStartup(TestCase):
+    def test_no_heavy_imports(self):
+        """ Check that commands which do not tag import neither torch, pie, autocat nor the tokenizers """
+        script = "\n".join([
+            "import sys, json",
+            "from click.testing import CliRunner",
+            "from pie_extended.cli.main import pie_ext",
+            "commands = [['--help'], ['list'], ['download', '--help']]",
+            "outputs = [CliRunner().invoke(pie_ext, args).output for args in commands]",
+            "print(json.dumps([outputs, sorted(sys.modules)]))"
+        ])
+        outputs, modules = json.loads(subprocess.run(
+            [sys.executable, "-c", script], check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout)
+        self.assertIn("LASLA", outputs[1])
+        for module in modules:
+            self.assertNotIn(module.split(".")[0], {"torch", "pie", "autocat", "requests"})
+            self.assertFalse(module.startswith("pie_extended.pipeline"), module)
+            self.assertFalse(module.endswith((".imports", ".tokenizer")), module)
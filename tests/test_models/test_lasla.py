@@ -1,7 +1,11 @@
 from pie_extended.models.lasla.imports import get_iterator_and_processor
 from pie_extended.models import lasla
-from pie_extended.testing_utils import FakeTagger, create_auto_tagger
+from pie_extended.models.lasla.tokenizer import LatMemorizingTokenizer
+from pie_extended.pipeline.tokenizers.utils.excluder import DEFAULT_CHAR_REGISTRY
+from pie_extended.testing_utils import FakeTagger, FakeAutoTag, create_auto_tagger
 from typing import List, Tuple
+import os
+import tempfile
 
 from unittest import TestCase
 
@@ -241,3 +245,68 @@ Licet querare, nec tibi tener puer"""
             "Memory should be kept for abbreviations"
         )
 
+
+    def test_frozen_char_registry(self):
+        """ Check that the tokenizer freezes its own registry, and still tokenizes references """
+        default_size = len(DEFAULT_CHAR_REGISTRY)
+        tokenizer = LatMemorizingTokenizer()
+        self.assertTrue(tokenizer.char_registry.frozen)
+        self.assertIsNot(tokenizer.char_registry, DEFAULT_CHAR_REGISTRY)
+        self.assertEqual(len(DEFAULT_CHAR_REGISTRY), default_size, "The shared registry should not be filled")
+        self.assertEqual(
+            list(tokenizer.sentence_tokenizer("Cic. [REF:1@2] hoc est.")),
+            [['Cic', '.'], ['[REF:1@2]', 'hoc', 'est', '.']],
+            "Characters of references are registered when the tokenizer is created"
+        )
+        self.assertEqual(
+            list(tokenizer.sentence_tokenizer("[REF:1☆2] hoc est.")),
+            [['[REF:1', '☆', '2]', 'hoc', 'est', '.']],
+            "Characters without a mask are left as they are instead of raising"
+        )
+
+    def test_streaming_tag_file(self):
+        """ Check that reading a file by blocks gives the same output as reading it at once """
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, "streamed_text_file.txt")
+            with open(target, "w") as f:
+                f.write("\n\n".join([
+                    "At o sceleste penis, o meum malum, graui piaque lege noxiam lues.",
+                    "Licet querare, nec tibi tener puer [REF:1.a.b] uiduarum.",
+                    ". . .",
+                    "Quis est M. Cicero ? Ego sum !"
+                ] * 5))
+
+            tagger = FakeAutoTag.from_model_string(lasla.Models, batch_size=4)
+            with open(tagger.tag_file(target, *get_iterator_and_processor())) as f:
+                expected = f.read()
+
+            tagger = FakeAutoTag.from_model_string(lasla.Models, batch_size=4)
+            with open(tagger.tag_file(target, *get_iterator_and_processor(), stream=True, block_size=50)) as f:
+                streamed = f.read()
+
+            self.assertEqual(expected, streamed, "Streaming should not change the output")
+
+    def test_streaming_single_line_file(self):
+        """ Check that a file without empty lines nor line breaks is still read by bounded blocks """
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, "streamed_text_file_single_line.txt")
+            with open(target, "w") as f:
+                f.write("Arma uirumque cano. " * 200)
+
+            iterator, _ = get_iterator_and_processor()
+            with open(target) as f:
+                blocks = list(iterator.read_blocks(f, block_size=64))
+            self.assertGreater(len(blocks), 1, "Blocks should be cut without empty lines")
+            self.assertTrue(all(len(block) <= 64 * 4 for block in blocks), "Blocks should not exceed max_block_size")
+            self.assertTrue(all(block.endswith(". ") for block in blocks[:-1]), "Blocks should end with sentences")
+            self.assertEqual("".join(blocks), "Arma uirumque cano. " * 200)
+
+            tagger = FakeAutoTag.from_model_string(lasla.Models, batch_size=4)
+            with open(tagger.tag_file(target, *get_iterator_and_processor())) as f:
+                expected = f.read()
+
+            tagger = FakeAutoTag.from_model_string(lasla.Models, batch_size=4)
+            with open(tagger.tag_file(target, *get_iterator_and_processor(), stream=True, block_size=64)) as f:
+                streamed = f.read()
+
+            self.assertEqual(expected, streamed, "Streaming should not change the output")
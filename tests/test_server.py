@@ -0,0 +1,106 @@
+import json
+import threading
+import urllib.request
+import urllib.error
+from unittest import TestCase
+
+from pie_extended.cli.server import TaggerServer, TaggerService
+from pie_extended.models.lasla.imports import get_iterator_and_processor
+from .test_tagger import TokenTagger, TEXT
+
+
+class TestServer(TestCase):
+    def setUp(self):
+        self.service = TaggerService()
+        self.server = TaggerServer(("127.0.0.1", 0), self.service)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.close()
+
+    def load(self):
+        self.service.add("lasla", TokenTagger(batch_size=4), get_iterator_and_processor)
+        self.service.ready.set()
+
+    def request(self, path, data=None, content_type="text/plain"):
+        request = urllib.request.Request(
+            "http://{}:{}{}".format(*self.server.server_address[:2], path),
+            data=data.encode("utf-8") if data is not None else None,
+            headers={"Content-Type": content_type}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.read().decode("utf-8")
+        except urllib.error.HTTPError as error:
+            return error.code, error.read().decode("utf-8")
+
+    def test_health_and_readiness(self):
+        """ Check that the server is healthy while loading but only ready once models are loaded """
+        self.assertEqual(self.request("/health")[0], 200)
+        self.assertEqual(self.request("/ready")[0], 503)
+        self.assertEqual(self.request("/tag/lasla", TEXT)[0], 503)
+        self.load()
+        status, body = self.request("/ready")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["models"], ["lasla"])
+
+    def test_tag(self):
+        """ Check that tagging over HTTP gives the same output as tagging in process """
+        self.load()
+        expected = "".join(TokenTagger(batch_size=4).iter_tag(TEXT, *get_iterator_and_processor()))
+        self.assertEqual(self.request("/tag/lasla", TEXT), (200, expected))
+        # Requests do not share the memory of the tokenizer and processor
+        self.assertEqual(self.request("/tag/lasla", TEXT), (200, expected))
+
+        status, body = self.request("/tag/lasla?format=json", json.dumps({"text": TEXT}), "application/json")
+        self.assertEqual(status, 200)
+        sentences = json.loads(body)["sentences"]
+        self.assertEqual(
+            [token["form"] for sentence in sentences for token in sentence],
+            [line.split("\t")[0] for line in expected.split("\r\n")[1:-1]]
+        )
+
+    def test_pretokenized(self):
+        """ Check that pre-tokenized input is not tokenized again """
+        self.load()
+        status, body = self.request("/tag/lasla?format=json", json.dumps({"tokens": [["Arma", "uirum"], ["cano"]]}),
+                                    "application/json")
+        self.assertEqual(status, 200)
+        self.assertEqual([[token["form"] for token in sentence] for sentence in json.loads(body)["sentences"]],
+                         [["Arma", "uirum"], ["cano"]])
+
+    def test_errors(self):
+        self.load()
+        self.assertEqual(self.request("/tag/unknown", TEXT)[0], 404)
+        self.assertEqual(self.request("/tag/lasla?format=xml", TEXT)[0], 400)
+        self.assertEqual(self.request("/tag/lasla", "{}", "application/json")[0], 400)
+
+    def test_pipelines_are_reused(self):
+        """ Check that requests reuse the iterators and processors of earlier ones instead of building new ones """
+        built = []
+
+        def factory(**kwargs):
+            built.append(kwargs)
+            return get_iterator_and_processor(**kwargs)
+
+        self.service.add("lasla", TokenTagger(batch_size=4), factory)
+        self.service.ready.set()
+        expected = "".join(TokenTagger(batch_size=4).iter_tag(TEXT, *get_iterator_and_processor()))
+        for _ in range(3):
+            self.assertEqual(self.request("/tag/lasla", TEXT), (200, expected))
+        self.assertEqual(len(built), 1)
+
+    def test_invalid_pretokenized(self):
+        """ Check that pre-tokenized input with empty sentences or tokens, or carriage returns, is rejected """
+        self.load()
+        for tokens in [[["Arma"], []], [["Arma", ""]], [["Arma\r"]], [["Arma\nuirum"]], [[1]], ["Arma"]]:
+            with self.subTest(tokens=tokens):
+                status, _ = self.request("/tag/lasla?format=json", json.dumps({"tokens": tokens}), "application/json")
+                self.assertEqual(status, 400)
+        for text in ["Arma\n\n\nuirum", "Arma\r\nuirum", "Arma\n \nuirum"]:
+            with self.subTest(text=text):
+                self.assertEqual(self.request("/tag/lasla?no_tokenizer=1", text)[0], 400)
+        self.assertEqual(self.request("/tag/lasla?no_tokenizer=1", "Arma\nuirum\n\ncano\n")[0], 200)
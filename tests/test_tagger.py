@@ -0,0 +1,479 @@
+import os
+import copy
+import json
+import pickle
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from unittest import TestCase
+
+from pie_extended.models import lasla
+from pie_extended.models.lasla.imports import get_iterator_and_processor
+from pie_extended.testing_utils import FakeAutoTag
+from pie_extended.cache import SentenceCache, SqliteSentenceCache
+from pie_extended.profiling import Profiler
+from pie_extended.scheduler import BatchScheduler
+from pie_extended.models.fro.imports import get_iterator_and_processor as get_fro_iterator_and_processor
+from pie_extended.pipeline.postprocessor.proto import ChainedProcessor, ProcessorPrototype, interleave
+from pie_extended.pipeline.postprocessor.glue import GlueProcessor
+from pie_extended.pipeline.postprocessor.rows import AnnotationRow, RowSchema
+from pie_extended.pipeline.postprocessor.compiled import TagTable
+from pie_extended.pipeline.postprocessor.splitter import SplitterPostProcessor
+from pie.utils import model_spec
+
+
+TEXT = "Arma uirumque cano. Troiae qui primus ab oris Italiam fato profugus Lauiniaque uenit litora, multum " \
+       "ille et terris iactatus et alto ui superum saeuae memorem Iunonis ob iram. Musa, mihi causas memora ! " \
+       "Quo numine laeso ? Tantaene animis caelestibus irae ? Urbs antiqua fuit. Tyrii tenuere coloni."
+
+
+class TokenTagger(FakeAutoTag):
+    """ Fake tagger whose tags only depend on the token, whatever the batch it is part of """
+    def __init__(self, **kwargs):
+        super(TokenTagger, self).__init__(
+            tasks=[task for _, tasks in model_spec(lasla.Models) for task in tasks],
+            **kwargs
+        )
+        self.batches: List[List[int]] = []
+
+    def tag(self, sents: List[List[str]], lengths: List[int], *args, **kwargs):
+        self.batches.append(list(lengths))
+        return [
+            [(token, tuple(task + token for task in self.tasks)) for token in sent]
+            for sent in sents
+        ], self.tasks
+
+
+class TestBucketBatching(TestCase):
+    def test_same_output_as_document_order(self):
+        """ Check that length bucketing does not change the output nor its order """
+        tagger = TokenTagger(batch_size=4)
+        expected = tagger.tag_str(TEXT, *get_iterator_and_processor())
+
+        tagger = TokenTagger(batch_size=4, max_batch_tokens=20)
+        self.assertEqual(tagger.tag_str(TEXT, *get_iterator_and_processor()), expected)
+
+    def test_batches_are_capped(self):
+        """ Check that batches are capped by padded tokens and sentences count """
+        tagger = TokenTagger(batch_size=2, max_batch_tokens=20)
+        tagger.tag_str(TEXT, *get_iterator_and_processor())
+        for batch in tagger.batches:
+            self.assertLessEqual(len(batch), 2)
+            if len(batch) > 1:
+                self.assertLessEqual(len(batch) * max(batch), 20)
+        self.assertEqual(
+            sorted(length for batch in tagger.batches for length in batch),
+            sorted(length for _, length, _ in get_iterator_and_processor()[0](TEXT)),
+            "Every sentence is tagged once"
+        )
+
+
+class TestPipelined(TestCase):
+    def test_same_output_as_sequential(self):
+        """ Check that running stages concurrently does not change the output nor its order """
+        tagger = TokenTagger(batch_size=2)
+        expected = tagger.tag_str(TEXT * 5, *get_iterator_and_processor())
+
+        tagger = TokenTagger(batch_size=2, pipelined=True, pipeline_queue_size=1)
+        self.assertEqual(tagger.tag_str(TEXT * 5, *get_iterator_and_processor()), expected)
+
+        tagger = TokenTagger(batch_size=2, pipelined=True, max_batch_tokens=20)
+        self.assertEqual(tagger.tag_str(TEXT * 5, *get_iterator_and_processor()), expected)
+
+    def test_errors_are_raised(self):
+        """ Check that an error in the inference stage reaches the caller """
+        tagger = TokenTagger(batch_size=2, pipelined=True)
+        tagger.tag = None
+        with self.assertRaises(TypeError):
+            tagger.tag_str(TEXT, *get_iterator_and_processor())
+
+    def test_stopped_early(self):
+        """ Check that a document whose tagging is stopped early does not disturb the next one tagged with the same
+        iterator and processor """
+        expected = TokenTagger(batch_size=2).tag_str(TEXT, *get_iterator_and_processor())
+
+        def blocks():
+            for _ in range(20):
+                time.sleep(.01)  # The tokenizer is still busy when the consumer stops
+                yield TEXT + "\n\n"
+
+        iterator, processor = get_iterator_and_processor()
+        tagger = TokenTagger(batch_size=2, pipelined=True, pipeline_queue_size=100)
+        threads = threading.active_count()
+        for _ in range(3):
+            tokens = tagger.iter_tag_token(blocks(), iterator, processor)
+            next(tokens)
+            tokens.close()
+            self.assertEqual(threading.active_count(), threads, "Stages should be stopped once the consumer stops")
+            self.assertEqual(tagger.tag_str(TEXT, iterator, processor), expected)
+            self.assertEqual(list(iterator.tokenizer.tokens), [], "Every token should have been consumed")
+
+
+class TestShards(TestCase):
+    def test_same_output_as_whole_file(self):
+        """ Check that tagging shards of a file in parallel gives the same file as tagging it at once """
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, "text.txt")
+            with open(target, "w") as f:
+                f.write("\n\n".join([TEXT] * 20))
+
+            with open(TokenTagger(batch_size=4).tag_file(target, *get_iterator_and_processor())) as f:
+                expected = f.read()
+
+            out_file = TokenTagger(batch_size=4).tag_file(
+                target, *get_iterator_and_processor(), shard_workers=3, shard_size=200)
+            with open(out_file) as f:
+                self.assertEqual(f.read(), expected)
+            self.assertEqual(sorted(os.listdir(directory)), ["text-pie.txt", "text.txt"])
+
+
+class TestSentenceCache(TestCase):
+    def test_same_output_and_only_misses_are_tagged(self):
+        """ Check that cached sentences are not tagged again and that the output does not change """
+        tagger = TokenTagger(batch_size=4)
+        expected = tagger.tag_str(TEXT * 3, *get_iterator_and_processor())
+
+        cache = SentenceCache()
+        tagger = TokenTagger(batch_size=4, sentence_cache=cache)
+        self.assertEqual(tagger.tag_str(TEXT * 3, *get_iterator_and_processor()), expected)
+        first_run = sum(len(batch) for batch in tagger.batches)
+        self.assertEqual(first_run, len(list(get_iterator_and_processor()[0](TEXT))),
+                         "Repeated sentences are tagged once")
+
+        self.assertEqual(tagger.tag_str(TEXT * 3, *get_iterator_and_processor()), expected)
+        self.assertEqual(sum(len(batch) for batch in tagger.batches), first_run,
+                         "Second run only uses the cache")
+        self.assertGreater(cache.hits, 0)
+
+    def test_models_are_part_of_the_key(self):
+        """ Check that two taggers with different models do not share their outputs """
+        cache = SentenceCache()
+        tagger = TokenTagger(batch_size=4, sentence_cache=cache)
+        tagger.tag_str(TEXT, *get_iterator_and_processor())
+        other = TokenTagger(batch_size=4, sentence_cache=cache, model_specs=[("other.tar", ("lemma", ))])
+        other.tag_str(TEXT, *get_iterator_and_processor())
+        self.assertEqual(cache.hits, 0)
+
+
+class TestSqliteSentenceCache(TestCase):
+    def test_cache_is_shared_across_runs(self):
+        """ Check that a second tagger using the same file only tags nothing and gives the same output """
+        expected = TokenTagger(batch_size=4).tag_str(TEXT, *get_iterator_and_processor())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            tagger = TokenTagger(batch_size=4, sentence_cache=SqliteSentenceCache(path))
+            self.assertEqual(tagger.tag_str(TEXT, *get_iterator_and_processor()), expected)
+            self.assertGreater(len(tagger.batches), 0)
+
+            cache = SqliteSentenceCache(path)
+            tagger = TokenTagger(batch_size=4, sentence_cache=SentenceCache(backend=cache))
+            self.assertEqual(tagger.tag_str(TEXT, *get_iterator_and_processor()), expected)
+            self.assertEqual(tagger.batches, [], "Everything comes from the file")
+            self.assertEqual(cache.misses, 0)
+
+            self.assertEqual(cache.prune(2), len(list(get_iterator_and_processor()[0](TEXT))) - 2)
+            self.assertEqual(cache.stats()["sentences"], 2)
+
+    def test_model_content_is_part_of_the_key(self):
+        """ Check that changing the content of a model file invalidates the cached sentences """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            model = os.path.join(directory, "model")
+            with open(model + ".tar", "wb") as f:
+                f.write(b"first")
+            specs = [(model, ("lemma", ))]
+
+            TokenTagger(batch_size=4, sentence_cache=SqliteSentenceCache(path), model_specs=specs).tag_str(
+                TEXT, *get_iterator_and_processor())
+            with open(model + ".tar", "wb") as f:
+                f.write(b"second")
+            cache = SqliteSentenceCache(path)
+            TokenTagger(batch_size=4, sentence_cache=cache, model_specs=specs).tag_str(TEXT, *get_iterator_and_processor())
+            self.assertEqual(cache.hits, 0)
+
+
+class TestProfiler(TestCase):
+    def test_stages_are_recorded(self):
+        """ Check that profiling does not change the output and that stages are counted """
+        expected = TokenTagger(batch_size=4).tag_str(TEXT, *get_iterator_and_processor())
+        tagger = TokenTagger(batch_size=4, profiler=Profiler())
+        self.assertEqual(tagger.tag_str(TEXT, *get_iterator_and_processor()), expected)
+
+        total = tagger.profiler.total
+        sentences = len(list(get_iterator_and_processor()[0](TEXT)))
+        self.assertEqual(total["tag"].sentences, sentences)
+        self.assertEqual(sum(total["tag"].batch_sizes.values()), total["tag"].calls)
+        self.assertEqual(total["exclude"].sentences, total["tokenize"].sentences)
+        self.assertEqual(total["postprocess"].tokens, len(expected))
+
+    def test_documents_and_shards(self):
+        """ Check that each file is a document and that stages of shards are merged into it """
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, "text.txt")
+            with open(target, "w") as f:
+                f.write("\n\n".join([TEXT] * 20))
+            tagger = TokenTagger(batch_size=4, profiler=Profiler())
+            tagger.tag_file(target, *get_iterator_and_processor())
+            tagger.tag_file(target, *get_iterator_and_processor(), shard_workers=3, shard_size=200)
+
+        first, sharded = tagger.profiler.documents
+        self.assertEqual(first.stages["tag"].sentences, sharded.stages["tag"].sentences)
+        self.assertEqual(first.stages["format"].tokens, sharded.stages["format"].tokens)
+        self.assertEqual(tagger.profiler.total["tag"].sentences, 2 * first.stages["tag"].sentences)
+        self.assertGreater(sharded.wall, 0)
+
+
+class TestBatchScheduler(TestCase):
+    def test_concurrent_callers_share_batches(self):
+        """ Check that sentences of concurrent callers are batched together and that each gets its own output """
+        texts = [TEXT * (index + 1) for index in range(8)]
+        expected = [TokenTagger(batch_size=4).tag_str(text, *get_iterator_and_processor()) for text in texts]
+
+        tagger = TokenTagger(batch_size=4)
+        tagger.batch_scheduler = BatchScheduler(tagger.tag, batch_size=32, max_wait=0.05)
+        with ThreadPoolExecutor(8) as executor:
+            outputs = list(executor.map(lambda text: tagger.tag_str(text, *get_iterator_and_processor()), texts))
+        tagger.batch_scheduler.close()
+
+        self.assertEqual(outputs, expected)
+        self.assertGreater(max(len(batch) for batch in tagger.batches), 4, "Batches are larger than any window")
+        self.assertLessEqual(max(len(batch) for batch in tagger.batches), 32)
+
+    def test_token_budget_and_errors(self):
+        """ Check that batches are capped by padded tokens and that errors reach the callers """
+        batches = []
+        scheduler = BatchScheduler(lambda sents, lengths: (batches.append(lengths) or sents, ["task"]),
+                                   batch_size=10, max_tokens=6, max_wait=0.01)
+        sents = [["a"] * length for length in [1, 2, 3, 1, 1]]
+        self.assertEqual(scheduler.submit(sents, [len(sent) for sent in sents]).result(), (sents, ["task"]))
+        self.assertEqual(batches, [[1, 2], [3, 1], [1]])
+        scheduler.close()
+
+        def fail(sents, lengths):
+            raise ValueError("Broken model")
+        scheduler = BatchScheduler(fail)
+        with self.assertRaises(ValueError):
+            scheduler.submit([["a"]], [1]).result()
+        scheduler.close()
+
+
+class TestTokenMemory(TestCase):
+    def test_memory_is_bounded_by_the_window(self):
+        """ Check that tokens are forgotten once post-processed, when the document is read lazily """
+        iterator, processor = get_iterator_and_processor()
+        blocks = [TEXT + "\n\n"] * 100
+        largest = 0
+        for _ in TokenTagger(batch_size=4).iter_tag_token(blocks, iterator, processor):
+            largest = max(largest, len(iterator.tokenizer.tokens))
+        self.assertEqual(len(iterator.tokenizer.tokens), 0)
+        self.assertEqual(iterator.tokenizer.tokens.consumed, iterator.tokenizer.tokens.produced)
+        self.assertLess(largest, iterator.tokenizer.tokens.produced / 10)
+
+
+class TestCompiledProcessors(TestCase):
+    TAGS = [
+        ("arma", {"lemma": "arma", "pos": "NOMcom", "Case": "Nom", "Numb": "Plur", "Gend": "Neut",
+                  "Mood_Tense_Voice": "Ind|Pres|Act"}),
+        ("uirumque", {"lemma": "uir界que", "pos": "NOMcom", "Case": "Acc", "Numb": "Sing", "Dis": "2"}),
+        ("cano", {"lemma": "cano", "pos": "VER", "Numb": "Sing", "Person": "1", "Mood_Tense_Voice": "Ind"}),
+        (".", {"lemma": ".", "pos": "PUNC", "Mood_Tense_Voice": "Ind|Pres|Act|Extra"}),
+        ("λόγος", {"lemma": "λόγος", "pos": "NOMcom"}),
+        ("similist", {"lemma": "界sum", "pos": "", "Mood_Tense_Voice": ""}),
+        ("III", {"lemma": "3", "pos": "ADJcar"}),
+    ]
+
+    def test_same_output_as_the_chain(self):
+        """ Check that the compiled lasla chain gives the same rows, in the same order, as the chained processors """
+        tasks = [task for _, tasks in model_spec(lasla.Models) for task in tasks]
+        outputs = []
+        for compiled in [True, False]:
+            iterator, processor = get_iterator_and_processor()
+            tokens = [token for sentence in iterator.tokenizer.sentence_tokenizer(
+                " ".join(token for token, _ in self.TAGS)) for token in sentence]
+            processor.set_tasks(tasks)
+            get_dict = processor.compile() if compiled else processor.get_dict
+            self.assertEqual(get_dict == processor.get_dict, not compiled)
+            outputs.append([
+                [list(row.items()) for row in get_dict(token, [tags.get(task, "_") for task in tasks])]
+                for token, (_, tags) in zip(tokens, self.TAGS)
+            ])
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_tagger(self):
+        """ Check that tagging gives the same output with and without compiled processors """
+        expected = TokenTagger(batch_size=4, compile_processors=False).tag_str(TEXT, *get_iterator_and_processor())
+        self.assertEqual(TokenTagger(batch_size=4).tag_str(TEXT, *get_iterator_and_processor()), expected)
+
+    def test_tag_ids(self):
+        """ Check that rows built from the ids of the tags are the same, and that each combination of tags is derived
+        once """
+        expected = TokenTagger(batch_size=4).tag_str(TEXT, *get_iterator_and_processor())
+        for table_size in [0, 16]:
+            with self.subTest(table_size=table_size):
+                tagger = TokenTagger(batch_size=4, tag_ids=True, tag_table_size=table_size)
+                self.assertEqual(tagger.tag_str(TEXT, *get_iterator_and_processor()), expected)
+
+        processor = GlueProcessor(head_processor=ProcessorPrototype())
+        processor.set_tasks(["lemma", "POS", "Case", "Numb", "Deg", "Mood", "Tense", "Voice", "Person"])
+        plan = processor._plan()
+        table = TagTable(plan.row)
+        tags = {
+            token: [token.lower(), "NOMcom", "Nom", "Plur", "_", "_", "_", "_", "_"]
+            for token in ["arma", "uirum", "Arma", "cano"]
+        }
+        tokens = ["arma", "uirum", "Arma", "cano", "arma"]
+        values = table.values(tokens, [tags[token] for token in tokens])
+        self.assertEqual(
+            [AnnotationRow(RowSchema.of(plan.row.keys), data) for data in values],
+            [processor.get_dict(token, tags[token])[0] for token in tokens]
+        )
+        self.assertEqual(len(table.outputs), 3, "Arma and arma have the same tags")
+        self.assertEqual([len(vocabulary) for vocabulary in table.vocabularies], [3, 1, 1, 1, 1, 1, 1, 1, 1])
+
+        # Steps reading the token cannot be looked up by the ids of the tags
+        plan.row.add_step(lambda values: values.append(values[0].upper()))
+        plan.row.indexes.append(plan.row.size - 1)
+        self.assertFalse(plan.row.from_tags)
+        with self.assertRaises(ValueError):
+            TagTable(plan.row)
+
+    def test_fallback(self):
+        """ Check that chains with processors which cannot be compiled use their .get_dict() """
+        class LowerGlue(GlueProcessor):
+            def _get_glued(self, glued_task, token_dict):
+                return glued_task + "=" + token_dict[glued_task].lower()
+
+        processor = LowerGlue(head_processor=ProcessorPrototype())
+        processor.set_tasks(["lemma", "POS", "Case", "Numb", "Deg", "Mood", "Tense", "Voice", "Person"])
+        self.assertEqual(processor.compile(), processor.get_dict)
+        self.assertEqual(processor.get_dict("arma", ["arma", "NOMcom", "Nom", "Plur", "_", "_", "_", "_", "_"]),
+                         [{"form": "arma", "lemma": "arma", "POS": "NOMcom", "morph": "Case=nom|Numb=plur"}])
+
+
+class TestProcessorBatches(TestCase):
+    TEXT = "« Arma uirumque cano , Troiae qui primus ab oris . » Italiam fato profugus III ; λόγος similist"
+    TAGS = TestCompiledProcessors.TAGS
+
+    def batches(self, get_iterator_and_processor, tasks, by_token: bool):
+        """ Annotations of each sentence of TEXT, post-processed by sentence or token by token """
+        iterator, processor = get_iterator_and_processor()
+        processor.set_tasks(tasks)
+        tags = dict(self.TAGS)
+        out = []
+        for sentence, _, reinsertion in list(iterator(self.TEXT)):
+            sentence = [(token, [tags.get(token, {}).get(task, task + token) for task in tasks]) for token in sentence]
+            if by_token:
+                out.append([row for rows in processor._get_batch_by_token(interleave(sentence, reinsertion))
+                            for row in rows])
+            else:
+                out.append(processor.get_batch(sentence, reinsertion))
+        return out
+
+    def test_same_output_as_get_dict(self):
+        """ Check that batches of the lasla chain give the same rows, in the same order, as get_dict and reinsert """
+        tasks = [task for _, tasks in model_spec(lasla.Models) for task in tasks]
+        expected = self.batches(get_iterator_and_processor, tasks, by_token=True)
+        self.assertEqual(
+            expected[0],
+            [{"form": "«", "lemma": "«", "pos": "PUNC", "morph": "MORPH=empty", "treated": "--IGN.--", "Dis": "_"}]
+        )
+        self.assertEqual(self.batches(get_iterator_and_processor, tasks, by_token=False), expected)
+
+    def test_overridden_processors(self):
+        """ Check that processors changing get_dict (here the ones of fro) are batched through get_dict """
+        tasks = ["lemma", "POS", "MODE", "TEMPS", "PERS", "NOMB", "GENRE", "CAS", "DEGRE"]
+        self.assertEqual(self.batches(get_fro_iterator_and_processor, tasks, by_token=False),
+                         self.batches(get_fro_iterator_and_processor, tasks, by_token=True))
+
+        class Upper(ChainedProcessor):
+            def get_dict(self, token, tags):
+                return [{key: value.upper() for key, value in row.items()}
+                        for row in self.head_processor.get_dict(token, tags)]
+
+        processor = SplitterPostProcessor(head_processor=Upper(None))
+        processor.set_tasks(["lemma"])
+        self.assertEqual(
+            processor.get_batch([("a", ["b界c"]), ("d", ["e"])], {1: "!"}),
+            [{"form": "A", "lemma": "B"}, {"form": "A", "lemma": "C"}, {"form": "!", "lemma": "_"},
+             {"form": "D", "lemma": "E"}]
+        )
+
+    def test_tagger(self):
+        """ Check that tagging gives the same output with compiled processors and batched ones """
+        expected = TokenTagger(batch_size=4).tag_str(TEXT, *get_iterator_and_processor())
+        self.assertEqual(TokenTagger(batch_size=4, compile_processors=False).tag_str(
+            TEXT, *get_iterator_and_processor()), expected)
+
+
+class TestGluePlans(TestCase):
+    FRO_TASKS = ["lemma", "POS", "MODE", "TEMPS", "PERS", "NOMB", "GENRE", "CAS", "DEGRE"]
+
+    def test_fro(self):
+        """ Check that fro glued values, which are not prefixed with their task, are the same compiled or not """
+        tags = [
+            ["estre", "VERcjg", "MODE=ind", "TEMPS=pst", "PERS.=3", "NOMB.=s", "GENRE=x", "CAS=x", "DEGRE=x"],
+            ["rei", "NOMcom", "MODE=x", "TEMPS=x", "PERS.=x", "NOMB.=s", "GENRE=m", "CAS=r", "DEGRE=x"],
+            ["et", "CONcoo", "MODE=x", "TEMPS=x", "PERS.=x", "NOMB.=x", "GENRE=x", "CAS=x", "DEGRE=x"],
+        ]
+        outputs = []
+        for compiled in [True, False]:
+            iterator, processor = get_fro_iterator_and_processor()
+            tokens = [token for sentence in iterator.tokenizer.sentence_tokenizer("est rei et") for token in sentence]
+            processor.set_tasks(self.FRO_TASKS)
+            get_dict = processor.compile() if compiled else processor.get_dict
+            self.assertEqual(get_dict == processor.get_dict, not compiled)
+            outputs.append([row for token, token_tags in zip(tokens, tags) for row in get_dict(token, token_tags)])
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual([row["morph"] for row in outputs[0]],
+                         ["MODE=ind|TEMPS=pst|PERS.=3|NOMB.=s", "NOMB.=s|GENRE=m|CAS=r", "MORPH=empty"])
+
+    def test_shared_strings(self):
+        """ Check that tokens with the same glued values share the same glued string """
+        processor = GlueProcessor(head_processor=ProcessorPrototype())
+        processor.set_tasks(["lemma", "POS", "Case", "Numb", "Deg", "Mood", "Tense", "Voice", "Person"])
+        batch = processor.get_batch([
+            (token, [token, "NOMcom", "N" + "om", "Plur", "_", "_", "_", "_", "_"])
+            for token in ["arma", "uiri", "Troiae"]
+        ])
+        self.assertEqual(batch[0]["morph"], "Case=Nom|Numb=Plur")
+        self.assertIs(batch[0]["morph"], batch[1]["morph"])
+        self.assertIs(batch[0]["morph"], batch[2]["morph"])
+        processor.set_tasks(["lemma", "POS", "Case", "Numb", "Deg", "Mood", "Tense", "Voice", "Person"])
+        self.assertIs(processor.get_dict("arma", ["arma", "NOMcom", "Nom", "Plur", "_", "_", "_", "_", "_"])[0]["morph"],
+                      batch[0]["morph"])
+
+
+class TestAnnotationRows(TestCase):
+    def test_tag_str(self):
+        """ Check that tagged tokens are rows sharing their schema and the strings of their values """
+        rows = TokenTagger(batch_size=4).tag_str(TEXT + " " + TEXT, *get_iterator_and_processor())
+        self.assertTrue(all(isinstance(row, AnnotationRow) for row in rows))
+        # Rows built by the rules (punctuation...) have their own order of keys
+        self.assertEqual({frozenset(row.schema.keys) for row in rows},
+                         {frozenset(["form", "lemma", "pos", "morph", "Dis", "treated"])})
+        self.assertLessEqual(len({id(row.schema) for row in rows}), 2)
+        first, second = rows[0], rows[len(rows) // 2]
+        self.assertEqual(first, second)
+        self.assertTrue(all(a is b for a, b in zip(first.values(), second.values())))
+
+    def test_dict_compatibility(self):
+        """ Check that rows behave as the dictionaries they replace """
+        row = RowSchema.of(["form", "lemma"]).row(["arma", "arma"])
+        expected = {"form": "arma", "lemma": "arma"}
+        self.assertEqual(dict(row), expected)
+        self.assertEqual({**row, "pos": "NOMcom"}, {**expected, "pos": "NOMcom"})
+        self.assertEqual(list(row.items()), list(expected.items()))
+        self.assertEqual(json.loads(json.dumps([row], default=dict)), [expected])
+        self.assertEqual(row.get("pos", "_"), "_")
+        self.assertNotIn("pos", row)
+
+        duplicate = copy.deepcopy(row)
+        duplicate["lemma"] = "armum"
+        self.assertEqual(row["lemma"], "arma")
+        self.assertIs(duplicate.schema, row.schema)
+
+        unpickled = pickle.loads(pickle.dumps(row))
+        self.assertEqual(unpickled, row)
+        self.assertIs(unpickled.schema, row.schema)
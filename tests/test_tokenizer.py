@@ -1 +1,307 @@
-#ToDo: Add a check for sentence START and END
\ No newline at end of file
+#ToDo: Add a check for sentence START and END
+from unittest import TestCase
+import regex as re
+from concurrent.futures import ThreadPoolExecutor
+
+from pie_extended.models.fr.tokenizer import FrMemorizingTokenizer
+from pie_extended.models.fro.tokenizer import FroMemorizingTokenizer
+from pie_extended.models.grc.tokenizer import GrcMemorizingTokenizer
+from pie_extended.models.lasla.tokenizer import LatMemorizingTokenizer
+from pie_extended.models.occ_cont.tokenizer import OccMemorizingTokenizer, _APO
+from pie_extended.pipeline.tokenizers.utils.normalizer import CompiledNormalizer
+from pie_extended.pipeline.tokenizers.utils.excluder import CharRegistry, FrozenCharRegistryError, \
+    AbbreviationsExcluder, CompoundAbbreviationsExcluder
+from pie_extended.models.fr.excluders import ABBREVIATIONS
+from pie_extended.models.lasla._params import abbrs as LASLA_ABBREVIATIONS
+from pie_extended.pipeline.classifier import TokenClassifier, PatternSet
+from pie_extended.models.lasla.imports import get_iterator_and_processor
+
+
+TEXTS = [
+    "",
+    " ",
+    "Aujourd'hui, l'abbé est-il venu ? Cf. p. 45, il m'a dit qu'il viendrait peut-être demain.",
+    "Va-t'en ! Je ne sais pas ce que vous voulez dire [REF:1.a.b] par là. AUJOURD’HUI a-t-on vu",
+    "l'[REF:l'a'b] a'b'c d'-il -t-il- -le' 'l l' 'a'",
+    "-il\n\nl'abbé\tet moi-même-le, V. act. V. n. S.M. .XII. .IIII.ii .V. C. Cic. ep. Att. 1.2.",
+    "Arma uirum cano , Troiae qui primus ab oris [IGN:ab oris] λόγος ² XX. Ioh. 3, 16 ; Mr. St.Mr.",
+    "qu'ieu, d'aquel l’ostal -z- cant-ne ’s... <tag> 1 000 N.b. Sr.\r\nt'ai",
+    "aujourd'hui\n",
+    "x-" * 40 + "y'z " * 20,
+]
+
+OCCITAN_TEXTS = [
+    "Qu'es aquò ? L'ostal de l'òme es bèl. D’aquel temps, los enfants s’amusavan.",
+    "Me'n vau, e tu ? Se'n tornèt a l'ostal. Disètz-me-o ! Vòli pas, çò'm diguèt. Que'u vegi. Non'us ac disi.",
+    "1 000 personas, 3,5 %, M. Dupont, n.b. <b>tèxte</b>... «Òc», ditz-lo. Quand vengueren-ne. Anem-nos-en !",
+    "Dins l'[REF:1.a] ostal -z- cant-ne 'ns 'vs 's, d'ont venètz ? Entr'elas, qu'ent'a dich «ʼm» ; ‘aquò’.",
+    "a,b ,c d, 12,5 ...; !? -- -vos -te' -las -d' u.s.a. e.g.x,y",
+]
+
+
+def reference_occ_word_tokenizer(tokenizer: OccMemorizingTokenizer, text: str):
+    """ OccMemorizingTokenizer._real_word_tokenizer before its rules were precompiled """
+    res = []
+    text = re.sub(rf"((?:qu)|[dl])[{_APO}]", r"\1' ", text)
+    text = re.sub(r'(\d)\s(\d)', r'\1<PPLesp>\2', text)
+    for m in tokenizer.re_split_step_one.split(text):
+        if not m or not m.strip():
+            continue
+        elif tokenizer.normalizers[0].re.match(m):
+            res.append(m)
+        elif tokenizer.re_split_match.match(m):
+            res.append(m)
+        else:
+            m = re.sub(r"(-[nz]-)(\P{L}*)", r"\t\1\t\2", m, flags=re.IGNORECASE)
+            m = re.sub(r"(\P{L}|^)"+rf"([dlmnst][{_APO}])", r"\1\t\2\t", m, flags=re.IGNORECASE)
+            m = re.sub(r"(\P{L}|^)(\p{L}*[qnv][us]"+rf"[{_APO}])", r"\1\t\2\t", m, flags=re.IGNORECASE)
+            m = re.sub(r"(\P{L}|^)(\p{L}*"+rf"qu[{_APO}])", r"\1\t\2\t", m, flags=re.IGNORECASE)
+            m = re.sub(r"(\P{L}|^)(\p{L}*"+rf"ent[{_APO}])", r"\1\t\2\t", m, flags=re.IGNORECASE)
+            m = re.sub(r"(\P{L}|^)(\p{L}*"+rf"[çcbzu][{_APO}])", r"\1\t\2\t", m, flags=re.IGNORECASE)
+            m = re.sub(r"([\p{L}\d]+(\.[\p{L}\d]+)+)", r"\t\1\t", m)
+            m = re.sub(r"\.($|\P{L})", r"\t.\1", m)
+            m = re.sub(r"(\D|^),", r"\1\t,\t", m)
+            m = re.sub(r",($|\D)", r"\t,\t\1", m)
+            m = re.sub(rf"-(vos|ne|[st][eu]?[{_APO}]?|l[aoi{_APO}]s?|me|d[{_APO}]|en|[nv]os|u)"+r"($|\P{L})",
+                       r"\t-\1\t\2", m, flags=re.IGNORECASE)
+            m = re.sub(rf"[{_APO}]"+r"([unv]\p{L}*)($|\P{L})", rf"\t'\1\t\2", m, flags=re.IGNORECASE)
+            m = re.sub(rf"[{_APO}]"r"([dlmnsti])($|\P{L})", r"\t'\1\t\2", m, flags=re.IGNORECASE)
+            m = re.sub(r"(\p{P})(\p{P})", r"\t\1\t\2\t", m)
+            m = re.sub(r"<PPLesp>", ' ', m)
+            m = re.sub(r"([<>])", r"\t\1\t", m)
+            res.extend(m.split('\t'))
+    return [item for item in res if item.strip()]
+
+
+class TestOccitanRules(TestCase):
+    def test_same_output_as_the_inline_rules(self):
+        """ Check that the precompiled rules of the Occitan tokenizer give the same tokens as the inline ones """
+        tokenizer = OccMemorizingTokenizer()
+        for text in OCCITAN_TEXTS + TEXTS:
+            for chunk in [text, tokenizer.normalizer(text)] + tokenizer._real_sentence_tokenizer(
+                    tokenizer.normalizer(text)):
+                with self.subTest(text=chunk[:30]):
+                    self.assertEqual(tokenizer._real_word_tokenizer(chunk),
+                                     reference_occ_word_tokenizer(tokenizer, chunk))
+
+
+class TestCompiledNormalizer(TestCase):
+    def test_same_output_as_the_chain(self):
+        """ Check that the compiled normalizer of each tokenizer gives the same output as its excluders """
+        for tokenizer_class in [FrMemorizingTokenizer, FroMemorizingTokenizer, GrcMemorizingTokenizer,
+                                LatMemorizingTokenizer, OccMemorizingTokenizer]:
+            tokenizer = tokenizer_class()
+            chain = tokenizer_class()
+            chain.compile_normalizers = False
+            for text in TEXTS + [" ".join(TEXTS) * 3]:
+                expected = text
+                for excluder in tokenizer.normalizers:
+                    expected = excluder.before_sentence_tokenizer(expected)
+                with self.subTest(tokenizer=tokenizer_class.__name__, text=text[:30]):
+                    self.assertEqual(tokenizer.exclude(text), expected)
+                    self.assertEqual(tokenizer.compiled_normalizer.fallbacks, 0)
+
+                    tokenizer.compile_normalizers = False
+                    self.assertEqual(tokenizer.exclude(text), expected)
+                    tokenizer.compile_normalizers = True
+
+                    self.assertEqual(list(tokenizer.sentence_tokenizer(text)),
+                                     list(chain.sentence_tokenizer(text)))
+
+    def test_groups(self):
+        """ Check that only excluders working inside whitespace-delimited runs are grouped """
+        normalizer = FrMemorizingTokenizer().compiled_normalizer
+        self.assertEqual(
+            [[type(excluder).__name__ for excluder in excluders] for excluders, _ in normalizer._steps],
+            [["AujourdhuiExcluder", "ApostropheExcluder", "FrenchCliticsExcluder"],
+             ["CompoundAbbreviationsExcluder"], ["ReferenceExcluder"]]
+        )
+        # Excluders which never change anything are dropped
+        normalizer = LatMemorizingTokenizer().compiled_normalizer
+        self.assertEqual([len(excluders) for excluders, _ in normalizer._steps], [1, 1, 1])
+
+    def test_fallback(self):
+        """ Check that runs covering most of the text are normalized along with the rest of it """
+        normalizer = CompiledNormalizer(FrMemorizingTokenizer().normalizers, max_coverage=0)
+        text = TEXTS[2]
+        self.assertEqual(normalizer.before_sentence_tokenizer(text),
+                         FrMemorizingTokenizer().compiled_normalizer.before_sentence_tokenizer(text))
+
+
+class TestCharRegistry(TestCase):
+    def test_same_output_as_replacing_each_entry(self):
+        """ Check that masking and unmasking in one pass gives the same output as replacing each registered character
+        one after the other, including for characters registered after the first use """
+        registry = CharRegistry()
+        text = "[REF:1.a-b:c] #APOSTROPHE# l'abbé ## §2 $x$ #"
+        for new_chars in [[], ["#", "§"], ["$", "##"]]:
+            for char in new_chars:
+                registry[char]
+            masked = text
+            for char, code in registry.items():
+                masked = masked.replace(char, code)
+            self.assertEqual(registry.mask(text), masked)
+
+            unmasked = masked
+            for char, code in registry.items():
+                unmasked = unmasked.replace(code, char)
+            self.assertEqual(registry.unmask(masked), unmasked)
+
+    def test_overwrite(self):
+        """ Check that changing the mask of a character updates the tables """
+        registry = CharRegistry()
+        registry["."] = "X"
+        self.assertEqual(registry.mask("a.b"), "aXb")
+        self.assertEqual(registry.unmask("aXb語"), "a.b語")
+
+    def test_concurrent_allocations(self):
+        """ Check that characters registered from several threads each get their own mask """
+        registry = CharRegistry()
+        chars = [chr(0x2000 + index) for index in range(400)]
+        with ThreadPoolExecutor(8) as pool:
+            codes = list(pool.map(lambda char: registry[char], chars * 3))
+        self.assertEqual(len(set(codes[:400])), 400)
+        self.assertEqual(codes[:400], codes[400:800])
+        self.assertEqual(registry.unmask("".join(codes[:400])), "".join(chars))
+
+    def test_freeze(self):
+        """ Check that a frozen registry keeps its masks but does not allocate new ones """
+        registry = CharRegistry()
+        registry.populate("#$")
+        registry.freeze()
+        self.assertEqual(registry.mask("[#$]"), "左\ue007\ue008右")
+        with self.assertRaises(FrozenCharRegistryError):
+            registry["%"]
+        with self.assertRaises(FrozenCharRegistryError):
+            registry["#"] = "x"
+
+    def test_frozen_tokenizers(self):
+        """ Check that tokenizers register what their excluders mask, so that their registry can be frozen """
+        text = " ".join(TEXTS) + " [REF:1@2.a] et [IGN:$3] l'abbé"
+        for tokenizer_class in [FrMemorizingTokenizer, FroMemorizingTokenizer, GrcMemorizingTokenizer,
+                                LatMemorizingTokenizer, OccMemorizingTokenizer]:
+            frozen = tokenizer_class()
+            unfrozen = type("Unfrozen", (tokenizer_class, ), {"freeze_char_registry": False})()
+            with self.subTest(tokenizer=tokenizer_class.__name__):
+                self.assertTrue(frozen.char_registry.frozen)
+                self.assertFalse(unfrozen.char_registry.frozen)
+                self.assertEqual(list(frozen.sentence_tokenizer(text)), list(unfrozen.sentence_tokenizer(text)))
+
+
+class TestReplacerCache(TestCase):
+    def test_same_tokens(self):
+        """ Check that memoizing the replacer does not change the output of the tokenizers """
+        for tokenizer_class in [FrMemorizingTokenizer, FroMemorizingTokenizer, GrcMemorizingTokenizer,
+                                LatMemorizingTokenizer, OccMemorizingTokenizer]:
+            text = " ".join(TEXTS + OCCITAN_TEXTS) * 2
+            tokenizer = tokenizer_class()
+            tokenizer.cache_replacer(1000)
+            with self.subTest(tokenizer=tokenizer_class.__name__):
+                self.assertEqual(list(tokenizer.sentence_tokenizer(text)),
+                                 list(tokenizer_class().sentence_tokenizer(text)))
+                self.assertGreater(tokenizer.replacer_hit_rate, .5)
+
+    def test_opt_out(self):
+        """ Check that replacers depending on a state are not memoized """
+        class Counting(LatMemorizingTokenizer):
+            memoizable_replacer = False
+
+            def __init__(self):
+                super(Counting, self).__init__()
+                self.seen = 0
+
+            def replacer(self, inp: str):
+                self.seen += 1
+                return str(self.seen)
+
+        tokenizer = Counting()
+        tokenizer.cache_replacer(1000)
+        self.assertEqual(list(tokenizer.sentence_tokenizer("a a a")), [["1", "2", "3"]])
+        self.assertIsNone(tokenizer.replacer_cache_info)
+
+
+class TestTokenClassifier(TestCase):
+    def test_same_exclusions(self):
+        """ Check that classifying tokens through the shared memo excludes the same tokens as matching each pattern """
+        iterator, _ = get_iterator_and_processor()
+        iterator.classifier = iterator.tokenizer.classifier = TokenClassifier()
+        text = " ".join(TEXTS + OCCITAN_TEXTS) * 2
+        for sentence in iterator.tokenizer.sentence_tokenizer(text):
+            expected = [index for index, token in enumerate(sentence)
+                        if any(pattern.match(token) for pattern in iterator.exclude_patterns)]
+            self.assertEqual(sorted(iterator.exclude_tokens(sentence)[1]), expected)
+        self.assertGreater(iterator.classifier.hit_rate, .5)
+
+    def test_bounded(self):
+        """ Check that the memo of a pattern is emptied once full """
+        classifier = TokenClassifier(max_size=2)
+        pattern = re.compile(r"\W+")
+        self.assertEqual([classifier.match(pattern, token) for token in ["a", ".", ",", "a"]],
+                         [False, True, True, False])
+        self.assertEqual(len(classifier._matches[pattern]), 2)
+
+    def test_pattern_set(self):
+        """ Check that the combined matcher finds the same first pattern as matching each of them """
+        iterator, _ = get_iterator_and_processor()
+        # Backreferences, named groups, conditionals and calls to groups are not merged
+        iterator.add_pattern(r"(a)\1")
+        iterator.add_pattern(r"(?P<x>\d+)")
+        iterator.add_pattern(r"(?P<x>[A-Z]+)")
+        iterator.add_pattern(r"zz")
+        iterator.add_pattern(r"(<)?\w+(?(1)>)$")
+        iterator.add_pattern(r"(b)(?1)")
+        matcher = iterator.matcher
+        self.assertEqual(len(matcher.regexes), 8)
+        for token in " ".join(TEXTS + OCCITAN_TEXTS).split() + ["aa", "12", "AB", "<abc>", "<abc", "bb"]:
+            with self.subTest(token=token):
+                expected = next((index for index, pattern in enumerate(iterator.exclude_patterns)
+                                 if pattern.match(token)), None)
+                self.assertEqual(matcher.first_match(token), expected)
+
+        iterator.reset_patterns()
+        self.assertEqual(iterator.matcher.regexes, [])
+
+
+class FlatAbbreviationsExcluder(AbbreviationsExcluder):
+    factor_prefixes = False
+
+
+class FlatCompoundAbbreviationsExcluder(CompoundAbbreviationsExcluder):
+    factor_prefixes = False
+
+
+class TestAbbreviationsTrie(TestCase):
+    LISTS = [
+        ABBREVIATIONS,
+        LASLA_ABBREVIATIONS,
+        ["V.", "V. act.", "act.", "Cf.", "cf. p.", "c.", "ca.", "A.", "A. B. C.", "A. B.", "a b."],
+        ["V. act.", "V.", "ca.", "c.", "A. B.", "A.", "A. B. C.", "ab."]
+    ]
+
+    def test_same_output_as_the_alternation(self):
+        """ Check that abbreviations factored in a trie match the same strings as their alternation """
+        for abbreviations in self.LISTS:
+            texts = TEXTS + [
+                " ".join(abbreviations) + " .",
+                " ".join(abbr.upper() for abbr in abbreviations),
+                "  ".join(abbr.replace(" ", "  ") for abbr in reversed(abbreviations)),
+                "".join(abbreviations)
+            ]
+            for ignore_case in [True, False]:
+                for factored, flat in [
+                    (AbbreviationsExcluder(abbreviations), FlatAbbreviationsExcluder(abbreviations)),
+                    (CompoundAbbreviationsExcluder(abbreviations, ignore_case=ignore_case),
+                     FlatCompoundAbbreviationsExcluder(abbreviations, ignore_case=ignore_case))
+                ]:
+                    self.assertNotEqual(factored.re.pattern, flat.re.pattern)
+                    for text in texts:
+                        with self.subTest(excluder=type(flat).__name__, ignore_case=ignore_case, text=text[:30]):
+                            self.assertEqual(factored.re.findall(text), flat.re.findall(text))
+                            self.assertEqual(factored.before_sentence_tokenizer(text),
+                                             flat.before_sentence_tokenizer(text))
+                            for token in text.split():
+                                self.assertEqual(bool(factored.re.match(token)), bool(flat.re.match(token)))
+
+    def test_not_literal(self):
+        """ Check that abbreviations which are regular expressions are kept in an alternation """
+        self.assertEqual(AbbreviationsExcluder(["c[fp].", "col."]).re.pattern, r"(c[fp]|col)(\.)")